@@ -23,3 +23,6 @@ class UserAdmin(DjangoUserAdmin):
 @admin.register(Profile)
 class ProfileAdmin(admin.ModelAdmin):
     list_display = ("user", "phone", "city", "country")
+    list_select_related = ("user",)
+    search_fields = ("user__email", "phone")
+    autocomplete_fields = ("user",)
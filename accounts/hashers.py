@@ -0,0 +1,90 @@
+"""
+Password hashers for login-heavy periods.
+
+- PooledScryptPasswordHasher is the preferred hasher: memory-hard, with N, r and p read from
+  INVENTORY_PASSWORD_HASHING (SCRYPT_*; Django's own defaults N=2**14, r=8, p=5 unless overridden).
+  `manage.py bench_login` times it against PBKDF2 here.
+- Argon2 is used first when argon2-cffi is installed (see PASSWORD_HASHERS in settings).
+- PBKDF2 stays last so existing hashes still verify; Django rehashes them with the preferred hasher on
+  the next successful login (User.check_password's setter), and must_update() does the same whenever the
+  SCRYPT_* settings change.
+
+All hash/verify work runs on a bounded thread pool (INVENTORY_PASSWORD_HASHING["WORKERS"]). hashlib
+releases the GIL, so the pool caps how many cores a login burst can occupy at once; extra requests
+queue instead of oversubscribing the CPU.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, PBKDF2PasswordHasher, ScryptPasswordHasher
+
+DEFAULTS = {
+    "SCRYPT_WORK_FACTOR": ScryptPasswordHasher.work_factor,
+    "SCRYPT_BLOCK_SIZE": ScryptPasswordHasher.block_size,
+    "SCRYPT_PARALLELISM": ScryptPasswordHasher.parallelism,
+    "WORKERS": None,  # None: one per CPU
+}
+
+def get_setting(name):
+    return getattr(settings, "INVENTORY_PASSWORD_HASHING", {}).get(name, DEFAULTS[name])
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_in_pool = threading.local()
+
+
+def _run(func, *args):
+    global _pool
+    if getattr(_in_pool, "active", False):
+        return func(*args)
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=get_setting("WORKERS") or os.cpu_count() or 1, thread_name_prefix="pwhash")
+
+    def task():
+        _in_pool.active = True
+        return func(*args)
+
+    return _pool.submit(task).result()
+
+
+class PooledHasherMixin:
+    def encode(self, password, salt, *args, **kwargs):
+        return _run(super().encode, password, salt, *args, **kwargs)
+
+    def verify(self, password, encoded):
+        return _run(super().verify, password, encoded)
+
+
+class PooledScryptPasswordHasher(PooledHasherMixin, ScryptPasswordHasher):
+    # read per call, so must_update() compares stored hashes against the current settings
+    @property
+    def work_factor(self):
+        return get_setting("SCRYPT_WORK_FACTOR")
+
+    @property
+    def block_size(self):
+        return get_setting("SCRYPT_BLOCK_SIZE")
+
+    @property
+    def parallelism(self):
+        return get_setting("SCRYPT_PARALLELISM")
+
+    @property
+    def maxmem(self):
+        # OpenSSL's 32 MiB default covers Django's parameters (and hashes made with them after the settings
+        # are lowered); larger work factors need room for N * r * 128 bytes
+        return max(32 * 1024 * 1024, 2 * 128 * self.work_factor * self.block_size)
+
+
+class PooledArgon2PasswordHasher(PooledHasherMixin, Argon2PasswordHasher):
+    pass
+
+
+class PooledPBKDF2PasswordHasher(PooledHasherMixin, PBKDF2PasswordHasher):
+    pass
+
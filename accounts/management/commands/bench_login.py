@@ -0,0 +1,65 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import get_hasher, make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from accounts.models import User
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Time login (authenticate) with legacy PBKDF2 vs the configured hasher, and a concurrent login burst (rolled back)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--logins", type=int, default=10, help="Sequential logins per hasher.")
+        parser.add_argument("--burst", type=int, default=50, help="Concurrent password checks in the burst test.")
+        parser.add_argument("--threads", type=int, default=16, help="Request threads in the burst test.")
+
+    def handle(self, *args, **options):
+        password = "shift-change-Pa55"
+        preferred = get_hasher("default")
+        self.stdout.write(f"preferred hasher: {preferred.algorithm} ({type(preferred).__name__})")
+        try:
+            with transaction.atomic():
+                legacy = make_password(password, hasher="pbkdf2_sha256")
+                current = make_password(password)
+                user = User.objects.create_user(email="bench-login@gmail.com", password=password)
+
+                for label, encoded in (("pbkdf2_sha256", legacy), (preferred.algorithm, current)):
+                    timings = []
+                    for _ in range(options["logins"]):
+                        # reset to the hash under test; a legacy hash gets upgraded by the login itself
+                        User.objects.filter(pk=user.pk).update(password=encoded)
+                        start = time.perf_counter()
+                        assert authenticate(email=user.email, password=password) is not None
+                        timings.append(time.perf_counter() - start)
+                    timings.sort()
+                    self.stdout.write(
+                        f"{label:<14} login p50 {timings[len(timings) // 2] * 1000:7.1f} ms  "
+                        f"max {timings[-1] * 1000:7.1f} ms"
+                    )
+
+                user.refresh_from_db()
+                self.stdout.write(f"after login, stored hash algorithm: {user.password.split('$', 1)[0]}")
+                raise Rollback()
+        except Rollback:
+            pass
+
+        # burst: many request threads checking passwords at once; the hasher pool bounds CPU use
+        encoded = make_password(password)
+        hasher = get_hasher("default")
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["threads"]) as requests:
+            results = list(requests.map(lambda _: hasher.verify(password, encoded), range(options["burst"])))
+        elapsed = time.perf_counter() - start
+        assert all(results)
+        self.stdout.write(
+            f"burst          {options['burst']} checks on {options['threads']} threads: "
+            f"{elapsed * 1000:.1f} ms total, {options['burst'] / elapsed:.1f} checks/s"
+        )
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:10
+
+from django.db import migrations, models
+
+
+def backfill_search(apps, schema_editor):
+    # lower-cased in Python, as User.save() does (SQLite's LOWER() only folds ASCII)
+    User = apps.get_model('accounts', 'User')
+    users = []
+    for user in User.objects.only('email', 'first_name', 'last_name').iterator(chunk_size=2000):
+        user.search_email = user.email.lower()
+        user.search_first_name = user.first_name.lower()
+        user.search_last_name = user.last_name.lower()
+        users.append(user)
+        if len(users) == 2000:
+            User.objects.bulk_update(users, ['search_email', 'search_first_name', 'search_last_name'])
+            users = []
+    User.objects.bulk_update(users, ['search_email', 'search_first_name', 'search_last_name'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_user_directory_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='user',
+            name='user_name_idx',
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='search_email',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=254),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='search_first_name',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=120),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='search_last_name',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=120),
+        ),
+        migrations.RunPython(backfill_search, migrations.RunPython.noop),
+    ]
@@ -10,7 +10,7 @@ class UserManager(BaseUserManager):
             raise ValueError("Email Must Be Set")
         
         email = self.normalize_email(email)
-        user = self.model(email = email,password = password, **extra_fields)
+        user = self.model(email = email, **extra_fields)
         user.set_password(password)
         user.save(using = self._db)
         return user
@@ -51,14 +51,36 @@ class User(AbstractBaseUser, PermissionsMixin):
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
     date_joined = models.DateTimeField(default=timezone.now)
+    # lower-cased copies kept by save(): the directory search is a case-sensitive prefix match on these,
+    # which plain (and, on PostgreSQL, pattern_ops) indexes serve; istartswith on the originals can't
+    search_email = models.CharField(max_length=254, db_index=True, editable=False, default="")
+    search_first_name = models.CharField(max_length=120, db_index=True, editable=False, default="")
+    search_last_name = models.CharField(max_length=120, db_index=True, editable=False, default="")
+
+    SEARCH_FIELDS = {"email": "search_email", "first_name": "search_first_name", "last_name": "search_last_name"}
 
     objects = UserManager()
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = []
 
+    class Meta:
+        indexes = [
+            # user directory: role / active filters with the default -date_joined ordering
+            models.Index(fields=["role", "is_active", "-date_joined"], name="user_directory_idx"),
+            models.Index(fields=["-date_joined"], name="user_joined_idx"),
+        ]
+
     def __str__(self):
-        return self.email    
+        return self.email
+
+    def save(self, *args, **kwargs):
+        for field, copy in self.SEARCH_FIELDS.items():
+            setattr(self, copy, getattr(self, field).lower())
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, *(copy for field, copy in self.SEARCH_FIELDS.items() if field in update_fields)}
+        super().save(*args, **kwargs)
 
 
 
@@ -55,10 +55,19 @@ class ProfileSerializer(serializers.ModelSerializer):
         fields = ("phone", "address", "city", "country", "license_number", "extra")
 
 
+class ProfileSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Profile
+        fields = ("phone", "city", "country", "license_number")
+
+
 class UserSerializer(serializers.ModelSerializer):
+    # read from the select_related join; edit through ProfileView
+    profile = ProfileSummarySerializer(read_only=True)
+
     class Meta:
         model = User
-        fields = ['first_name', 'last_name', 'email', 'role', 'is_active', 'date_joined', 'profile']
+        fields = ['id', 'first_name', 'last_name', 'email', 'role', 'is_active', 'date_joined', 'profile']
 
 
 
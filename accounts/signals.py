@@ -1,16 +1,12 @@
 from django.db.models.signals import post_save
 from django.dispatch import receiver
-from . models import *
+from . models import User, Profile
 
 
 @receiver(post_save, sender=User)
-def create_or_update_profile(sender, instance, created, **kwargs):
+def create_profile(sender, instance, created, **kwargs):
+    # later user saves (role changes, logins, password rehashes) leave the profile alone;
+    # ProfileView creates one on demand for users that predate this signal
     if created:
         Profile.objects.create(user=instance)
-    else:
-        # Only save if profile exists
-        if hasattr(instance, 'profile'):
-            instance.profile.save()
-        else:
-            Profile.objects.create(user=instance)
 
@@ -0,0 +1,91 @@
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import ScryptPasswordHasher, get_hasher, make_password
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from .hashers import PooledScryptPasswordHasher
+from .models import User
+
+
+class UserSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user("admin@example.com", "pw", role=User.ROLE_ADMIN)
+        User.objects.create_user("Ada.Lovelace@Example.com", "pw", first_name="Ada", last_name="Lovelace")
+        User.objects.create_user("grace@example.com", "pw", first_name="Grace", last_name="Hopper")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def search(self, term):
+        response = self.client.get("/users/", {"search": term})
+        self.assertEqual(response.status_code, 200)
+        return sorted(user["email"] for user in response.data["results"])
+
+    def test_prefix_search_ignores_case(self):
+        self.assertEqual(self.search("ADA"), ["Ada.Lovelace@example.com"])
+        self.assertEqual(self.search("hop"), ["grace@example.com"])
+        self.assertEqual(self.search("LOVE"), ["Ada.Lovelace@example.com"])
+        self.assertEqual(self.search("race"), [])  # prefixes only
+
+    def test_search_is_a_plain_prefix_like(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.search("Ada")
+        sql = next(q["sql"] for q in queries if "search_email" in q["sql"] and "LIKE" in q["sql"])
+        self.assertNotIn("UPPER(", sql)
+        self.assertIn("'ada%'", sql)
+
+    def test_partial_saves_keep_search_columns_current(self):
+        user = User.objects.get(email="grace@example.com")
+        user.last_name = "Brewster"
+        user.save(update_fields=["last_name"])
+        self.assertEqual(self.search("brew"), ["grace@example.com"])
+
+
+class PasswordHashingTests(TestCase):
+    def test_legacy_hash_is_upgraded_to_default_scrypt_on_login(self):
+        user = User.objects.create_user("legacy@example.com")
+        User.objects.filter(pk=user.pk).update(password=make_password("s3cret-Pa55", hasher="pbkdf2_sha256"))
+        self.assertIsNotNone(authenticate(email="legacy@example.com", password="s3cret-Pa55"))
+        user.refresh_from_db()
+        decoded = get_hasher("default").decode(user.password)
+        self.assertEqual(
+            (decoded["algorithm"], decoded["work_factor"], decoded["block_size"], decoded["parallelism"]),
+            ("scrypt", ScryptPasswordHasher.work_factor, ScryptPasswordHasher.block_size, ScryptPasswordHasher.parallelism),
+        )
+        self.assertIsInstance(get_hasher("default"), PooledScryptPasswordHasher)
+
+    def test_changed_scrypt_settings_rehash_on_login(self):
+        user = User.objects.create_user("scrypt@example.com", "s3cret-Pa55")
+        hasher = get_hasher("default")
+        self.assertFalse(hasher.must_update(user.password))
+        tuned = {"SCRYPT_WORK_FACTOR": 2 ** 12, "SCRYPT_BLOCK_SIZE": 4, "SCRYPT_PARALLELISM": 2}
+        with override_settings(INVENTORY_PASSWORD_HASHING=tuned):
+            self.assertTrue(hasher.must_update(user.password))
+            self.assertIsNotNone(authenticate(email="scrypt@example.com", password="s3cret-Pa55"))
+            user.refresh_from_db()
+            decoded = hasher.decode(user.password)
+            self.assertEqual((decoded["work_factor"], decoded["block_size"], decoded["parallelism"]), (2 ** 12, 4, 2))
+            self.assertFalse(hasher.must_update(user.password))
+        self.assertIsNotNone(authenticate(email="scrypt@example.com", password="s3cret-Pa55"))
+
+
+@override_settings(INVENTORY_THROTTLE={"ENABLED": True, "RATES": {"default": {"customer": "3/min"}}})
+class ThrottleTests(TestCase):
+    def setUp(self):
+        caches["throttle"].clear()
+        self.addCleanup(caches["throttle"].clear)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("shopper@example.com", "pw"))
+
+    def test_burst_then_429_with_retry_after(self):
+        for _ in range(3):
+            self.assertEqual(self.client.get("/medicines/").status_code, 200)
+        response = self.client.get("/medicines/")
+        self.assertEqual(response.status_code, 429)
+        # one token every 20 s
+        self.assertTrue(1 <= int(response["Retry-After"]) <= 20)
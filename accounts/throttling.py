@@ -0,0 +1,99 @@
+"""
+Token-bucket throttles keyed by role and endpoint scope.
+
+Buckets live in the "throttle" cache (LocMemCache, shared by every thread of the process) as a single
+float per key: the GCRA "theoretical arrival time". Taking a token is one get and one set under a
+striped lock, O(1) regardless of the rate, with no per-request history kept.
+
+INVENTORY_THROTTLE["RATES"][scope][role] gives the rate ("<n>/<sec|min|hour|day>", None = unlimited);
+views opt into a scope with `throttle_scope`, anything else uses "default". Burst capacity equals n.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {"s": 1, "sec": 1, "m": 60, "min": 60, "h": 3600, "hour": 3600, "d": 86400, "day": 86400}
+
+_locks = [threading.Lock() for _ in range(64)]
+
+
+def get_config():
+    return getattr(settings, "INVENTORY_THROTTLE", {})
+
+
+def parse_rate(rate):
+    """
+    "120/min" -> (capacity 120, seconds per token 0.5). None passes through.
+    """
+    if rate is None:
+        return None
+    count, period = rate.split("/")
+    count = int(count)
+    return count, PERIODS[period] / count
+
+
+def take(key, capacity, interval, now=None):
+    """
+    Take one token from the bucket. Returns 0.0 when allowed, otherwise seconds until a token frees up.
+    """
+    now = time.monotonic() if now is None else now
+    cache = caches["throttle"]
+    window = interval * capacity
+    with _locks[hash(key) % len(_locks)]:
+        tat = max(cache.get(key, now), now) + interval
+        if tat - now > window:
+            return tat - now - window
+        cache.set(key, tat, timeout=int(tat - now) + 1)
+    return 0.0
+
+
+class TokenBucketThrottle(BaseThrottle):
+    wait_seconds = None
+
+    def get_bucket(self, request, view):
+        """
+        Returns (cache key, rate string or None).
+        """
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        if not get_config().get("ENABLED", True):
+            return True
+        key, rate = self.get_bucket(request, view)
+        parsed = parse_rate(rate)
+        if parsed is None:
+            return True
+        self.wait_seconds = take(key, *parsed)
+        return self.wait_seconds == 0.0
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class RoleRateThrottle(TokenBucketThrottle):
+    """
+    Default throttle: one bucket per user (or client IP when anonymous) per endpoint scope,
+    sized by the caller's role.
+    """
+    def get_bucket(self, request, view):
+        rates = get_config().get("RATES", {})
+        scope = getattr(view, "throttle_scope", None) or "default"
+        user = request.user
+        if user and user.is_authenticated:
+            role, ident = user.role, f"u{user.pk}"
+        else:
+            role, ident = "anon", f"ip{self.get_ident(request)}"
+        by_role = rates.get(scope, {})
+        rate = by_role[role] if role in by_role else rates.get("default", {}).get(role)
+        return f"throttle:{scope}:{ident}", rate
+
+
+class LoginRateThrottle(TokenBucketThrottle):
+    """
+    Register / login / refresh: one bucket per client IP, whoever the request claims to be.
+    """
+    def get_bucket(self, request, view):
+        return f"throttle:login:ip{self.get_ident(request)}", get_config().get("LOGIN_RATE")
@@ -1,13 +1,14 @@
 from django.urls import path
-from . views import *
+from . views import RegisterView, UserListView, UserDetailView, PromoteUserView, ProfileView, ChangePasswordView
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from .throttling import LoginRateThrottle
 
 
 
 urlpatterns = [
     path('register', RegisterView.as_view(), name = 'register'),
-    path('login', TokenObtainPairView.as_view(), name = 'login'),
-    path('refresh', TokenRefreshView.as_view(), name = 'refresh'),
+    path('login', TokenObtainPairView.as_view(throttle_classes=[LoginRateThrottle]), name = 'login'),
+    path('refresh', TokenRefreshView.as_view(throttle_classes=[LoginRateThrottle]), name = 'refresh'),
     path("users/", UserListView.as_view(), name="user_list"),
     path("users/<int:pk>/", UserDetailView.as_view(), name="user_detail"),
     path("users/<int:pk>/promote/", PromoteUserView.as_view(), name="user_promote"),
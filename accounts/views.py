@@ -1,10 +1,11 @@
-from django.shortcuts import render
-from . models import *
-from . serializers import *
-from rest_framework import generics, permissions, status
-from . permissions import *
+from . models import User, Profile
+from . serializers import RegisterSerializer, UserSerializer, ProfileSerializer, ChangePasswordSerializer
+from rest_framework import generics, permissions, status, filters
+from django_filters.rest_framework import DjangoFilterBackend
+from . permissions import IsAdmin, IsOwnerOrAdmin
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from .throttling import LoginRateThrottle
 
 
 
@@ -13,14 +14,32 @@ class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
     serializer_class = RegisterSerializer
     permission_classes = [permissions.AllowAny]
+    throttle_classes = [LoginRateThrottle]
+
+
+
+
+class PrefixSearchFilter(filters.SearchFilter):
+    """
+    "^" fields match case-sensitively against lower-cased terms; on the lower-cased User.search_* columns
+    that is a case-insensitive search that stays an indexable prefix LIKE.
+    """
+    lookup_prefixes = {**filters.SearchFilter.lookup_prefixes, '^': 'startswith'}
+
+    def get_search_terms(self, request):
+        return [term.lower() for term in super().get_search_terms(request)]
 
 
 
 
 class UserListView(generics.ListAPIView):
-    queryset = User.objects.all().order_by('-date_joined')
+    queryset = User.objects.select_related('profile').order_by('-date_joined')
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [PrefixSearchFilter, DjangoFilterBackend]
+    # prefix matches on the indexed lower-cased copies of email / names
+    search_fields = ['^search_email', '^search_last_name', '^search_first_name']
+    filterset_fields = ['role', 'is_active']
 
 
 
@@ -42,7 +61,8 @@ class ProfileView(generics.RetrieveUpdateAPIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_object(self):
-        return Profile.objects.get(user=self.request.user)
+        profile, _ = Profile.objects.get_or_create(user=self.request.user)
+        return profile
     
 
 
@@ -70,7 +90,7 @@ class ChangePasswordView(generics.UpdateAPIView):
                 )
 
             user.set_password(new_password)
-            user.save()
+            user.save(update_fields=["password"])
 
             return Response(
                 {"detail": "Password updated successfully"},
@@ -1,32 +1,133 @@
 from django.contrib import admin
-from .models import Category, Supplier, Medicine, Batch, PurchaseOrder, PurchaseItem, StockTransaction
+from django.contrib.admin.views.main import ChangeList
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from .models import Category, Supplier, Location, Medicine, Batch, PurchaseOrder, PurchaseItem, StockTransaction
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Unfiltered changelists on PostgreSQL take the planner's row estimate instead of COUNT(*);
+    everything else is counted up to COUNT_CAP rows (later pages are reached by narrowing the filter).
+    """
+    COUNT_CAP = 10000
+
+    @cached_property
+    def count(self):
+        qs = self.object_list
+        connection = connections[qs.db]
+        if not qs.query.where and connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [qs.model._meta.db_table])
+                row = cursor.fetchone()
+            if row and row[0] > self.COUNT_CAP:
+                return int(row[0])
+        return qs[:self.COUNT_CAP].count()
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+KEYSET_VAR = "before"
+
+
+class KeysetChangeList(ChangeList):
+    """
+    Newest-first changelist paged by primary key ("?before=<id>") instead of OFFSET, with no count query.
+    """
+    def get_results(self, request):
+        before = getattr(request, "keyset_before", None)
+        qs = self.queryset.order_by("-pk")
+        if before is not None:
+            qs = qs.filter(pk__lt=before)
+        rows = list(qs[:self.list_per_page + 1])
+        has_more = len(rows) > self.list_per_page
+        self.result_list = rows[:self.list_per_page]
+        self.result_count = len(self.result_list)
+        self.full_result_count = None
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.can_show_all = False
+        self.multi_page = has_more or before is not None
+        self.paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        self.keyset_before = before
+        self.keyset_next_url = self.get_query_string({KEYSET_VAR: self.result_list[-1].pk}) if has_more else None
+        self.keyset_first_url = self.get_query_string(remove=[KEYSET_VAR])
+
+    def get_ordering(self, request, queryset):
+        return ["-pk"]
+
+
+class KeysetPaginationMixin:
+    sortable_by = ()
+    change_list_template = "admin/keyset_change_list.html"
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    def changelist_view(self, request, extra_context=None):
+        # ChangeList treats unknown GET params as field lookups; take the cursor out first
+        if KEYSET_VAR in request.GET:
+            params = request.GET.copy()
+            try:
+                request.keyset_before = int(params.pop(KEYSET_VAR)[-1])
+            except ValueError:
+                request.keyset_before = None
+            request.GET = params
+        return super().changelist_view(request, extra_context)
+
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
     list_display = ("name", "description")
+    search_fields = ("name",)
 
 @admin.register(Supplier)
 class SupplierAdmin(admin.ModelAdmin):
     list_display = ("name", "contact_email", "phone")
+    search_fields = ("name", "contact_email")
+
+@admin.register(Location)
+class LocationAdmin(admin.ModelAdmin):
+    list_display = ("code", "name", "is_active")
+    search_fields = ("code", "name")
 
 @admin.register(Medicine)
-class MedicineAdmin(admin.ModelAdmin):
+class MedicineAdmin(ScalableAdmin):
     list_display = ("name", "sku", "category", "total_stock", "reorder_level", "is_active")
+    list_select_related = ("category",)
     search_fields = ("name", "sku")
+    autocomplete_fields = ("category",)
 
 @admin.register(Batch)
-class BatchAdmin(admin.ModelAdmin):
+class BatchAdmin(ScalableAdmin):
     list_display = ("medicine", "batch_number", "available_quantity", "expiry_date", "received_date")
+    list_select_related = ("medicine",)
+    search_fields = ("batch_number", "medicine__sku")
+    autocomplete_fields = ("medicine", "supplier", "location")
 
 class PurchaseItemInline(admin.TabularInline):
     model = PurchaseItem
     extra = 0
+    autocomplete_fields = ("medicine",)
 
 @admin.register(PurchaseOrder)
-class PurchaseOrderAdmin(admin.ModelAdmin):
+class PurchaseOrderAdmin(ScalableAdmin):
     list_display = ("id", "supplier", "status", "created_by", "created_at")
+    list_select_related = ("supplier", "created_by")
+    autocomplete_fields = ("supplier", "created_by")
+    date_hierarchy = "created_at"
     inlines = [PurchaseItemInline]
 
 @admin.register(StockTransaction)
-class StockTransactionAdmin(admin.ModelAdmin):
+class StockTransactionAdmin(KeysetPaginationMixin, ScalableAdmin):
     list_display = ("medicine", "transaction_type", "quantity", "performed_by", "performed_at")
+    list_select_related = ("medicine", "performed_by")
+    autocomplete_fields = ("medicine", "performed_by", "location")
+    raw_id_fields = ("batch",)
+    # fixed ranges (today / 7 days / month / year) on stocktx_performed_idx; date_hierarchy would list the
+    # years with a DISTINCT scan of the whole ledger on every page load
+    list_filter = (("performed_at", admin.DateFieldListFilter), "transaction_type")
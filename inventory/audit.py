@@ -0,0 +1,269 @@
+"""
+Stock integrity audit.
+
+Medicines are split into id ranges; each range is checked with a handful of grouped queries (no per-row
+queries) and ranges run in parallel worker processes. Checks:
+
+- total_stock:    Medicine.total_stock != sum of its batches' available_quantity
+- bad_batch:      available_quantity < 0, reserved_quantity < 0 or reserved_quantity > available_quantity
+- ledger:         opening stock plus the signed sum of the medicine's transactions (IN +q, OUT -q, ADJUST +/-q)
+                  != sum of batch stock
+- batch_ledger:   opening_quantity plus the signed sum of a batch's linked transactions != its
+                  available_quantity. Only for medicines whose OUT transactions all name a batch; FIFO sales
+                  don't record which batches they drew from, so for those medicines only the medicine-level
+                  ledger is meaningful.
+
+A batch-less ADJUST books its quantity on a synthetic "adjust-<tx id>" batch floored at 0, so a negative one
+counts as 0 in both ledger checks, as in inventory.replay.
+
+Each range is read in one snapshot transaction (REPEATABLE READ on PostgreSQL; SQLite and InnoDB read
+from one snapshot inside a transaction by default), so a sale committing between its queries can't show
+up as a discrepancy.
+
+Batches are taken as the physical truth. Repairs recompute the denormalized totals, zero broken batches,
+and (optionally) append ADJUST transactions so the ledger replays to the current stock. Nothing is rewritten.
+Before writing, repair() locks the affected batches and medicines and re-checks them, and only fixes what
+still holds, with the values found under the lock.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+
+from django.db import connection, connections, models, transaction
+from django.db.models.functions import Cast, Coalesce, Concat
+
+from .changes import record_changes
+from .concurrency import write_stamp
+from .models import Batch, Medicine, StockTransaction
+from .signals import bulk_stock_changes, recompute_total_stock_bulk
+
+REPAIR_NOTE = "Stock audit reconciliation"
+CHUNK_SIZE = 1000
+
+
+def signed_quantity():
+    return models.Case(
+        models.When(transaction_type=StockTransaction.TYPE_OUT, then=-models.F("quantity")),
+        default=models.F("quantity"),
+    )
+
+
+def opening_quantity():
+    # batches from before opening_quantity was tracked count their received quantity
+    return Coalesce("opening_quantity", "quantity")
+
+
+def floored_adjustments(in_range):
+    """
+    {(medicine_id, batch_id): units} the signed ledger sum over-counts for negative batch-less ADJUSTs,
+    whose synthetic batch was created at 0 rather than below it.
+    """
+    floored = {}
+    for medicine_id, batch_id, quantity in (
+        StockTransaction.objects.filter(transaction_type=StockTransaction.TYPE_ADJUST, quantity__lt=0, **in_range)
+        .filter(batch__batch_number=Concat(models.Value("adjust-"), Cast("pk", models.CharField())))
+        .values_list("medicine_id", "batch_id", "quantity")
+    ):
+        floored[medicine_id, batch_id] = floored.get((medicine_id, batch_id), 0) - quantity
+    return floored
+
+
+@contextmanager
+def snapshot():
+    with transaction.atomic():
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+        yield
+
+
+def audit_range(lo, hi):
+    """
+    Check medicines with lo <= id < hi. Returns a list of discrepancy dicts.
+    """
+    with snapshot():
+        return check_medicines({"medicine_id__gte": lo, "medicine_id__lt": hi})
+
+
+def check_medicines(in_range):
+    """
+    The checks for the medicines selected by `in_range` (medicine_id lookups), in the caller's transaction.
+    """
+    totals = dict(
+        Medicine.objects.filter(**{"pk" + lookup[len("medicine_id"):]: value for lookup, value in in_range.items()})
+        .values_list("pk", "total_stock")
+    )
+    if not totals:
+        return []
+    batch_sums = {}
+    openings = {}
+    for medicine_id, stock, opening in (
+        Batch.objects.filter(**in_range).values("medicine_id")
+        .annotate(s=models.Sum("available_quantity"), o=models.Sum(opening_quantity()))
+        .values_list("medicine_id", "s", "o")
+    ):
+        batch_sums[medicine_id] = stock
+        openings[medicine_id] = opening
+    ledger = {
+        row["medicine_id"]: row
+        for row in StockTransaction.objects.filter(**in_range).values("medicine_id").annotate(
+            signed=models.Sum(signed_quantity()),
+            unattributed=models.Count("pk", filter=models.Q(transaction_type=StockTransaction.TYPE_OUT, batch__isnull=True)),
+        )
+    }
+
+    floored = floored_adjustments(in_range)
+    floored_medicines = {}
+    for (medicine_id, _), units in floored.items():
+        floored_medicines[medicine_id] = floored_medicines.get(medicine_id, 0) + units
+
+    found = []
+    for medicine_id, total in totals.items():
+        stock = batch_sums.get(medicine_id) or 0
+        if total != stock:
+            found.append({"check": "total_stock", "medicine_id": medicine_id, "expected": stock, "actual": total})
+        replayed = (openings.get(medicine_id) or 0) + (ledger[medicine_id]["signed"] if medicine_id in ledger else 0)
+        replayed += floored_medicines.get(medicine_id, 0)
+        if replayed != stock:
+            found.append({"check": "ledger", "medicine_id": medicine_id, "expected": replayed, "actual": stock})
+
+    for batch_id, medicine_id, available, reserved in (
+        Batch.objects.filter(**in_range)
+        .filter(models.Q(available_quantity__lt=0) | models.Q(reserved_quantity__lt=0) | models.Q(reserved_quantity__gt=models.F("available_quantity")))
+        .values_list("pk", "medicine_id", "available_quantity", "reserved_quantity")
+    ):
+        found.append({"check": "bad_batch", "medicine_id": medicine_id, "batch_id": batch_id, "available": available, "reserved": reserved})
+
+    unattributed = {pk for pk, row in ledger.items() if row["unattributed"]}
+    if len(unattributed) < len(totals):
+        batch_ledger = dict(
+            StockTransaction.objects.filter(batch__isnull=False, **in_range)
+            .values("batch_id").annotate(signed=models.Sum(signed_quantity())).values_list("batch_id", "signed")
+        )
+        for batch_id, medicine_id, available, opening in (
+            Batch.objects.filter(**in_range).values_list("pk", "medicine_id", "available_quantity", opening_quantity())
+        ):
+            if medicine_id in unattributed:
+                continue
+            replayed = opening + batch_ledger.get(batch_id, 0) + floored.get((medicine_id, batch_id), 0)
+            if replayed != available:
+                found.append({"check": "batch_ledger", "medicine_id": medicine_id, "batch_id": batch_id, "expected": replayed, "actual": available})
+    return found
+
+
+def id_ranges(range_size):
+    bounds = Medicine.objects.aggregate(lo=models.Min("pk"), hi=models.Max("pk"))
+    if bounds["lo"] is None:
+        return []
+    return [(lo, min(lo + range_size, bounds["hi"] + 1)) for lo in range(bounds["lo"], bounds["hi"] + 1, range_size)]
+
+
+def run_audit(range_size=5000, workers=None):
+    """
+    Yields ((lo, hi), discrepancies) per range as workers finish. workers=1 runs in-process.
+    """
+    ranges = id_ranges(range_size)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(ranges) == 1:
+        for lo, hi in ranges:
+            yield (lo, hi), audit_range(lo, hi)
+        return
+    # forked workers must open their own connections, not share the parent's sockets
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(audit_range, lo, hi): (lo, hi) for lo, hi in ranges}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+
+def discrepancy_key(d):
+    return d["check"], d["medicine_id"], d.get("batch_id")
+
+
+def recheck(discrepancies):
+    """
+    Lock the batches and medicines the discrepancies name (in the stock handlers' order: batches, then the
+    medicine), so no sale or receipt moves stock or the ledger until the repair commits, and check them
+    again. Returns (the reported discrepancies as they stand now, how many no longer hold).
+    """
+    ids = sorted({d["medicine_id"] for d in discrepancies})
+    current = []
+    for i in range(0, len(ids), CHUNK_SIZE):
+        chunk = ids[i:i + CHUNK_SIZE]
+        list(Batch.objects.select_for_update().filter(medicine_id__in=chunk).order_by("pk").values_list("pk"))
+        list(Medicine.objects.select_for_update().filter(pk__in=chunk).order_by("pk").values_list("pk"))
+        current.extend(check_medicines({"medicine_id__in": chunk}))
+    reported = {discrepancy_key(d) for d in discrepancies}
+    current = [d for d in current if discrepancy_key(d) in reported]
+    return current, len(reported) - len(current)
+
+
+@transaction.atomic
+def repair(discrepancies, ledger=False):
+    """
+    Fix what the audit found, in bulk, after re-checking it under lock (recheck). Returns counts per check
+    repaired, plus "gone": reported discrepancies that no longer held.
+    - bad_batch: negative quantities are zeroed (with an ADJUST recording the correction),
+      over-reservations are cut back to what is available
+    - total_stock: totals (and batch summary / location stock) recomputed from batches
+    - ledger=True: batch_ledger / ledger gaps get an ADJUST transaction for the difference
+    Repair transactions are bulk-created, so the stock signal handlers don't apply them a second time.
+    """
+    counts = {}
+    medicine_ids = set()
+    adjustments = []
+    discrepancies, counts["gone"] = recheck(discrepancies)
+    bad = [d for d in discrepancies if d["check"] == "bad_batch"]
+    if bad:
+        ids = [d["batch_id"] for d in bad]
+        with bulk_stock_changes():
+            for batch_id, medicine_id, location_id, available in (
+                Batch.objects.filter(pk__in=ids, available_quantity__lt=0).values_list("pk", "medicine_id", "location_id", "available_quantity")
+            ):
+                adjustments.append(StockTransaction(
+                    medicine_id=medicine_id, batch_id=batch_id, location_id=location_id,
+                    transaction_type=StockTransaction.TYPE_ADJUST, quantity=-available, note=REPAIR_NOTE,
+                ))
+            Batch.objects.filter(pk__in=ids, available_quantity__lt=0).update(available_quantity=0, **write_stamp())
+            Batch.objects.filter(pk__in=ids).filter(
+                models.Q(reserved_quantity__lt=0) | models.Q(reserved_quantity__gt=models.F("available_quantity"))
+            ).update(reserved_quantity=models.Case(
+                models.When(reserved_quantity__lt=0, then=0), default=models.F("available_quantity"),
+            ), **write_stamp())
+        record_changes("batch", ids)
+        medicine_ids.update(d["medicine_id"] for d in bad)
+        counts["bad_batch"] = len(bad)
+
+    totals = [d["medicine_id"] for d in discrepancies if d["check"] == "total_stock"]
+    medicine_ids.update(totals)
+    counts["total_stock"] = len(totals)
+    recompute_total_stock_bulk(medicine_ids)
+
+    if ledger:
+        batch_level = [d for d in discrepancies if d["check"] == "batch_ledger"]
+        covered = {}
+        for d in batch_level:
+            covered[d["medicine_id"]] = covered.get(d["medicine_id"], 0) + d["actual"] - d["expected"]
+        locations = dict(Batch.objects.filter(pk__in=[d["batch_id"] for d in batch_level]).values_list("pk", "location_id"))
+        for d in batch_level:
+            adjustments.append(StockTransaction(
+                medicine_id=d["medicine_id"], batch_id=d["batch_id"], location_id=locations.get(d["batch_id"]),
+                transaction_type=StockTransaction.TYPE_ADJUST, quantity=d["actual"] - d["expected"], note=REPAIR_NOTE,
+            ))
+        # whatever the batch-level entries don't cover (FIFO sales without a batch, transactions of deleted
+        # batches) is reconciled against the medicine as a whole
+        medicine_level = []
+        for d in discrepancies:
+            if d["check"] != "ledger":
+                continue
+            residual = d["actual"] - d["expected"] - covered.get(d["medicine_id"], 0)
+            if residual:
+                medicine_level.append(d)
+                adjustments.append(StockTransaction(
+                    medicine_id=d["medicine_id"], transaction_type=StockTransaction.TYPE_ADJUST,
+                    quantity=residual, note=REPAIR_NOTE,
+                ))
+        counts["batch_ledger"] = len(batch_level)
+        counts["ledger"] = len(medicine_level)
+    StockTransaction.objects.bulk_create(adjustments, batch_size=1000)
+    return counts
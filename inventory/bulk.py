@@ -0,0 +1,109 @@
+from django.db import models, transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .changes import record_changes
+from .models import Batch, ChangeEvent, Medicine, PriceHistory
+from .pricing import record_prices
+from .signals import bulk_stock_changes, recompute_total_stock_bulk
+
+MAX_ITEMS = 50000
+CHUNK_SIZE = 1000
+SUMMARY_FIELDS = {"available_quantity", "expiry_date", "purchase_price"}
+
+
+def _chunks(seq, size=CHUNK_SIZE):
+    for i in range(0, len(seq), size):
+        yield seq[i:i + size]
+
+
+def _check_items(model, items):
+    if len(items) > MAX_ITEMS:
+        raise ValidationError({"detail": f"At most {MAX_ITEMS} items per request."})
+    ids = [item["id"] for item in items]
+    if len(set(ids)) != len(ids):
+        raise ValidationError({"detail": "Each id may appear only once."})
+    found = set()
+    for chunk in _chunks(ids):
+        found.update(model.objects.filter(pk__in=chunk).values_list("pk", flat=True))
+    missing = sorted(set(ids) - found)
+    if missing:
+        raise ValidationError({"detail": "Unknown ids.", "ids": missing[:100]})
+    return ids
+
+
+def _apply(model, items):
+    """
+    bulk_update() straight from the payload: items are grouped by the set of fields they change and
+    written as unsaved instances, so rows are never loaded and untouched columns are never rewritten.
+    """
+    groups = {}
+    for item in items:
+        fields = tuple(sorted(k for k in item if k != "id"))
+        if fields:
+            groups.setdefault(fields, []).append(item)
+    now = timezone.now()
+    for fields, group in groups.items():
+        objs = []
+        for item in group:
+            obj = model(pk=item["id"], **{f: item[f] for f in fields})
+            obj.version = models.F("version") + 1
+            obj.updated_at = now
+            objs.append(obj)
+        model.objects.bulk_update(objs, list(fields) + ["version", "updated_at"], batch_size=CHUNK_SIZE)
+
+
+@transaction.atomic
+def bulk_update_medicines(items):
+    ids = _check_items(Medicine, items)
+    _apply(Medicine, items)
+    record_changes("medicine", ids)
+    record_prices(PriceHistory.KIND_SALE, {item["id"]: item["unit_price"] for item in items if "unit_price" in item}, "bulk")
+    return len(ids)
+
+
+@transaction.atomic
+def bulk_update_batches(items):
+    ids = _check_items(Batch, items)
+    new_available = {item["id"]: item["available_quantity"] for item in items if "available_quantity" in item}
+    if new_available:
+        short = [
+            pk for chunk in _chunks(list(new_available))
+            for pk, reserved in Batch.objects.filter(pk__in=chunk, reserved_quantity__gt=0).values_list("pk", "reserved_quantity")
+            if new_available[pk] < reserved
+        ]
+        if short:
+            raise ValidationError({"detail": "available_quantity would drop below reserved_quantity.", "ids": short[:100]})
+    with bulk_stock_changes():
+        _apply(Batch, items)
+    record_changes("batch", ids)
+    # stock and the medicine batch summary (expiry, cost) depend on these fields
+    touched = [item["id"] for item in items if SUMMARY_FIELDS.intersection(item)]
+    if touched:
+        medicine_ids = set()
+        for chunk in _chunks(touched):
+            medicine_ids.update(Batch.objects.filter(pk__in=chunk).values_list("medicine_id", flat=True))
+        recompute_total_stock_bulk(medicine_ids)
+    return len(ids)
+
+
+@transaction.atomic
+def bulk_delete_batches(queryset):
+    """
+    Delete in chunks with the per-row signal work switched off, then recompute every affected
+    medicine's totals once, in one grouped statement.
+    """
+    deleted = 0
+    medicine_ids = set()
+    with bulk_stock_changes():
+        while True:
+            rows = list(queryset.order_by("pk").values_list("pk", "medicine_id")[:CHUNK_SIZE])
+            if not rows:
+                break
+            ids = [pk for pk, _ in rows]
+            Batch.objects.filter(pk__in=ids).delete()
+            record_changes("batch", ids, ChangeEvent.OP_DELETE)
+            medicine_ids.update(medicine_id for _, medicine_id in rows)
+            deleted += len(ids)
+    recompute_total_stock_bulk(medicine_ids)
+    return deleted
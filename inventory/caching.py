@@ -0,0 +1,124 @@
+"""
+Conditional GET (ETag / Last-Modified / 304) for catalog endpoints.
+
+Validators come from cheap stamps, never from the serialized body:
+- lists: per table the response reads, its settled ChangeEvent mark (changes.safe_cursor) plus the newest id
+  and the number of events above the mark; the change log is written by inventory.signals on every write,
+  so it doubles as a per-table version counter, and a transaction committing late (an id below the newest)
+  still changes the count
+- details: the row's own version/updated_at (plus related rows' newest updated_at) in one values() query
+
+List ETags also fold in the full path (page, filters, ordering, ?fields) and the negotiated media type, so
+two representations of the same table state never share a validator.
+"""
+import hashlib
+
+from django.conf import settings
+from django.db import models
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from .changes import horizon, safe_cursor
+from .models import ChangeEvent
+
+
+def table_stamp(resources):
+    """
+    Opaque token that changes whenever any of the given tables (change-feed resource names) changes.
+    """
+    parts = []
+    for resource in resources:
+        mark = safe_cursor(resource)
+        recent = ChangeEvent.objects.filter(resource=resource, pk__gt=mark).aggregate(latest=models.Max("pk"), n=models.Count("pk"))
+        parts.append(f"{mark}.{recent['latest'] or 0}.{recent['n']}")
+    # compaction may drop a table's newest tombstone; folding in the horizon keeps the stamp from going backwards
+    parts.append(str(horizon()))
+    return "-".join(parts)
+
+
+class ConditionalGetMixin:
+    """
+    Adds ETag / Last-Modified to GET responses and answers If-None-Match / If-Modified-Since with 304
+    before the view loads or serializes anything.
+
+    Views set `stamp_resources` (list views) or override `get_validators()` (detail views), and may set
+    `cache_control` (kwargs for patch_cache_control). INVENTORY_CACHE_CONTROL[<view class name>] overrides it.
+    """
+    stamp_resources = ()
+    cache_control = {"private": True, "no_cache": True}
+
+    def get_validators(self):
+        """
+        Returns (etag, last_modified datetime or None). etag None disables conditional handling.
+        """
+        if self.stamp_resources:
+            return f'"t{table_stamp(self.stamp_resources)}.{self.representation_key()}"', None
+        return None, None
+
+    def representation_key(self):
+        variant = f"{self.request.get_full_path()} {self.request.accepted_media_type}"
+        return hashlib.blake2b(variant.encode(), digest_size=8).hexdigest()
+
+    def get_cache_control(self):
+        overrides = getattr(settings, "INVENTORY_CACHE_CONTROL", {})
+        return overrides.get(type(self).__name__, self.cache_control)
+
+    def get(self, request, *args, **kwargs):
+        etag, last_modified = self.get_validators()
+        response = None
+        if etag is not None or last_modified is not None:
+            response = get_conditional_response(
+                request._request,
+                etag=etag,
+                last_modified=int(last_modified.timestamp()) if last_modified else None,
+            )
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        if etag is not None and response.status_code in (200, 304):
+            response["ETag"] = etag
+        if last_modified is not None and response.status_code in (200, 304):
+            response["Last-Modified"] = http_date(last_modified.timestamp())
+        patch_cache_control(response, **self.get_cache_control())
+        patch_vary_headers(response, ["Accept", "Authorization"])
+        return response
+
+
+def latest(*stamps):
+    stamps = [s for s in stamps if s is not None]
+    return max(stamps) if stamps else None
+
+
+class MedicineValidatorsMixin:
+    """
+    Medicine detail: ETag "<version>.<related stamp>". The version part is what If-Match compares
+    (see concurrency.parse_if_match); the rest tracks the nested category and batches.
+    """
+    def get_validators(self):
+        row = (
+            self.get_queryset().model.objects.filter(pk=self.kwargs["pk"])
+            .annotate(batches_at=models.Max("batches__updated_at"))
+            .values_list("version", "updated_at", "batches_at", "category__updated_at")
+            .first()
+        )
+        if row is None:
+            return None, None
+        version, updated_at, batches_at, category_at = row
+        modified = latest(updated_at, batches_at, category_at)
+        return f'"{version}.{int(modified.timestamp() * 1000000)}"', modified
+
+
+class RowValidatorsMixin:
+    """
+    Detail views of models with updated_at (and optionally version): validators from that one row.
+    """
+    def get_validators(self):
+        model = self.get_queryset().model
+        has_version = any(f.name == "version" for f in model._meta.concrete_fields)
+        fields = ("updated_at", "version") if has_version else ("updated_at",)
+        row = model.objects.filter(pk=self.kwargs["pk"]).values_list(*fields).first()
+        if row is None:
+            return None, None
+        updated_at = row[0]
+        if has_version:
+            return f'"{row[1]}.{int(updated_at.timestamp() * 1000000)}"', updated_at
+        return f'"{int(updated_at.timestamp() * 1000000)}"', updated_at
@@ -0,0 +1,153 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone
+
+from .models import Batch, Category, ChangeEvent, JobCheckpoint, Medicine, PurchaseOrder, Supplier
+
+# compact row shape shipped for upserts — flat columns only, no nested batches
+FEED_FIELDS = {
+    "medicine": ("id", "sku", "name", "category_id", "unit_price", "total_stock", "reorder_level", "is_active", "version"),
+    "batch": ("id", "medicine_id", "batch_number", "quantity", "available_quantity", "reserved_quantity",
+              "purchase_price", "supplier_id", "location_id", "received_date", "expiry_date", "version"),
+    "category": ("id", "name", "description"),
+    "supplier": ("id", "name", "contact_email", "phone", "address", "notes"),
+    "purchaseorder": ("id", "supplier_id", "status", "created_at", "note"),
+}
+
+FEED_MODELS = {
+    "medicine": Medicine,
+    "batch": Batch,
+    "category": Category,
+    "supplier": Supplier,
+    "purchaseorder": PurchaseOrder,
+}
+
+HORIZON_CHECKPOINT = "change_feed_horizon"
+DEFAULT_SETTLE = timedelta(seconds=60)
+
+
+def record_change(resource, object_id, op=ChangeEvent.OP_UPSERT):
+    ChangeEvent.objects.create(resource=resource, object_id=object_id, op=op)
+
+
+def record_changes(resource, object_ids, op=ChangeEvent.OP_UPSERT):
+    now = timezone.now()
+    ChangeEvent.objects.bulk_create(
+        [ChangeEvent(resource=resource, object_id=pk, op=op, created_at=now) for pk in object_ids],
+        batch_size=1000,
+    )
+
+
+def horizon():
+    """
+    Highest cursor whose tombstones may have been compacted away; older cursors must resync.
+    """
+    cp = JobCheckpoint.objects.filter(name=HORIZON_CHECKPOINT).values_list("value", flat=True).first()
+    return (cp or {}).get("cursor", 0)
+
+
+def settle_window():
+    return getattr(settings, "INVENTORY_CHANGE_SETTLE", DEFAULT_SETTLE)
+
+
+def safe_cursor(resource=None):
+    """
+    Low-water mark of the change log: the newest event (of `resource`, or of any resource) recorded more
+    than INVENTORY_CHANGE_SETTLE ago. Event ids are assigned at INSERT, not at commit, so a transaction
+    still open can commit an id below the newest visible one; cursors and stamps never move past this
+    mark, which assumes no transaction stays open longer than the settle window after recording a change.
+    """
+    events = ChangeEvent.objects.filter(created_at__lte=timezone.now() - settle_window())
+    if resource is not None:
+        events = events.filter(resource=resource)
+    return events.order_by("-created_at", "-id").values_list("id", flat=True).first() or 0
+
+
+def read_changes(since, limit):
+    """
+    Events after `since`, at most `limit` of them, collapsed to the latest event per object and
+    joined to the current row values with one values() query per resource.
+    Returns (events, next_cursor, has_more).
+
+    Events above safe_cursor() are delivered but the cursor stops at the mark, so they come again on the
+    next poll (with whatever committed below them meanwhile); upserts and deletes are idempotent.
+    """
+    rows = list(
+        ChangeEvent.objects.filter(pk__gt=since).order_by("pk").values_list("pk", "resource", "object_id", "op")[:limit + 1]
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if not rows:
+        return [], since, False
+    next_cursor = min(rows[-1][0], max(since, safe_cursor()))
+    if next_cursor < rows[-1][0]:
+        has_more = False  # the rest is still settling; poll again later
+
+    latest = {}
+    for cursor, resource, object_id, op in rows:
+        latest[(resource, object_id)] = (cursor, op)
+
+    upserts = {}
+    for (resource, object_id), (_, op) in latest.items():
+        if op == ChangeEvent.OP_UPSERT and resource in FEED_MODELS:
+            upserts.setdefault(resource, []).append(object_id)
+    current = {}
+    for resource, ids in upserts.items():
+        for row in FEED_MODELS[resource].objects.filter(pk__in=ids).values(*FEED_FIELDS[resource]):
+            for field, value in row.items():
+                if isinstance(value, Decimal):
+                    row[field] = str(value)  # same wire format as the DRF serializers
+            current[(resource, row["id"])] = row
+
+    events = []
+    for (resource, object_id), (cursor, op) in sorted(latest.items(), key=lambda kv: kv[1][0]):
+        if op == ChangeEvent.OP_UPSERT:
+            data = current.get((resource, object_id))
+            if data is None:
+                continue  # deleted since; its delete event is in this page or a later one
+            events.append({"cursor": cursor, "resource": resource, "id": object_id, "op": op, "data": data})
+        else:
+            events.append({"cursor": cursor, "resource": resource, "id": object_id, "op": op})
+    return events, next_cursor, has_more
+
+
+def compact(retention, chunk_size=10000):
+    """
+    1. Drop events superseded by a newer event for the same object (safe for every cursor). Only at or
+       below safe_cursor(): table_stamp() counts the events above it.
+    2. Drop tombstones older than `retention` and advance the horizon past them.
+    Works through the log in id ranges so no statement touches more than chunk_size events.
+    Returns (superseded_deleted, tombstones_deleted).
+    """
+    bounds = ChangeEvent.objects.aggregate(lo=models.Min("pk"), hi=models.Max("pk"))
+    bounds["hi"] = min(bounds["hi"] or 0, safe_cursor())
+    superseded = 0
+    if bounds["lo"] is not None:
+        newer = ChangeEvent.objects.filter(
+            resource=models.OuterRef("resource"), object_id=models.OuterRef("object_id"), pk__gt=models.OuterRef("pk"),
+        )
+        start = bounds["lo"]
+        while start <= bounds["hi"]:
+            superseded += ChangeEvent.objects.filter(
+                pk__gte=start, pk__lt=min(start + chunk_size, bounds["hi"] + 1)
+            ).filter(models.Exists(newer)).delete()[0]
+            start += chunk_size
+
+    cutoff = timezone.now() - retention
+    tombstones = 0
+    while True:
+        with transaction.atomic():
+            ids = list(
+                ChangeEvent.objects.filter(op=ChangeEvent.OP_DELETE, created_at__lt=cutoff)
+                .order_by("pk").values_list("pk", flat=True)[:chunk_size]
+            )
+            if not ids:
+                break
+            tombstones += ChangeEvent.objects.filter(pk__in=ids).delete()[0]
+            cp, _ = JobCheckpoint.objects.get_or_create(name=HORIZON_CHECKPOINT)
+            cp.value = {"cursor": max(ids[-1], cp.value.get("cursor", 0))}
+            cp.save(update_fields=["value", "updated_at"])
+    return superseded, tombstones
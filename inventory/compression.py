@@ -0,0 +1,246 @@
+"""
+Response compression with Accept-Encoding negotiation: zstd, br and gzip, whichever are importable
+(gzip always is), in the server's order of preference among those the client accepts.
+
+- Buffered responses under MIN_SIZE bytes go out as-is (not worth the CPU), and so do bodies that
+  wouldn't shrink.
+- Streaming responses (the CSV exports, inventory.exports) are compressed chunk by chunk: the first
+  MIN_SIZE bytes are read ahead to decide, then the compressor is sync-flushed every FLUSH_BYTES of
+  input, so the client receives data while the export is still being generated and memory stays flat.
+  Async streaming content (ASGI) is compressed the same way, without the read-ahead.
+- Event streams, already-encoded bodies and compressed media types are left alone. ETags are weakened
+  on compressed responses, as Django's GZipMiddleware does.
+- BREACH: responses that carry secrets next to request-controlled text are never compressed: HTML (the
+  browsable API and admin embed the CSRF token) and the EXCLUDE_URL_NAMES views (JWT login / refresh).
+  gzip output also gets a random-length (0..MAX_RANDOM_BYTES) FNAME header field, as in Django's
+  GZipMiddleware, so lengths don't map one-to-one to contents; br and zstd have no such field and rely on
+  the exclusions.
+"""
+import itertools
+import secrets
+import struct
+import zlib
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional
+    zstandard = None
+
+DEFAULTS = {
+    "ENABLED": True,
+    "ENCODINGS": ["zstd", "br", "gzip"],  # preference order; missing libraries are skipped
+    "MIN_SIZE": 1024,
+    "FLUSH_BYTES": 64 * 1024,
+    "GZIP_LEVEL": 6,
+    "BROTLI_QUALITY": 4,
+    "ZSTD_LEVEL": 3,
+    "MAX_RANDOM_BYTES": 100,
+    "EXCLUDE_URL_NAMES": ["login", "refresh", "register"],
+}
+
+SKIP_CONTENT_TYPES = ("text/html", "text/event-stream", "image/", "video/", "audio/", "application/zip", "application/gzip")
+
+
+def get_setting(name):
+    return getattr(settings, "INVENTORY_COMPRESSION", {}).get(name, DEFAULTS[name])
+
+
+def gzip_header(max_random_bytes):
+    # RFC 1952 member header; FNAME holds the random padding (mtime 0, OS unknown)
+    padding = secrets.token_hex(max_random_bytes)[:secrets.randbelow(max_random_bytes + 1)].encode()
+    if not padding:
+        return b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff"
+    return b"\x1f\x8b\x08\x08\x00\x00\x00\x00\x00\xff" + padding + b"\x00"
+
+
+class GzipCodec:
+    # raw deflate with the gzip framing written here, so the header can carry the padding
+    def __init__(self):
+        self._obj = zlib.compressobj(get_setting("GZIP_LEVEL"), zlib.DEFLATED, -zlib.MAX_WBITS)
+        self._header = gzip_header(get_setting("MAX_RANDOM_BYTES"))
+        self._crc = 0
+        self._size = 0
+
+    def _take_header(self):
+        header, self._header = self._header, b""
+        return header
+
+    def compress(self, data):
+        self._crc = zlib.crc32(data, self._crc)
+        self._size += len(data)
+        return self._take_header() + self._obj.compress(data)
+
+    def flush(self):
+        return self._take_header() + self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        trailer = struct.pack("<II", self._crc, self._size & 0xFFFFFFFF)
+        return self._take_header() + self._obj.flush(zlib.Z_FINISH) + trailer
+
+
+class BrotliCodec:
+    def __init__(self):
+        self._obj = brotli.Compressor(quality=get_setting("BROTLI_QUALITY"))
+
+    def compress(self, data):
+        return self._obj.process(data)
+
+    def flush(self):
+        return self._obj.flush()
+
+    def finish(self):
+        return self._obj.finish()
+
+
+class ZstdCodec:
+    def __init__(self):
+        self._obj = zstandard.ZstdCompressor(level=get_setting("ZSTD_LEVEL")).compressobj()
+
+    def compress(self, data):
+        return self._obj.compress(data)
+
+    def flush(self):
+        return self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+CODECS = {"gzip": GzipCodec}
+if brotli is not None:
+    CODECS["br"] = BrotliCodec
+if zstandard is not None:
+    CODECS["zstd"] = ZstdCodec
+
+
+def available():
+    return [name for name in get_setting("ENCODINGS") if name in CODECS]
+
+
+def negotiate(accept_encoding):
+    """
+    The first available() encoding the client accepts (q > 0), or None.
+    """
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name] = q
+    for name in available():
+        if accepted.get(name, accepted.get("*", 0.0)) > 0:
+            return name
+    return None
+
+
+def compress_stream(chunks, encoding):
+    codec = CODECS[encoding]()
+    flush_bytes = get_setting("FLUSH_BYTES")
+    pending = 0
+    for chunk in chunks:
+        out = codec.compress(chunk)
+        pending += len(chunk)
+        if pending >= flush_bytes:
+            out += codec.flush()
+            pending = 0
+        if out:
+            yield out
+    yield codec.finish()
+
+
+async def compress_async_stream(chunks, encoding):
+    codec = CODECS[encoding]()
+    flush_bytes = get_setting("FLUSH_BYTES")
+    pending = 0
+    async for chunk in chunks:
+        out = codec.compress(chunk)
+        pending += len(chunk)
+        if pending >= flush_bytes:
+            out += codec.flush()
+            pending = 0
+        if out:
+            yield out
+    yield codec.finish()
+
+
+def read_ahead(chunks, size):
+    """
+    Returns (head chunks, rest iterator or None when the stream ended before `size` bytes).
+    """
+    head = []
+    seen = 0
+    for chunk in chunks:
+        head.append(chunk)
+        seen += len(chunk)
+        if seen >= size:
+            return head, chunks
+    return head, None
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses for clients that send a matching Accept-Encoding. Goes near the top of
+    MIDDLEWARE so it sees the final body.
+    """
+    def __init__(self, get_response):
+        if not get_setting("ENABLED"):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.process_response(request, self.get_response(request))
+
+    def process_response(self, request, response):
+        if response.has_header("Content-Encoding") or response.get("Content-Type", "").startswith(SKIP_CONTENT_TYPES):
+            return response
+        match = getattr(request, "resolver_match", None)
+        if match is not None and match.url_name in get_setting("EXCLUDE_URL_NAMES"):
+            return response
+        min_size = get_setting("MIN_SIZE")
+        if not response.streaming and len(response.content) < min_size:
+            return response
+        patch_vary_headers(response, ("Accept-Encoding",))
+        encoding = negotiate(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = compress_async_stream(response.streaming_content, encoding)
+            else:
+                head, rest = read_ahead(iter(response.streaming_content), min_size)
+                if rest is None:
+                    response.streaming_content = head
+                    return response
+                response.streaming_content = compress_stream(itertools.chain(head, rest), encoding)
+            del response.headers["Content-Length"]
+        else:
+            codec = CODECS[encoding]()
+            compressed = codec.compress(response.content) + codec.finish()
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers["Content-Length"] = str(len(compressed))
+
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = encoding
+        return response
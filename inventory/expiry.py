@@ -0,0 +1,80 @@
+import time
+
+from django.db import models, transaction
+from django.utils import timezone
+
+from .changes import record_changes
+from .concurrency import write_stamp
+from .models import Batch, JobCheckpoint, Reservation, StockTransaction
+from .signals import recompute_total_stock_bulk
+
+WRITE_OFF_NOTE = "Expired batch write-off"
+
+
+def checkpoint_name(as_of):
+    return f"expire_batches:{as_of.isoformat()}"
+
+
+def write_off_expired(as_of=None, chunk_size=1000, dry_run=False, resume=True, pause=0.0, progress=None):
+    """
+    Zero every batch with expiry_date < as_of and stock left, chunk by chunk in (expiry_date, id) order
+    through batch_live_expiry_idx. Per chunk, in one short transaction:
+      - lock the chunk's rows,
+      - bulk_create one TYPE_ADJUST transaction per batch for the written-off quantity,
+      - zero available/reserved with a single UPDATE and expire holds on those batches,
+      - recompute the affected medicines' totals with one grouped UPDATE.
+    The keyset position is checkpointed after each chunk so an interrupted run resumes where it stopped;
+    the checkpoint is cleared once the run completes.
+    Returns (batches, units).
+    """
+    as_of = as_of or timezone.localdate()
+    name = checkpoint_name(as_of)
+    cursor = None
+    if resume and not dry_run:
+        saved = JobCheckpoint.objects.filter(name=name).values_list("value", flat=True).first()
+        if saved:
+            cursor = (saved["expiry_date"], saved["id"])
+
+    total_batches = total_units = 0
+    while True:
+        with transaction.atomic():
+            qs = Batch.objects.filter(expiry_date__lt=as_of, available_quantity__gt=0)
+            if cursor is not None:
+                qs = qs.filter(models.Q(expiry_date__gt=cursor[0]) | models.Q(expiry_date=cursor[0], pk__gt=cursor[1]))
+            if not dry_run:
+                qs = qs.select_for_update()
+            rows = list(
+                qs.order_by("expiry_date", "pk")
+                .values_list("pk", "medicine_id", "location_id", "available_quantity", "expiry_date")[:chunk_size]
+            )
+            if not rows:
+                break
+            last = rows[-1]
+            cursor = (last[4].isoformat(), last[0])
+            total_batches += len(rows)
+            total_units += sum(r[3] for r in rows)
+
+            if not dry_run:
+                ids = [r[0] for r in rows]
+                now = timezone.now()
+                StockTransaction.objects.bulk_create([
+                    StockTransaction(
+                        medicine_id=medicine_id, batch_id=pk, location_id=location_id,
+                        transaction_type=StockTransaction.TYPE_ADJUST, quantity=-available,
+                        note=WRITE_OFF_NOTE, performed_at=now,
+                    )
+                    for pk, medicine_id, location_id, available, _ in rows
+                ])
+                Batch.objects.filter(pk__in=ids).update(available_quantity=0, reserved_quantity=0, **write_stamp())
+                Reservation.objects.filter(batch_id__in=ids, status=Reservation.STATUS_ACTIVE).update(status=Reservation.STATUS_EXPIRED)
+                recompute_total_stock_bulk({r[1] for r in rows})
+                record_changes("batch", ids)
+                JobCheckpoint.objects.update_or_create(name=name, defaults={"value": {"expiry_date": cursor[0], "id": cursor[1]}})
+        if progress:
+            progress(total_batches, total_units)
+        if pause:
+            time.sleep(pause)
+    if not dry_run:
+        # finished: a later run re-scans from the start (written-off rows have already left the index)
+        JobCheckpoint.objects.filter(name=name).delete()
+    return total_batches, total_units
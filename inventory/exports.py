@@ -0,0 +1,44 @@
+"""
+Streaming CSV exports.
+
+Rows are read with values_list().iterator() (a server-side cursor where the backend has one) and encoded
+in chunks of about CHUNK_BYTES, so memory stays flat whatever the table size and the first bytes leave
+before the query has finished. Compression is applied on the way out by inventory.compression.
+"""
+import csv
+import io
+
+from django.http import StreamingHttpResponse
+
+CHUNK_BYTES = 64 * 1024
+ITERATOR_CHUNK_SIZE = 2000
+
+MEDICINE_EXPORT_FIELDS = (
+    "id", "sku", "name", "category__name", "unit_price", "total_stock", "reorder_level", "is_active",
+    "next_expiry", "live_batches", "average_cost",
+)
+TRANSACTION_EXPORT_FIELDS = (
+    "id", "performed_at", "transaction_type", "quantity", "medicine_id", "medicine__sku", "batch_id",
+    "location_id", "performed_by__email", "note",
+)
+
+
+def csv_chunks(fields, rows, chunk_bytes=CHUNK_BYTES):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([field.replace("__", "_") for field in fields])
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= chunk_bytes:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def stream_csv(queryset, fields, filename):
+    rows = queryset.values_list(*fields).iterator(chunk_size=ITERATOR_CHUNK_SIZE)
+    response = StreamingHttpResponse(csv_chunks(fields, rows), content_type="text/csv; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,187 @@
+"""
+Per-medicine demand forecasts from daily sales (TYPE_OUT transactions).
+
+Daily units sold over the last HISTORY_DAYS come from one grouped query, streamed in medicine order, and
+are laid out CHUNK_SIZE medicines at a time as a dense (medicine x day) matrix. Every row of a chunk is
+forecast at once:
+
+- weekday factors: the medicine's mean on each weekday over its overall daily mean (1.0 = average day, and
+  for weekdays a window shorter than a week doesn't cover)
+- level: simple exponential smoothing (ALPHA) of the deseasonalized series, starting at the window mean;
+  days on a weekday the medicine never sells on carry no information and leave the level alone
+- forecast: level x the weekday factor, for each of the HORIZON_DAYS after the history window
+
+With NumPy the smoothing is one vector operation per day across the chunk; without it the same arithmetic
+runs per medicine in pure Python. Results replace the MedicineForecast rows in bulk, chunk by chunk, and
+rows of medicines that had no sales in the window are removed once the run completes.
+"""
+import datetime
+
+from django.conf import settings
+from django.db import models
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import MedicineForecast, StockTransaction
+
+try:
+    import numpy
+except ImportError:  # optional
+    numpy = None
+
+DEFAULTS = {
+    "HISTORY_DAYS": 182,
+    "HORIZON_DAYS": 28,
+    "ALPHA": 0.2,
+    "CHUNK_SIZE": 5000,
+}
+
+ITERATOR_CHUNK_SIZE = 20000
+ENGINES = ("numpy", "python")
+UPDATE_FIELDS = ("method", "as_of", "history_days", "level", "weekday_factors", "daily", "horizon_total", "computed_at")
+
+
+def get_setting(name):
+    return getattr(settings, "INVENTORY_FORECAST", {}).get(name, DEFAULTS[name])
+
+
+def default_engine():
+    return "numpy" if numpy is not None else "python"
+
+
+def daily_sales(start, end):
+    """
+    (medicine_id, day, units) for start <= day <= end (local dates), ordered by medicine and day.
+    """
+    since = timezone.make_aware(datetime.datetime.combine(start, datetime.time.min))
+    until = timezone.make_aware(datetime.datetime.combine(end + datetime.timedelta(days=1), datetime.time.min))
+    return (
+        StockTransaction.objects.filter(transaction_type=StockTransaction.TYPE_OUT, performed_at__gte=since, performed_at__lt=until)
+        .annotate(day=TruncDate("performed_at"))
+        .values("medicine_id", "day")
+        .annotate(units=models.Sum("quantity"))
+        .order_by("medicine_id", "day")
+        .values_list("medicine_id", "day", "units")
+        .iterator(chunk_size=ITERATOR_CHUNK_SIZE)
+    )
+
+
+def chunked_by_medicine(rows, size):
+    """
+    Groups the ordered daily rows into lists of (medicine_id, [(day, units), ...]) of `size` medicines.
+    """
+    chunk = []
+    current = None
+    for medicine_id, day, units in rows:
+        if medicine_id != current:
+            if len(chunk) == size:
+                yield chunk
+                chunk = []
+            current = medicine_id
+            chunk.append((medicine_id, []))
+        chunk[-1][1].append((day, units))
+    if chunk:
+        yield chunk
+
+
+def forecast_numpy(matrix, first_weekday, horizon, alpha):
+    """
+    matrix: (medicines x days) float array. Returns (level, weekday factors (n x 7), daily (n x horizon)).
+    """
+    days = matrix.shape[1]
+    weekday = (first_weekday + numpy.arange(days)) % 7
+    mean = matrix.mean(axis=1)
+    counts = numpy.bincount(weekday, minlength=7)
+    sums = numpy.stack([matrix[:, weekday == w].sum(axis=1) for w in range(7)], axis=1)
+    by_weekday = numpy.divide(sums, counts, out=numpy.zeros_like(sums), where=counts > 0)
+    # weekdays outside a short window (HISTORY_DAYS < 7) have no data: neutral factor
+    factors = numpy.divide(
+        by_weekday, mean[:, None], out=numpy.ones_like(by_weekday), where=(mean[:, None] > 0) & (counts > 0),
+    )
+    column_factors = factors[:, weekday]
+    deseasonalized = numpy.divide(matrix, column_factors, out=numpy.zeros_like(matrix), where=column_factors > 0)
+    level = mean.copy()
+    for j in range(days):
+        level = numpy.where(column_factors[:, j] > 0, alpha * deseasonalized[:, j] + (1 - alpha) * level, level)
+    ahead = (first_weekday + days + numpy.arange(horizon)) % 7
+    return level, factors, level[:, None] * factors[:, ahead]
+
+
+def forecast_python(series, first_weekday, horizon, alpha):
+    """
+    forecast_numpy for one medicine's list of daily units.
+    """
+    days = len(series)
+    mean = sum(series) / days
+    totals = [0.0] * 7
+    counts = [0] * 7
+    for j, units in enumerate(series):
+        totals[(first_weekday + j) % 7] += units
+        counts[(first_weekday + j) % 7] += 1
+    factors = [totals[w] / counts[w] / mean if mean and counts[w] else 1.0 for w in range(7)]
+    level = mean
+    for j, units in enumerate(series):
+        factor = factors[(first_weekday + j) % 7]
+        if factor > 0:
+            level = alpha * units / factor + (1 - alpha) * level
+    return level, factors, [level * factors[(first_weekday + days + k) % 7] for k in range(horizon)]
+
+
+def forecast_chunk(chunk, start, history_days, horizon, alpha, engine):
+    """
+    Yields (medicine_id, level, weekday factors, daily) for one chunk from chunked_by_medicine().
+    """
+    first_weekday = start.weekday()
+    if engine == "numpy":
+        matrix = numpy.zeros((len(chunk), history_days))
+        for row, (_, sales) in enumerate(chunk):
+            for day, units in sales:
+                matrix[row, (day - start).days] = units
+        levels, factors, daily = forecast_numpy(matrix, first_weekday, horizon, alpha)
+        for row, (medicine_id, _) in enumerate(chunk):
+            yield medicine_id, float(levels[row]), factors[row].tolist(), daily[row].tolist()
+        return
+    for medicine_id, sales in chunk:
+        series = [0.0] * history_days
+        for day, units in sales:
+            series[(day - start).days] = units
+        yield (medicine_id, *forecast_python(series, first_weekday, horizon, alpha))
+
+
+def run_forecast(as_of=None, engine=None, progress=None):
+    """
+    Forecast every medicine with sales in the HISTORY_DAYS ending at as_of (default: yesterday, the last
+    complete day) and store the results. Returns the number of medicines forecast.
+    """
+    engine = engine or default_engine()
+    if engine == "numpy" and numpy is None:
+        raise RuntimeError("NumPy is not installed; use the python engine.")
+    as_of = as_of or timezone.localdate() - datetime.timedelta(days=1)
+    history_days = get_setting("HISTORY_DAYS")
+    horizon = get_setting("HORIZON_DAYS")
+    alpha = get_setting("ALPHA")
+    start = as_of - datetime.timedelta(days=history_days - 1)
+    started = timezone.now()
+
+    done = 0
+    for chunk in chunked_by_medicine(daily_sales(start, as_of), get_setting("CHUNK_SIZE")):
+        now = timezone.now()
+        forecasts = [
+            MedicineForecast(
+                medicine_id=medicine_id, method=MedicineForecast.METHOD_SES_WEEKLY, as_of=as_of,
+                history_days=history_days, level=round(level, 3),
+                weekday_factors=[round(f, 3) for f in factors],
+                daily=[round(units, 2) for units in daily],
+                horizon_total=round(sum(daily), 2), computed_at=now,
+            )
+            for medicine_id, level, factors, daily in forecast_chunk(chunk, start, history_days, horizon, alpha, engine)
+        ]
+        MedicineForecast.objects.bulk_create(
+            forecasts, update_conflicts=True, unique_fields=["medicine"], update_fields=UPDATE_FIELDS,
+        )
+        done += len(forecasts)
+        if progress:
+            progress(done)
+    # medicines without sales in the window keep no forecast
+    MedicineForecast.objects.filter(computed_at__lt=started).delete()
+    return done
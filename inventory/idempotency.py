@@ -0,0 +1,248 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+DEFAULTS = {
+    "TTL": timedelta(hours=24),
+    "CACHE_SIZE": 10000,   # completed responses kept in the in-process LRU
+    "WAIT_TIMEOUT": 10.0,  # seconds a duplicate waits for the first request to finish
+    "PENDING_TIMEOUT": 60.0,  # seconds a pending claim holds; then a retry may take the key over
+    "POLL_INTERVAL": 0.05,
+}
+
+def get_setting(name):
+    return getattr(settings, "INVENTORY_IDEMPOTENCY", {}).get(name, DEFAULTS[name])
+
+
+class LRUCache:
+    """
+    Small thread-safe LRU with per-entry expiry; fronts the IdempotencyKey table so replays
+    within the same process don't hit the DB.
+    """
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl_seconds):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl_seconds, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_cache = LRUCache(get_setting("CACHE_SIZE"))
+
+# in-process waiters: duplicates of a request running in this process block on its Event
+# instead of polling the table; requests running in other processes are polled.
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+class LeaseLost(Exception):
+    """
+    The pending claim expired and another request took the key over; this one must not complete it.
+    """
+
+
+def request_fingerprint(request):
+    payload = json.dumps(request.data, sort_keys=True, cls=DjangoJSONEncoder)
+    raw = f"{request.method}\n{request.path}\n{payload}".encode()
+    return hashlib.sha256(raw).hexdigest()
+
+
+def purge_expired(now=None, chunk_size=1000):
+    """
+    Delete expired keys in chunks so a large backlog never holds a long lock. Returns rows deleted.
+    """
+    now = now or timezone.now()
+    deleted = 0
+    while True:
+        ids = list(IdempotencyKey.objects.filter(expires_at__lte=now).values_list("pk", flat=True)[:chunk_size])
+        if not ids:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(pk__in=ids).delete()[0]
+
+
+def lease_expired(row, now):
+    return row.state == IdempotencyKey.STATE_PENDING and row.claimed_at + timedelta(seconds=get_setting("PENDING_TIMEOUT")) <= now
+
+
+class IdempotentCreateMixin:
+    """
+    Honour the Idempotency-Key header on create (POST).
+
+    The first request with a key claims it by inserting a pending row, runs in a transaction,
+    and stores its response in that same transaction, so the stock change and the completed key commit
+    together. A retry with the same key and body gets the stored response back (with
+    Idempotent-Replayed: true) without touching stock again; a retry with a different body gets 422;
+    a concurrent duplicate waits for the first request rather than racing it.
+
+    A pending claim is a lease of PENDING_TIMEOUT seconds from claimed_at: a row left behind by a
+    crashed or killed worker (whose transaction rolled back) is taken over by the next retry, and the
+    completing update is conditional on the claim, so a worker that outlived its lease rolls back.
+    """
+    idempotency_header = "Idempotency-Key"
+
+    def create(self, request, *args, **kwargs):
+        # deferred: purge_idempotency_keys imports this module and has no use for DRF
+        from rest_framework import status
+        from rest_framework.response import Response
+
+        key = request.headers.get(self.idempotency_header)
+        if not key:
+            return super().create(request, *args, **kwargs)
+        if len(key) > 255:
+            return Response({"detail": "Idempotency-Key is too long."}, status=status.HTTP_400_BAD_REQUEST)
+
+        endpoint = request.resolver_match.url_name if request.resolver_match else request.path
+        cache_key = (request.user.pk, endpoint, key)
+        fingerprint = request_fingerprint(request)
+
+        stored = _cache.get(cache_key)
+        if stored is not None:
+            return self._replay(stored, fingerprint)
+
+        in_progress = Response(
+            {"detail": "A request with this Idempotency-Key is still being processed."},
+            status=status.HTTP_409_CONFLICT,
+        )
+        row, claimed_at = self._claim(request.user, endpoint, key, fingerprint)
+        if claimed_at is None:
+            # someone else owns (or owned) this key
+            stored = self._wait_for(row, cache_key)
+            if stored is not None:
+                return self._replay(stored, fingerprint)
+            # released or its lease ran out meanwhile: one more try to take it
+            row, claimed_at = self._claim(request.user, endpoint, key, fingerprint)
+            if claimed_at is None:
+                return in_progress
+
+        claim = IdempotencyKey.objects.filter(
+            user=request.user, endpoint=endpoint, key=key, state=IdempotencyKey.STATE_PENDING, claimed_at=claimed_at,
+        )
+        event = threading.Event()
+        with _inflight_lock:
+            _inflight[cache_key] = event
+        try:
+            try:
+                with transaction.atomic():
+                    response = super().create(request, *args, **kwargs)
+                    if response.status_code < 500:
+                        body = json.loads(json.dumps(response.data, cls=DjangoJSONEncoder))
+                        if not claim.update(state=IdempotencyKey.STATE_DONE, status_code=response.status_code, response_body=body):
+                            raise LeaseLost()
+            except LeaseLost:
+                return in_progress
+            except Exception:
+                # nothing was applied; release the key so the client can retry
+                claim.delete()
+                raise
+            if response.status_code >= 500:
+                claim.delete()
+                return response
+            stored = (fingerprint, response.status_code, body)
+            _cache.set(cache_key, stored, get_setting("TTL").total_seconds())
+            return response
+        finally:
+            with _inflight_lock:
+                _inflight.pop(cache_key, None)
+            event.set()
+
+    def _claim(self, user, endpoint, key, fingerprint):
+        """
+        Insert the pending row, or take over one whose lease ran out. Returns (row, claimed_at):
+        claimed_at is set when we own the key, else row is the existing one (None if it vanished).
+        """
+        now = timezone.now()
+        existing = None
+        for _ in range(3):
+            try:
+                with transaction.atomic():
+                    IdempotencyKey.objects.create(
+                        user=user, endpoint=endpoint, key=key, request_hash=fingerprint,
+                        created_at=now, claimed_at=now, expires_at=now + get_setting("TTL"),
+                    )
+                return None, now
+            except IntegrityError:
+                existing = IdempotencyKey.objects.filter(user=user, endpoint=endpoint, key=key).first()
+                if existing is None:
+                    continue  # deleted between insert and read; try again
+                if existing.expires_at <= now:
+                    existing.delete()
+                    continue
+                if lease_expired(existing, now):
+                    # abandoned by a crashed or killed worker; conditional, so only one retry wins it
+                    taken = IdempotencyKey.objects.filter(
+                        pk=existing.pk, state=IdempotencyKey.STATE_PENDING, claimed_at=existing.claimed_at,
+                    ).update(claimed_at=now, request_hash=fingerprint)
+                    if taken:
+                        return existing, now
+                    continue
+                return existing, None
+        return existing, None
+
+    def _wait_for(self, row, cache_key):
+        if row is None:
+            return None
+        deadline = time.monotonic() + get_setting("WAIT_TIMEOUT")
+        with _inflight_lock:
+            event = _inflight.get(cache_key)
+        if event is not None:
+            event.wait(get_setting("WAIT_TIMEOUT"))
+        interval = get_setting("POLL_INTERVAL")
+        while True:
+            stored = _cache.get(cache_key)
+            if stored is not None:
+                return stored
+            row = IdempotencyKey.objects.filter(pk=row.pk).first()
+            if row is None:
+                return None  # first request failed and released the key
+            if row.state == IdempotencyKey.STATE_DONE:
+                stored = (row.request_hash, row.status_code, row.response_body)
+                ttl = (row.expires_at - timezone.now()).total_seconds()
+                if ttl > 0:
+                    _cache.set(cache_key, stored, ttl)
+                return stored
+            if lease_expired(row, timezone.now()) or time.monotonic() >= deadline:
+                return None
+            time.sleep(interval)
+            interval = min(interval * 2, 0.5)
+
+    def _replay(self, stored, fingerprint):
+        from rest_framework import status
+        from rest_framework.response import Response
+
+        request_hash, status_code, body = stored
+        if request_hash != fingerprint:
+            return Response(
+                {"detail": "Idempotency-Key was already used with a different request body."},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        return Response(body, status=status_code, headers={"Idempotent-Replayed": "true"})
@@ -0,0 +1,196 @@
+"""
+Opt-in query profiling built on connection.execute_wrapper.
+
+Every SQL statement run inside a request (QueryProfilingMiddleware) or a profiled() block is recorded with
+its fingerprint, duration and origin (view name plus any track_origin() scopes such as signal handlers)
+into a bounded ring buffer and a per-fingerprint aggregate with a latency histogram. Statements slower than
+SLOW_QUERY_MS are logged to the "inventory.slow_queries" logger.
+
+When INVENTORY_QUERY_PROFILING["ENABLED"] is false the middleware removes itself at startup and
+track_origin() is a plain call, so the cost is one flag check per decorated call.
+"""
+import contextvars
+import functools
+import logging
+import re
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger("inventory.slow_queries")
+
+DEFAULTS = {
+    "ENABLED": False,
+    "SLOW_QUERY_MS": 200,
+    "RING_SIZE": 10000,
+    "TOP_N": 20,
+}
+
+# upper bounds (ms) of the histogram buckets; the last bucket is open-ended
+BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000)
+
+def get_setting(name):
+    return getattr(settings, "INVENTORY_QUERY_PROFILING", {}).get(name, DEFAULTS[name])
+
+def enabled():
+    return get_setting("ENABLED")
+
+
+_origin = contextvars.ContextVar("inventory_query_origin", default=())
+
+_IN_LIST = re.compile(r"\((?:\s*%s\s*,)+\s*%s\s*\)")
+_NUMBER = re.compile(r"\b\d+\b")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_SPACE = re.compile(r"\s+")
+
+@functools.lru_cache(maxsize=4096)
+def fingerprint(sql):
+    """
+    Query shape: literals and placeholder lists collapsed, whitespace normalized.
+    """
+    shape = _STRING.sub("?", sql)
+    shape = _IN_LIST.sub("(...)", shape)
+    shape = shape.replace("%s", "?")
+    shape = _NUMBER.sub("?", shape)
+    return _SPACE.sub(" ", shape).strip()
+
+
+class QueryStats:
+    def __init__(self, ring_size):
+        self.lock = threading.Lock()
+        self.recent = deque(maxlen=ring_size)
+        self.shapes = {}
+
+    def record(self, sql, duration, origin):
+        shape = fingerprint(sql)
+        ms = duration * 1000.0
+        bucket = len(BUCKETS_MS)
+        for i, bound in enumerate(BUCKETS_MS):
+            if ms < bound:
+                bucket = i
+                break
+        with self.lock:
+            self.recent.append((time.time(), shape, ms, origin))
+            agg = self.shapes.get(shape)
+            if agg is None:
+                agg = self.shapes[shape] = {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "histogram": [0] * (len(BUCKETS_MS) + 1), "origins": {}}
+            agg["count"] += 1
+            agg["total_ms"] += ms
+            if ms > agg["max_ms"]:
+                agg["max_ms"] = ms
+            agg["histogram"][bucket] += 1
+            agg["origins"][origin] = agg["origins"].get(origin, 0) + 1
+
+    def top(self, n):
+        with self.lock:
+            items = sorted(self.shapes.items(), key=lambda kv: kv[1]["total_ms"], reverse=True)[:n]
+            result = []
+            for shape, agg in items:
+                result.append({
+                    "query": shape,
+                    "count": agg["count"],
+                    "total_ms": round(agg["total_ms"], 3),
+                    "mean_ms": round(agg["total_ms"] / agg["count"], 3),
+                    "max_ms": round(agg["max_ms"], 3),
+                    "histogram": dict(zip([f"<{b}ms" for b in BUCKETS_MS] + [f">={BUCKETS_MS[-1]}ms"], agg["histogram"])),
+                    "origins": dict(sorted(agg["origins"].items(), key=lambda kv: kv[1], reverse=True)[:5]),
+                })
+            return result, len(self.recent)
+
+    def latest(self, n):
+        with self.lock:
+            items = list(self.recent)[-n:] if n else []
+        return [
+            {"at": at, "query": shape, "ms": round(ms, 3), "origin": origin}
+            for at, shape, ms, origin in reversed(items)
+        ]
+
+    def reset(self):
+        with self.lock:
+            self.recent.clear()
+            self.shapes.clear()
+
+
+stats = QueryStats(get_setting("RING_SIZE"))
+
+
+def _wrapper(execute, sql, params, many, context):
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - start
+        origin = " > ".join(_origin.get()) or "-"
+        stats.record(sql, duration, origin)
+        if duration * 1000.0 >= get_setting("SLOW_QUERY_MS"):
+            logger.warning("slow query %.1f ms [%s] %s", duration * 1000.0, origin, fingerprint(sql))
+
+
+@contextmanager
+def origin_scope(name):
+    token = _origin.set(_origin.get() + (name,))
+    try:
+        yield
+    finally:
+        _origin.reset(token)
+
+
+def track_origin(name):
+    """
+    Decorator: attribute queries run inside the function to `name` (e.g. a signal handler).
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def inner(*args, **kwargs):
+            if not enabled():
+                return func(*args, **kwargs)
+            with origin_scope(name):
+                return func(*args, **kwargs)
+        return inner
+    return decorator
+
+
+@contextmanager
+def profiled(origin=None):
+    """
+    Record queries on every configured connection for the duration (management commands, scripts).
+    """
+    if not enabled():
+        yield
+        return
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(_wrapper))
+        if origin:
+            stack.enter_context(origin_scope(origin))
+        yield
+
+
+class QueryProfilingMiddleware:
+    """
+    Wraps each request's queries with the recorder, tagged with the resolved view name.
+    """
+    def __init__(self, get_response):
+        if not enabled():
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _origin.set(())
+        try:
+            with profiled():
+                return self.get_response(request)
+        finally:
+            _origin.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        name = (match.view_name if match else None) or getattr(view_func, "__name__", "view")
+        # reset in __call__ once the response is built
+        _origin.set((name,))
+        return None
@@ -0,0 +1,45 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from inventory.audit import repair, run_audit
+
+
+class Command(BaseCommand):
+    help = "Check stock integrity (totals, batch quantities, transaction ledger) across medicines in parallel."
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("--range-size", type=int, default=5000, help="Medicines per work unit.")
+        parser.add_argument("--workers", type=int, default=0, help="Worker processes (default: CPU count; 1 = in-process).")
+        parser.add_argument("--report", help="JSON-lines report path. Default: stock_audit-<timestamp>.jsonl")
+        parser.add_argument("--repair", action="store_true", help="Recompute totals and fix negative / over-reserved batches.")
+        parser.add_argument("--repair-ledger", action="store_true", help="Also append ADJUST transactions so the ledger matches batch stock.")
+
+    def handle(self, *args, **options):
+        path = options["report"] or f"stock_audit-{timezone.now():%Y%m%dT%H%M%S}.jsonl"
+        start = time.perf_counter()
+        counts = {}
+        found = []
+        keep = options["repair"] or options["repair_ledger"]
+        with open(path, "w") as report:
+            for (lo, hi), discrepancies in run_audit(options["range_size"], options["workers"] or None):
+                for d in discrepancies:
+                    report.write(json.dumps(d) + "\n")
+                    counts[d["check"]] = counts.get(d["check"], 0) + 1
+                if keep:
+                    found.extend(discrepancies)
+                if options["verbosity"] > 1:
+                    self.stdout.write(f"  medicines {lo}..{hi - 1}: {len(discrepancies)} discrepancies")
+        elapsed = time.perf_counter() - start
+        summary = ", ".join(f"{k}={v}" for k, v in sorted(counts.items())) or "none"
+        self.stdout.write(f"Audit finished in {elapsed:.1f}s; discrepancies: {summary}; report: {path}")
+
+        if keep and found:
+            repaired = repair(found, ledger=options["repair_ledger"])
+            gone = repaired.pop("gone")
+            self.stdout.write(self.style.SUCCESS("Repaired: " + ", ".join(f"{k}={v}" for k, v in sorted(repaired.items()))))
+            if gone:
+                self.stdout.write(f"{gone} discrepancies no longer held on re-check (concurrent writes) and were left alone.")
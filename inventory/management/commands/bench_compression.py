@@ -0,0 +1,88 @@
+import datetime
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory
+
+from inventory import compression
+from inventory.exports import MEDICINE_EXPORT_FIELDS, csv_chunks
+from inventory.renderers import FastJSONRenderer
+
+
+def synthetic_rows(n):
+    rng = random.Random(42)
+    today = datetime.date.today()
+    for i in range(1, n + 1):
+        yield (
+            i, f"SKU-{i:08d}", f"Medicine {i} {rng.choice(['tablets', 'syrup', 'capsules'])} {rng.randint(5, 500)}mg",
+            rng.choice(["Analgesics", "Antibiotics", "Vitamins", None]), Decimal(rng.randint(100, 99999)) / 100,
+            rng.randint(0, 5000), 10, True, today + datetime.timedelta(days=rng.randint(1, 900)), rng.randint(0, 6),
+            Decimal(rng.randint(50, 50000)) / 100,
+        )
+
+
+def transfer(chunks, kbps, rtt):
+    """
+    Client-side (first byte, last byte) seconds for (produced_at, size) chunks over a link of `kbps`:
+    a chunk leaves once it exists and the link is free.
+    """
+    bytes_per_s = kbps * 1000 / 8
+    link_free = 0.0
+    for produced_at, size in chunks:
+        link_free = max(link_free, produced_at) + size / bytes_per_s
+    return rtt + chunks[0][0], rtt + link_free
+
+
+class Command(BaseCommand):
+    help = (
+        "Bandwidth / latency of response compression on an N-row medicine export (streamed CSV) and list "
+        "(buffered JSON), per negotiated encoding, over a simulated slow link."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000)
+        parser.add_argument("--kbps", type=int, default=2000, help="Simulated link bandwidth, kbit/s.")
+        parser.add_argument("--rtt-ms", type=float, default=80.0)
+
+    def handle(self, *args, **options):
+        if not compression.get_setting("ENABLED"):
+            raise CommandError("INVENTORY_COMPRESSION is disabled.")
+        rows = list(synthetic_rows(options["rows"]))
+        records = [dict(zip(MEDICINE_EXPORT_FIELDS, row)) for row in rows]
+        factory = RequestFactory()
+        rtt = options["rtt_ms"] / 1000
+
+        bodies = {
+            "export (streamed CSV)": lambda: StreamingHttpResponse(csv_chunks(MEDICINE_EXPORT_FIELDS, rows), content_type="text/csv"),
+            "list (buffered JSON)": lambda: HttpResponse(
+                FastJSONRenderer().render({"count": len(records), "results": records}), content_type="application/json",
+            ),
+        }
+        self.stdout.write(f"{options['rows']} rows, {options['kbps']} kbit/s, {options['rtt_ms']:.0f} ms RTT; "
+                          f"available encodings: {', '.join(compression.available())}")
+        for label, make in bodies.items():
+            self.stdout.write(f"\n{label}")
+            self.stdout.write(f"  {'encoding':9} {'bytes':>10} {'ratio':>6} {'cpu ms':>8} {'ttfb ms':>8} {'total ms':>9}")
+            baseline = None
+            for encoding in ["identity"] + compression.available():
+                start = time.perf_counter()
+                middleware = compression.CompressionMiddleware(lambda request: make())
+                response = middleware(factory.get("/", HTTP_ACCEPT_ENCODING=encoding))
+                chunks = []
+                if response.streaming:
+                    for chunk in response.streaming_content:
+                        chunks.append((time.perf_counter() - start, len(chunk)))
+                else:
+                    chunks.append((time.perf_counter() - start, len(response.content)))
+                cpu = time.perf_counter() - start
+                size = sum(n for _, n in chunks)
+                ttfb, total = transfer(chunks, options["kbps"], rtt)
+                baseline = baseline or (size, total)
+                self.stdout.write(
+                    f"  {response.get('Content-Encoding', 'identity'):9} {size:10d} {baseline[0] / size:6.1f} {cpu * 1000:8.1f} "
+                    f"{ttfb * 1000:8.0f} {total * 1000:9.0f}"
+                    + ("" if encoding == "identity" else f"  (-{100 - size * 100 / baseline[0]:.0f}% bytes, -{baseline[1] - total:.2f} s)")
+                )
@@ -0,0 +1,76 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from inventory.models import Batch, Category, Medicine
+from inventory.renderers import FastJSONRenderer, orjson
+from inventory.serializers import BatchSerializer, MedicineSerializer
+from inventory.values import BATCH_VALUES_FIELDS, MEDICINE_VALUES_FIELDS, batch_row, medicine_rows
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Compare ModelSerializer + JSONRenderer against values() rows + FastJSONRenderer on synthetic data (rolled back)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--medicines", type=int, default=2000)
+        parser.add_argument("--batches", type=int, default=5, help="Batches per medicine.")
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.seed(options["medicines"], options["batches"])
+                self.run(options["repeat"])
+                raise Rollback()
+        except Rollback:
+            pass
+
+    def seed(self, n_medicines, n_batches):
+        category = Category.objects.create(name="bench-category")
+        meds = Medicine.objects.bulk_create([
+            Medicine(sku=f"bench-{i}", name=f"Bench medicine {i}", category=category, unit_price=Decimal("12.34"), total_stock=n_batches * 10)
+            for i in range(n_medicines)
+        ])
+        Batch.objects.bulk_create([
+            Batch(medicine=m, batch_number=f"b{j}", quantity=10, available_quantity=10, purchase_price=Decimal("5.00"))
+            for m in meds for j in range(n_batches)
+        ], batch_size=5000)
+
+    def best_of(self, repeat, func):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            body = func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, len(body)
+
+    def report(self, label, baseline, fast):
+        (t0, size0), (t1, size1) = baseline, fast
+        self.stdout.write(
+            f"{label:<10} serializer+JSONRenderer {t0 * 1000:8.1f} ms ({size0} B) | "
+            f"values+FastJSONRenderer {t1 * 1000:8.1f} ms ({size1} B) | {t0 / t1:5.1f}x"
+        )
+
+    def run(self, repeat):
+        self.stdout.write(f"orjson: {'yes' if orjson else 'no (stdlib fallback)'}")
+        meds = Medicine.objects.filter(sku__startswith="bench-")
+        batches = Batch.objects.filter(medicine__sku__startswith="bench-")
+
+        self.report(
+            "medicines",
+            self.best_of(repeat, lambda: JSONRenderer().render(MedicineSerializer(meds.prefetch_related("batches").select_related("category"), many=True).data)),
+            self.best_of(repeat, lambda: FastJSONRenderer().render(medicine_rows(meds.values(*MEDICINE_VALUES_FIELDS)))),
+        )
+        self.report(
+            "batches",
+            self.best_of(repeat, lambda: JSONRenderer().render(BatchSerializer(batches, many=True).data)),
+            self.best_of(repeat, lambda: FastJSONRenderer().render([batch_row(b) for b in batches.values(*BATCH_VALUES_FIELDS)])),
+        )
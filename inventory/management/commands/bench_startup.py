@@ -0,0 +1,92 @@
+import importlib.util
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+SETUP = "import django; django.setup()"
+WORKER = (
+    "from django.core.wsgi import get_wsgi_application; get_wsgi_application(); "
+    "from django.urls import get_resolver; get_resolver().url_patterns"
+)
+
+# name: (settings module, code run in a fresh interpreter)
+SCENARIOS = {
+    "manage": ("pharmacy.settings", SETUP),
+    "manage_slim": ("pharmacy.settings_manage", SETUP),
+    "worker": ("pharmacy.settings", WORKER),  # app loading, middleware and the full URLconf
+}
+
+
+def run(scenario, *flags):
+    settings_module, code = SCENARIOS[scenario]
+    env = {**os.environ, "DJANGO_SETTINGS_MODULE": settings_module}
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, *flags, "-c", code], cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if proc.returncode:
+        raise CommandError(f"{scenario} failed:\n{proc.stderr[-2000:]}")
+    return elapsed, proc.stderr
+
+
+def by_package(importtime):
+    """
+    Self time (us) per top-level package from `-X importtime` output.
+    """
+    totals = {}
+    for line in importtime.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue  # header row
+        package = name.strip().split(".")[0]
+        totals[package] = totals.get(package, 0) + int(self_us)
+    return sorted(totals.items(), key=lambda item: -item[1])
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure cold start in fresh interpreters (management process with full / slim settings, request-ready "
+        "worker) against INVENTORY_STARTUP_BUDGET_MS; exits non-zero over budget. --importtime writes the "
+        "worker's `-X importtime` breakdown."
+    )
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=5)
+        parser.add_argument("--importtime", nargs="?", const=str(settings.BASE_DIR / "startup-importtime.txt"), metavar="FILE")
+        parser.add_argument("--top", type=int, default=15, help="Packages to list from the importtime breakdown.")
+
+    def handle(self, *args, **options):
+        budgets = getattr(settings, "INVENTORY_STARTUP_BUDGET_MS", {})
+        if not os.path.exists(importlib.util.cache_from_source(__file__)):
+            self.stdout.write(self.style.WARNING(
+                "No cached bytecode for the project (PYTHONDONTWRITEBYTECODE?); every boot recompiles it. "
+                "Run `python -m compileall -q .` at build time."
+            ))
+        over = []
+        for scenario in SCENARIOS:
+            run(scenario)  # warm the OS file cache
+            times = [run(scenario)[0] * 1000 for _ in range(options["runs"])]
+            median = statistics.median(times)
+            budget = budgets.get(scenario)
+            verdict = "" if budget is None else f"  (budget {budget} ms{', OVER' if median > budget else ''})"
+            self.stdout.write(f"{scenario:12} median {median:5.0f} ms  min {min(times):5.0f} ms{verdict}")
+            if budget is not None and median > budget:
+                over.append(scenario)
+
+        if options["importtime"]:
+            _, importtime = run("worker", "-X", "importtime")
+            with open(options["importtime"], "w") as fh:
+                fh.write(importtime)
+            self.stdout.write(f"\nworker import self time by package (raw: {options['importtime']}):")
+            for package, micros in by_package(importtime)[:options["top"]]:
+                self.stdout.write(f"  {package:32} {micros / 1000:7.1f} ms")
+
+        if over:
+            raise CommandError(f"Startup over budget: {', '.join(over)}")
@@ -0,0 +1,18 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from inventory.changes import compact
+
+
+class Command(BaseCommand):
+    help = "Compact the change feed: drop superseded events and tombstones older than the retention window."
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("--retention-days", type=int, default=30, help="Keep delete events this long.")
+        parser.add_argument("--chunk-size", type=int, default=10000)
+
+    def handle(self, *args, **options):
+        superseded, tombstones = compact(timedelta(days=options["retention_days"]), chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Removed {superseded} superseded events and {tombstones} expired tombstones"))
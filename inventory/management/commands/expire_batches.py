@@ -0,0 +1,40 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.expiry import write_off_expired
+
+
+class Command(BaseCommand):
+    help = "Write off expired batches (zero them and record ADJUST transactions) in resumable chunks."
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("--as-of", help="Treat batches expiring before this date (YYYY-MM-DD) as expired. Default: today.")
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument("--dry-run", action="store_true", help="Count what would be written off; change nothing.")
+        parser.add_argument("--restart", action="store_true", help="Ignore the saved checkpoint for this date.")
+        parser.add_argument("--pause", type=float, default=0.0, help="Seconds to sleep between chunks.")
+
+    def handle(self, *args, **options):
+        as_of = None
+        if options["as_of"]:
+            try:
+                as_of = datetime.date.fromisoformat(options["as_of"])
+            except ValueError:
+                raise CommandError("--as-of must be YYYY-MM-DD")
+
+        def progress(batches, units):
+            if options["verbosity"] > 1:
+                self.stdout.write(f"  {batches} batches / {units} units so far")
+
+        batches, units = write_off_expired(
+            as_of=as_of,
+            chunk_size=options["chunk_size"],
+            dry_run=options["dry_run"],
+            resume=not options["restart"],
+            pause=options["pause"],
+            progress=progress,
+        )
+        verb = "Would write off" if options["dry_run"] else "Wrote off"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {batches} expired batches ({units} units)"))
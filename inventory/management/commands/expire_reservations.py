@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from inventory.reservations import expire_due
+
+
+class Command(BaseCommand):
+    help = "Expire reservations past their TTL and return the held units to their batches."
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        expired = expire_due(chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Expired {expired} reservations"))
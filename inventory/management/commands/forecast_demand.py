@@ -0,0 +1,39 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory import forecasting
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute per-medicine demand forecasts (MedicineForecast) from daily sales; run nightly. "
+        "Uses NumPy when it is installed."
+    )
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("--as-of", help="Last day of history (YYYY-MM-DD). Default: yesterday.")
+        parser.add_argument("--engine", choices=forecasting.ENGINES, help="Default: numpy when installed, else python.")
+
+    def handle(self, *args, **options):
+        as_of = None
+        if options["as_of"]:
+            try:
+                as_of = datetime.date.fromisoformat(options["as_of"])
+            except ValueError:
+                raise CommandError("--as-of must be YYYY-MM-DD")
+        engine = options["engine"] or forecasting.default_engine()
+        if engine == "numpy" and forecasting.numpy is None:
+            raise CommandError("NumPy is not installed; use --engine python.")
+
+        def progress(done):
+            if options["verbosity"] > 1:
+                self.stdout.write(f"  {done} medicines so far")
+
+        start = time.perf_counter()
+        done = forecasting.run_forecast(as_of=as_of, engine=engine, progress=progress)
+        self.stdout.write(self.style.SUCCESS(
+            f"Forecast {done} medicines in {time.perf_counter() - start:.1f}s ({engine})"
+        ))
@@ -0,0 +1,50 @@
+import io
+import pstats
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.profiling import captures, collapsed_stacks, profile_dir
+
+
+class Command(BaseCommand):
+    help = "Aggregate sampled request profiles into a top-function table and/or collapsed stacks."
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url-name", help="Only captures for this URL name (see --list).")
+        parser.add_argument("--last", type=int, default=0, help="Only the N newest captures.")
+        parser.add_argument("--sort", default="cumulative", choices=["cumulative", "tottime", "ncalls"])
+        parser.add_argument("--top", type=int, default=30)
+        parser.add_argument("--collapsed", metavar="FILE", help="Write collapsed stacks (flamegraph input) to FILE.")
+        parser.add_argument("--list", action="store_true", help="List URL names with capture counts and exit.")
+
+    def handle(self, *args, **options):
+        if options["list"]:
+            counts = {}
+            for f in captures():
+                counts[f.parent.name] = counts.get(f.parent.name, 0) + 1
+            for name, count in sorted(counts.items()):
+                self.stdout.write(f"{name}\t{count}")
+            return
+
+        files = captures(options["url_name"])
+        if options["last"]:
+            files = files[:options["last"]]
+        if not files:
+            raise CommandError(f"No captures found under {profile_dir()}")
+
+        out = io.StringIO()
+        stats = pstats.Stats(str(files[0]), stream=out)
+        for f in files[1:]:
+            stats.add(str(f))
+        stats.strip_dirs().sort_stats(options["sort"]).print_stats(options["top"])
+        self.stdout.write(f"{len(files)} captures")
+        self.stdout.write(out.getvalue())
+
+        if options["collapsed"]:
+            # reload without strip_dirs so identically named functions in different files stay apart
+            full = pstats.Stats(*[str(f) for f in files])
+            lines = collapsed_stacks(full)
+            with open(options["collapsed"], "w") as fh:
+                fh.write("\n".join(lines) + "\n")
+            self.stdout.write(self.style.SUCCESS(f"Wrote {len(lines)} stacks to {options['collapsed']}"))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from inventory.idempotency import purge_expired
+
+
+class Command(BaseCommand):
+    help = "Delete expired Idempotency-Key records in chunks."
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        deleted = purge_expired(chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired idempotency keys"))
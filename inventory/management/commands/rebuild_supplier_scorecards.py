@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from inventory.scorecards import rebuild_all
+
+
+class Command(BaseCommand):
+    help = "Rebuild the supplier scorecard rollups from purchase orders (after imports or raw data fixes)."
+    requires_system_checks = []
+
+    def handle(self, *args, **options):
+        buckets = rebuild_all()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {buckets} supplier-month buckets"))
@@ -0,0 +1,73 @@
+import argparse
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from inventory.replay import apply, ledger_head, run_replay
+
+
+def as_of(value):
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise argparse.ArgumentTypeError(f"not a date or datetime: {value!r}")
+        moment = timezone.datetime.combine(day, timezone.datetime.max.time())
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild batch stock by replaying the StockTransaction ledger from each batch's opening quantity, in "
+        "parallel over medicine id ranges. Reports batches whose stock differs; --apply writes the replayed "
+        "stock back, --as-of reports stock at a past moment instead."
+    )
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("--range-size", type=int, default=5000, help="Medicines per work unit.")
+        parser.add_argument("--workers", type=int, default=0, help="Worker processes (default: CPU count; 1 = in-process).")
+        parser.add_argument("--as-of", type=as_of, help="Replay only transactions up to this date / datetime (report only).")
+        parser.add_argument("--apply", action="store_true", help="Write replayed quantities back to the batches.")
+        parser.add_argument("--report", help="JSON-lines report path. Default: stock_replay-<timestamp>.jsonl")
+
+    def handle(self, *args, **options):
+        until = options["as_of"]
+        if until is not None and options["apply"]:
+            raise CommandError("--as-of replays are report-only; drop --apply.")
+        path = options["report"] or f"stock_replay-{timezone.now():%Y%m%dT%H%M%S}.jsonl"
+        start = time.perf_counter()
+        up_to_id = ledger_head()
+        totals = {}
+        changed = []
+        # point-in-time reports list every batch that existed then; otherwise only the differences
+        ranges = run_replay(up_to_id, options["range_size"], options["workers"] or None, until, changed_only=until is None)
+        with open(path, "w") as report:
+            for (lo, hi), rows, stats in ranges:
+                for batch_id, medicine_id, current, replayed in rows:
+                    entry = {"batch": batch_id, "medicine": medicine_id, "replayed": replayed}
+                    if until is None:
+                        entry["current"] = current
+                    report.write(json.dumps(entry) + "\n")
+                for key, value in stats.items():
+                    totals[key] = totals.get(key, 0) + value
+                if options["apply"]:
+                    changed.extend(rows)
+                if options["verbosity"] > 1:
+                    self.stdout.write(f"  medicines {lo}..{hi - 1}: {len(rows)} batches, {stats['transactions']} transactions")
+        elapsed = time.perf_counter() - start
+        summary = ", ".join(f"{k}={v}" for k, v in sorted(totals.items())) or "nothing to replay"
+        self.stdout.write(f"Replay finished in {elapsed:.1f}s; {summary}; report: {path}")
+
+        if options["apply"] and changed:
+            written, skipped = apply(changed, up_to_id)
+            self.stdout.write(self.style.SUCCESS(f"Rewrote {written} batches."))
+            if skipped:
+                self.stdout.write(self.style.WARNING(
+                    f"Skipped {len(skipped)} medicines with transactions newer than the replay; run again."
+                ))
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='batch',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='medicine',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:10
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_batch_reserved_quantity_reservation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Location',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=32, unique=True)),
+                ('name', models.CharField(max_length=255)),
+                ('address', models.TextField(blank=True)),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+            options={
+                'ordering': ('name',),
+            },
+        ),
+        migrations.AddField(
+            model_name='batch',
+            name='location',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='batches', to='inventory.location'),
+        ),
+        migrations.AddField(
+            model_name='stocktransaction',
+            name='location',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='transactions', to='inventory.location'),
+        ),
+        migrations.CreateModel(
+            name='MedicineLocationStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_stock', models.IntegerField(default=0)),
+                ('reorder_level', models.IntegerField(default=10, validators=[django.core.validators.MinValueValidator(0)])),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='medicine_stocks', to='inventory.location')),
+                ('medicine', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='location_stocks', to='inventory.medicine')),
+            ],
+            options={
+                'ordering': ('medicine',),
+                'indexes': [models.Index(fields=['location', 'total_stock'], name='location_stock_idx')],
+                'constraints': [models.UniqueConstraint(fields=('medicine', 'location'), name='uniq_medicine_location_stock')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_jobcheckpoint_changeevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='batch',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='medicine',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='supplier',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='changeevent',
+            index=models.Index(fields=['resource', 'id'], name='change_resource_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_batch_updated_at_category_updated_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='batch',
+            index=models.Index(condition=models.Q(('available_quantity__gt', 0)), fields=['expiry_date', 'id'], name='batch_live_expiry_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_batch_batch_live_expiry_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='purchaseorder',
+            index=models.Index(fields=['-created_at'], name='po_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stocktransaction',
+            index=models.Index(fields=['-performed_at'], name='stocktx_performed_idx'),
+        ),
+    ]
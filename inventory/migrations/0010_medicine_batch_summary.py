@@ -0,0 +1,66 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:29
+
+from django.db import migrations, models
+from django.db.models.functions import Cast, Coalesce, NullIf
+
+
+def backfill_summary(apps, schema_editor):
+    Medicine = apps.get_model('inventory', 'Medicine')
+    Batch = apps.get_model('inventory', 'Batch')
+    live = models.Q(available_quantity__gt=0)
+    aggregates = {
+        'next_expiry': models.Min('expiry_date', filter=live),
+        'live_batches': models.Count('pk', filter=live),
+        'oldest_received': models.Min('received_date', filter=live),
+        'average_cost': models.ExpressionWrapper(
+            models.Sum(models.F('available_quantity') * models.F('purchase_price'), filter=live)
+            / NullIf(Cast(models.Sum('available_quantity', filter=live), models.FloatField()), 0),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        ),
+    }
+    values = {}
+    for field, aggregate in aggregates.items():
+        value = models.Subquery(
+            Batch.objects.filter(medicine_id=models.OuterRef('pk')).values('medicine_id').annotate(value=aggregate).values('value')
+        )
+        values[field] = Coalesce(value, 0) if field == 'live_batches' else value
+    Medicine.objects.update(**values)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0009_admin_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medicine',
+            name='average_cost',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='medicine',
+            name='live_batches',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='medicine',
+            name='next_expiry',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='medicine',
+            name='oldest_received',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='medicine',
+            index=models.Index(fields=['next_expiry'], name='medicine_next_expiry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medicine',
+            index=models.Index(fields=['average_cost'], name='medicine_average_cost_idx'),
+        ),
+        migrations.RunPython(backfill_summary, migrations.RunPython.noop),
+    ]
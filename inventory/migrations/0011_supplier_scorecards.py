@@ -0,0 +1,55 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:33
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0010_medicine_batch_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='purchaseorder',
+            name='received_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='SupplierMedicinePrice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('units', models.PositiveIntegerField(default=0)),
+                ('spend', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('medicine', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='supplier_prices', to='inventory.medicine')),
+                ('supplier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_prices', to='inventory.supplier')),
+            ],
+            options={
+                'ordering': ('supplier', 'medicine', 'month'),
+                'indexes': [models.Index(fields=['month', 'medicine'], name='supplier_price_month_idx')],
+                'constraints': [models.UniqueConstraint(fields=('supplier', 'medicine', 'month'), name='unique_supplier_medicine_month')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SupplierMonthlyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('orders_placed', models.PositiveIntegerField(default=0)),
+                ('orders_received', models.PositiveIntegerField(default=0)),
+                ('orders_cancelled', models.PositiveIntegerField(default=0)),
+                ('lead_time_days', models.FloatField(default=0)),
+                ('units_received', models.PositiveIntegerField(default=0)),
+                ('spend', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('supplier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_stats', to='inventory.supplier')),
+            ],
+            options={
+                'ordering': ('supplier', 'month'),
+                'indexes': [models.Index(fields=['month', 'supplier'], name='supplier_stats_month_idx')],
+                'constraints': [models.UniqueConstraint(fields=('supplier', 'month'), name='unique_supplier_month')],
+            },
+        ),
+    ]
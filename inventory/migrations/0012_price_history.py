@@ -0,0 +1,51 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:36
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def backfill_prices(apps, schema_editor):
+    # current selling price from the medicine's creation; costs from purchase items in order date order
+    Medicine = apps.get_model('inventory', 'Medicine')
+    PurchaseItem = apps.get_model('inventory', 'PurchaseItem')
+    PriceHistory = apps.get_model('inventory', 'PriceHistory')
+    rows = [
+        PriceHistory(medicine_id=pk, kind='sale', price=price, effective_from=created_at, source='backfill')
+        for pk, price, created_at in Medicine.objects.values_list('pk', 'unit_price', 'created_at').iterator()
+    ]
+    last = {}
+    for medicine_id, price, created_at in (
+        PurchaseItem.objects.order_by('purchase_order__created_at', 'pk')
+        .values_list('medicine_id', 'purchase_price', 'purchase_order__created_at').iterator()
+    ):
+        if last.get(medicine_id) != price:
+            last[medicine_id] = price
+            rows.append(PriceHistory(medicine_id=medicine_id, kind='cost', price=price, effective_from=created_at, source='backfill'))
+    PriceHistory.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0011_supplier_scorecards'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('sale', 'Sale price'), ('cost', 'Purchase cost')], max_length=4)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('effective_from', models.DateTimeField(default=django.utils.timezone.now)),
+                ('source', models.CharField(blank=True, max_length=20)),
+                ('medicine', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_history', to='inventory.medicine')),
+            ],
+            options={
+                'ordering': ('medicine', 'kind', '-effective_from'),
+                'indexes': [models.Index(fields=['medicine', 'kind', 'effective_from'], name='price_history_asof_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_prices, migrations.RunPython.noop),
+    ]
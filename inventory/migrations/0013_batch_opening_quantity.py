@@ -0,0 +1,43 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_opening(apps, schema_editor):
+    # batches the stock handlers, PO receipts and transfers created got their stock from an IN / ADJUST, and
+    # stock audit ledger repairs already booked the stock of the batches they reconciled; everything else was
+    # created with its stock (taken as the received quantity)
+    Batch = apps.get_model('inventory', 'Batch')
+    StockTransaction = apps.get_model('inventory', 'StockTransaction')
+    booked_in = StockTransaction.objects.filter(batch_id=models.OuterRef('pk'), transaction_type='in').filter(
+        models.Q(note__startswith='Received via PO#') | models.Q(note__startswith='Transfer ')
+    )
+    reconciled = StockTransaction.objects.filter(batch_id=models.OuterRef('pk'), note='Stock audit reconciliation')
+    ledger_born = (
+        models.Q(batch_number__startswith='autogen-') | models.Q(batch_number__startswith='adjust-')
+        | models.Exists(booked_in) | models.Exists(reconciled)
+    )
+    Batch.objects.filter(ledger_born).update(opening_quantity=0)
+    Batch.objects.filter(opening_quantity__isnull=True).update(opening_quantity=models.F('quantity'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0012_price_history'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='batch',
+            name='opening_quantity',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='stocktransaction',
+            index=models.Index(fields=['medicine', 'performed_at', 'id'], name='stocktx_replay_idx'),
+        ),
+        migrations.RunPython(backfill_opening, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:49
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0013_batch_opening_quantity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MedicineForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('method', models.CharField(choices=[('ses_weekly', 'Exponential smoothing with weekday seasonality')], default='ses_weekly', max_length=20)),
+                ('as_of', models.DateField()),
+                ('history_days', models.PositiveIntegerField()),
+                ('level', models.FloatField()),
+                ('weekday_factors', models.JSONField(default=list)),
+                ('daily', models.JSONField(default=list)),
+                ('horizon_total', models.FloatField()),
+                ('computed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('medicine', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='forecast', to='inventory.medicine')),
+            ],
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0014_medicine_forecast'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='changeevent',
+            index=models.Index(fields=['created_at'], name='change_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='changeevent',
+            index=models.Index(fields=['resource', 'created_at'], name='change_resource_created_idx'),
+        ),
+    ]
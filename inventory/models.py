@@ -9,6 +9,7 @@ User = settings.AUTH_USER_MODEL
 class Category(models.Model):
     name = models.CharField(max_length=120, unique=True)
     description = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ("name",)
@@ -22,10 +23,26 @@ class Supplier(models.Model):
     phone = models.CharField(max_length=50, blank=True)
     address = models.TextField(blank=True)
     notes = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
 
+class Location(models.Model):
+    """
+    A branch / store. Batches and stock transactions are scoped to a location.
+    """
+    code = models.CharField(max_length=32, unique=True)
+    name = models.CharField(max_length=255)
+    address = models.TextField(blank=True)
+    is_active = models.BooleanField(default=True)
+
+    class Meta:
+        ordering = ("name",)
+
+    def __str__(self):
+        return f"{self.name} ({self.code})"
+
 class Medicine(models.Model):
     """
     Represents a product (medicine).
@@ -40,9 +57,20 @@ class Medicine(models.Model):
     reorder_level = models.IntegerField(default=10, validators=[MinValueValidator(0)])  # threshold
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+    version = models.PositiveIntegerField(default=0)  # optimistic-lock counter, bumped with F() by stock and API writes
+    # summary of live batches (available_quantity > 0), recomputed with total_stock by inventory.signals
+    next_expiry = models.DateField(null=True, blank=True)
+    live_batches = models.PositiveIntegerField(default=0)
+    oldest_received = models.DateField(null=True, blank=True)
+    average_cost = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)  # weighted by available units
 
     class Meta:
         ordering = ("name",)
+        indexes = [
+            models.Index(fields=["next_expiry"], name="medicine_next_expiry_idx"),
+            models.Index(fields=["average_cost"], name="medicine_average_cost_idx"),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.sku})"
@@ -55,18 +83,33 @@ class Batch(models.Model):
     batch_number = models.CharField(max_length=128, blank=True)
     quantity = models.IntegerField(validators=[MinValueValidator(0)])
     available_quantity = models.IntegerField(validators=[MinValueValidator(0)])  # changes with sales/consumption
+    reserved_quantity = models.IntegerField(default=0, validators=[MinValueValidator(0)])  # held by active Reservations
+    # stock the batch was created with outside the ledger (direct API / admin creation); 0 when its stock arrived
+    # through StockTransactions. Starting point for inventory.replay; filled from available_quantity on insert.
+    opening_quantity = models.PositiveIntegerField(null=True, blank=True)
     purchase_price = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
     supplier = models.ForeignKey(Supplier, on_delete=models.SET_NULL, null=True, blank=True, related_name="batches")
+    location = models.ForeignKey(Location, on_delete=models.PROTECT, null=True, blank=True, related_name="batches")
     received_date = models.DateField(default=timezone.now)
     expiry_date = models.DateField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    version = models.PositiveIntegerField(default=0)  # optimistic-lock counter, bumped with F() by stock and API writes
 
     class Meta:
         ordering = ("-received_date",)
+        indexes = [
+            # live (non-empty) batches by expiry: expiry write-off scans, FIFO-by-expiry
+            models.Index(fields=["expiry_date", "id"], condition=models.Q(available_quantity__gt=0), name="batch_live_expiry_idx"),
+        ]
 
     def __str__(self):
         return f"{self.medicine.name} - Batch {self.batch_number or self.pk}"
 
+    @property
+    def unreserved_quantity(self):
+        return self.available_quantity - self.reserved_quantity
+
 class PurchaseOrder(models.Model):
     """
     A PO from a supplier (incoming stock). status tracks workflow.
@@ -84,10 +127,14 @@ class PurchaseOrder(models.Model):
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name="purchase_orders")
     created_at = models.DateTimeField(default=timezone.now)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_DRAFT)
+    received_at = models.DateTimeField(null=True, blank=True)  # set on the transition to received (lead time)
     note = models.TextField(blank=True)
 
     class Meta:
         ordering = ("-created_at",)
+        indexes = [
+            models.Index(fields=["-created_at"], name="po_created_idx"),
+        ]
 
     def __str__(self):
         return f"PO#{self.pk} - {self.supplier or 'Unknown'} - {self.status}"
@@ -127,6 +174,7 @@ class StockTransaction(models.Model):
 
     medicine = models.ForeignKey(Medicine, on_delete=models.CASCADE, related_name="transactions")
     batch = models.ForeignKey(Batch, on_delete=models.SET_NULL, null=True, blank=True, related_name="transactions")
+    location = models.ForeignKey(Location, on_delete=models.PROTECT, null=True, blank=True, related_name="transactions")
     transaction_type = models.CharField(max_length=10, choices=TYPE_CHOICES)
     quantity = models.IntegerField()  # positive integer; sign is by transaction_type
     note = models.TextField(blank=True)
@@ -135,5 +183,239 @@ class StockTransaction(models.Model):
 
     class Meta:
         ordering = ("-performed_at",)
+        indexes = [
+            # default ordering and the admin date hierarchy
+            models.Index(fields=["-performed_at"], name="stocktx_performed_idx"),
+            # per-medicine ledger in replay order (inventory.replay)
+            models.Index(fields=["medicine", "performed_at", "id"], name="stocktx_replay_idx"),
+        ]
+
+
+
+class MedicineLocationStock(models.Model):
+    """
+    Denormalized stock of one medicine at one location (sum of that location's batch available_quantity).
+    Maintained incrementally by inventory.signals so a branch's stock / low-stock view reads only its own rows.
+    """
+    medicine = models.ForeignKey(Medicine, on_delete=models.CASCADE, related_name="location_stocks")
+    location = models.ForeignKey(Location, on_delete=models.CASCADE, related_name="medicine_stocks")
+    total_stock = models.IntegerField(default=0)
+    reorder_level = models.IntegerField(default=10, validators=[MinValueValidator(0)])  # per-branch threshold
+
+    class Meta:
+        ordering = ("medicine",)
+        constraints = [
+            models.UniqueConstraint(fields=["medicine", "location"], name="uniq_medicine_location_stock"),
+        ]
+        indexes = [
+            models.Index(fields=["location", "total_stock"], name="location_stock_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.medicine_id}@{self.location_id}: {self.total_stock}"
+
+class IdempotencyKey(models.Model):
+    """
+    Stored outcome of a stock-mutating POST, keyed by the client's Idempotency-Key header.
+    A row is inserted as 'pending' before the request runs (the unique constraint makes that the lock),
+    then completed with the response so retries replay it instead of re-running the signal chain.
+    """
+    STATE_PENDING = "pending"
+    STATE_DONE = "done"
+    STATE_CHOICES = [
+        (STATE_PENDING, "Pending"),
+        (STATE_DONE, "Done"),
+    ]
+
+    key = models.CharField(max_length=255)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="idempotency_keys")
+    endpoint = models.CharField(max_length=100)  # url name the key is scoped to
+    request_hash = models.CharField(max_length=64)
+    state = models.CharField(max_length=10, choices=STATE_CHOICES, default=STATE_PENDING)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    claimed_at = models.DateTimeField(default=timezone.now)  # start of the pending lease (INVENTORY_IDEMPOTENCY PENDING_TIMEOUT)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "endpoint", "key"], name="uniq_idempotency_key"),
+        ]
+
+    def __str__(self):
+        return f"{self.endpoint}:{self.key} ({self.state})"
+
+class Reservation(models.Model):
+    """
+    A TTL hold on units of a specific Batch for a pending (customer) order.
+    Batch.reserved_quantity is kept equal to the sum of active holds on that batch,
+    so availability is a single row read: available_quantity - reserved_quantity.
+    """
+    STATUS_ACTIVE = "active"
+    STATUS_FULFILLED = "fulfilled"
+    STATUS_RELEASED = "released"
+    STATUS_EXPIRED = "expired"
+    STATUS_CHOICES = [
+        (STATUS_ACTIVE, "Active"),
+        (STATUS_FULFILLED, "Fulfilled"),
+        (STATUS_RELEASED, "Released"),
+        (STATUS_EXPIRED, "Expired"),
+    ]
+
+    batch = models.ForeignKey(Batch, on_delete=models.CASCADE, related_name="reservations")
+    medicine = models.ForeignKey(Medicine, on_delete=models.CASCADE, related_name="reservations")
+    customer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="reservations")
+    quantity = models.IntegerField(validators=[MinValueValidator(1)])
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_ACTIVE)
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(default=timezone.now)
+    transaction = models.OneToOneField(StockTransaction, on_delete=models.SET_NULL, null=True, blank=True, related_name="reservation")
+
+    class Meta:
+        ordering = ("-created_at",)
+        indexes = [
+            models.Index(fields=["status", "expires_at"], name="reservation_sweep_idx"),
+        ]
 
+    def __str__(self):
+        return f"Reservation#{self.pk} - {self.quantity} x {self.batch_id} ({self.status})"
+
+class ChangeEvent(models.Model):
+    """
+    Append-only change log for incremental client sync. The auto-increment id is the sync cursor; it is
+    assigned at INSERT, so cursors handed out stop at the settled mark (inventory.changes.safe_cursor).
+    Written from inventory.signals for Medicine, Batch, Category, Supplier and PurchaseOrder.
+    """
+    OP_UPSERT = "upsert"
+    OP_DELETE = "delete"
+    OP_CHOICES = [
+        (OP_UPSERT, "Upsert"),
+        (OP_DELETE, "Delete"),
+    ]
+
+    resource = models.CharField(max_length=32)  # model_name of the changed row
+    object_id = models.BigIntegerField()
+    op = models.CharField(max_length=10, choices=OP_CHOICES, default=OP_UPSERT)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ("id",)
+        indexes = [
+            models.Index(fields=["resource", "object_id", "id"], name="change_object_idx"),
+            models.Index(fields=["resource", "id"], name="change_resource_idx"),  # per-table stamp lookups
+            # settled marks (changes.safe_cursor), overall and per table
+            models.Index(fields=["created_at"], name="change_created_idx"),
+            models.Index(fields=["resource", "created_at"], name="change_resource_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.op} {self.resource}:{self.object_id}"
 
+class JobCheckpoint(models.Model):
+    """
+    Named progress marker for long-running / resumable jobs (and the change-feed compaction horizon).
+    """
+    name = models.CharField(max_length=100, unique=True)
+    value = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+class SupplierMonthlyStats(models.Model):
+    """
+    Per-supplier rollup of the POs created in one month, rebuilt for that (supplier, month) whenever one of
+    its POs changes status (inventory.scorecards). Feeds the supplier scorecard endpoints.
+    """
+    supplier = models.ForeignKey(Supplier, on_delete=models.CASCADE, related_name="monthly_stats")
+    month = models.DateField()  # first day of the month
+    orders_placed = models.PositiveIntegerField(default=0)
+    orders_received = models.PositiveIntegerField(default=0)
+    orders_cancelled = models.PositiveIntegerField(default=0)
+    lead_time_days = models.FloatField(default=0)  # sum over received orders; divide by orders_received
+    units_received = models.PositiveIntegerField(default=0)
+    spend = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+
+    class Meta:
+        ordering = ("supplier", "month")
+        constraints = [
+            models.UniqueConstraint(fields=["supplier", "month"], name="unique_supplier_month"),
+        ]
+        indexes = [
+            models.Index(fields=["month", "supplier"], name="supplier_stats_month_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.supplier_id} {self.month:%Y-%m}"
+
+class SupplierMedicinePrice(models.Model):
+    """
+    Units and spend per (supplier, medicine, month) from received POs; price index = a supplier's average
+    unit price for a medicine relative to the all-supplier average.
+    """
+    supplier = models.ForeignKey(Supplier, on_delete=models.CASCADE, related_name="monthly_prices")
+    medicine = models.ForeignKey(Medicine, on_delete=models.CASCADE, related_name="supplier_prices")
+    month = models.DateField()
+    units = models.PositiveIntegerField(default=0)
+    spend = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+
+    class Meta:
+        ordering = ("supplier", "medicine", "month")
+        constraints = [
+            models.UniqueConstraint(fields=["supplier", "medicine", "month"], name="unique_supplier_medicine_month"),
+        ]
+        indexes = [
+            models.Index(fields=["month", "medicine"], name="supplier_price_month_idx"),
+        ]
+
+class PriceHistory(models.Model):
+    """
+    Append-only record of a medicine's selling price (Medicine.unit_price) and purchase cost (PurchaseItem /
+    bulk price updates). A row holds from effective_from until the next row of the same medicine and kind;
+    inventory.pricing appends only when the price actually changes and answers "price as of" in bulk.
+    """
+    KIND_SALE = "sale"
+    KIND_COST = "cost"
+    KIND_CHOICES = [
+        (KIND_SALE, "Sale price"),
+        (KIND_COST, "Purchase cost"),
+    ]
+
+    medicine = models.ForeignKey(Medicine, on_delete=models.CASCADE, related_name="price_history")
+    kind = models.CharField(max_length=4, choices=KIND_CHOICES)
+    price = models.DecimalField(max_digits=12, decimal_places=2)
+    effective_from = models.DateTimeField(default=timezone.now)
+    source = models.CharField(max_length=20, blank=True)  # medicine, bulk, purchase, backfill
+
+    class Meta:
+        ordering = ("medicine", "kind", "-effective_from")
+        indexes = [
+            models.Index(fields=["medicine", "kind", "effective_from"], name="price_history_asof_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.medicine_id} {self.kind} {self.price} from {self.effective_from:%Y-%m-%d %H:%M}"
+
+class MedicineForecast(models.Model):
+    """
+    Latest demand forecast of a medicine from its daily TYPE_OUT history (inventory.forecasting), rewritten
+    by the nightly `manage.py forecast_demand` run. Medicines without sales in the history window have no row.
+    """
+    METHOD_SES_WEEKLY = "ses_weekly"
+    METHOD_CHOICES = [
+        (METHOD_SES_WEEKLY, "Exponential smoothing with weekday seasonality"),
+    ]
+
+    medicine = models.OneToOneField(Medicine, on_delete=models.CASCADE, related_name="forecast")
+    method = models.CharField(max_length=20, choices=METHOD_CHOICES, default=METHOD_SES_WEEKLY)
+    as_of = models.DateField()  # last day of history; daily[0] is the day after
+    history_days = models.PositiveIntegerField()
+    level = models.FloatField()  # deseasonalized units per day
+    weekday_factors = models.JSONField(default=list)  # Monday first, 1.0 = average day
+    daily = models.JSONField(default=list)  # forecast units per day over the horizon
+    horizon_total = models.FloatField()
+    computed_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.medicine_id} {self.level:.2f}/day as of {self.as_of}"
@@ -18,3 +18,34 @@ class IsPharmacistOrAdmin(permissions.BasePermission):
         if request.method in permissions.SAFE_METHODS:
             return True
         return False
+
+
+class IsPharmacistOrAdminOnly(permissions.BasePermission):
+    """
+    Admin or pharmacist only, reads included: for commercially sensitive reports (margins, supplier
+    pricing) that suppliers and customers must not see.
+    """
+    def has_permission(self, request, view):
+        user = request.user
+        if not user or not user.is_authenticated:
+            return False
+        return user.role in ("admin", "pharmacist")
+
+
+class CanReserveStock(permissions.BasePermission):
+    """
+    Customers place holds for themselves; pharmacists/admins can manage any hold.
+    Suppliers get read-only access.
+    """
+    def has_permission(self, request, view):
+        user = request.user
+        if not user or not user.is_authenticated:
+            return False
+        if request.method in permissions.SAFE_METHODS:
+            return True
+        return user.role in ("admin", "pharmacist", "customer")
+
+    def has_object_permission(self, request, view, obj):
+        if request.user.role in ("admin", "pharmacist"):
+            return True
+        return obj.customer_id == request.user.pk
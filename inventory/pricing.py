@@ -0,0 +1,121 @@
+"""
+Price history and margin queries.
+
+PriceHistory is append-only: Medicine saves and bulk price updates append the selling price, PurchaseItem
+saves append the purchase cost, each only when it differs from the price already in effect. A row holds
+from its effective_from until the next row of the same (medicine, kind).
+
+- prices_as_of(): the price in effect at one instant for thousands of medicines, one windowed query per
+  chunk of ids (ROW_NUMBER over each medicine's history, newest first, keep row 1).
+- margin_report(): revenue / cost / margin of OUT transactions per period in a single grouped query; each
+  transaction is priced at its own performed_at by a correlated lookup on price_history_asof_idx, so there
+  are no per-row queries from Python.
+"""
+from decimal import Decimal
+
+from django.db import models
+from django.db.models.functions import Coalesce, NullIf, RowNumber, Trunc
+from django.utils import timezone
+
+from .models import PriceHistory, StockTransaction
+
+CHUNK_SIZE = 1000
+CENT = Decimal("0.01")
+PERIODS = ("day", "week", "month", "quarter", "year")
+
+
+def _chunks(ids):
+    ids = list(ids)
+    for i in range(0, len(ids), CHUNK_SIZE):
+        yield ids[i:i + CHUNK_SIZE]
+
+
+def prices_as_of(medicine_ids=None, when=None, kind=PriceHistory.KIND_SALE):
+    """
+    {medicine_id: price in effect at `when` (default: now)}. medicine_ids=None covers every medicine;
+    medicines with no history at `when` are left out.
+    """
+    when = when or timezone.now()
+    result = {}
+    for chunk in [None] if medicine_ids is None else _chunks(medicine_ids):
+        qs = PriceHistory.objects.filter(kind=kind, effective_from__lte=when)
+        if chunk is not None:
+            qs = qs.filter(medicine_id__in=chunk)
+        qs = qs.annotate(rank=models.Window(
+            RowNumber(), partition_by=[models.F("medicine_id")], order_by=[models.F("effective_from").desc(), models.F("pk").desc()],
+        )).filter(rank=1)
+        result.update(qs.values_list("medicine_id", "price"))
+    return result
+
+
+def record_prices(kind, prices, source, at=None):
+    """
+    Append a history row for every {medicine_id: price} that differs from the price in effect at `at`.
+    Returns the number of rows written.
+    """
+    if not prices:
+        return 0
+    at = at or timezone.now()
+    prices = {pk: Decimal(str(price)).quantize(CENT) for pk, price in prices.items()}
+    current = prices_as_of(prices, at, kind)
+    rows = [
+        PriceHistory(medicine_id=pk, kind=kind, price=price, effective_from=at, source=source)
+        for pk, price in prices.items() if current.get(pk) != price
+    ]
+    PriceHistory.objects.bulk_create(rows, batch_size=CHUNK_SIZE)
+    return len(rows)
+
+
+def price_at_transaction(kind):
+    # the newest history row of the transaction's medicine not after performed_at
+    return models.Subquery(
+        PriceHistory.objects.filter(
+            medicine_id=models.OuterRef("medicine_id"), kind=kind, effective_from__lte=models.OuterRef("performed_at"),
+        ).order_by("-effective_from", "-pk").values("price")[:1]
+    )
+
+
+def margin_report(start, end, period="month", medicine_ids=None, by_medicine=False):
+    """
+    Units, revenue, cost and margin of OUT transactions with start <= performed_at < end, per period
+    (and per medicine when by_medicine). Revenue uses the selling price in effect at the sale; cost uses
+    the batch's purchase price when the transaction names a batch with one (autogen / adjust batches are
+    priced at 0, i.e. unknown), else the purchase cost in effect.
+    Sales older than any history fall back to the medicine's current unit_price / average_cost.
+    """
+    money = models.DecimalField(max_digits=14, decimal_places=2)
+    sale_price = Coalesce(price_at_transaction(PriceHistory.KIND_SALE), models.F("medicine__unit_price"), output_field=money)
+    unit_cost = Coalesce(
+        NullIf("batch__purchase_price", models.Value(Decimal("0"))), price_at_transaction(PriceHistory.KIND_COST), models.F("medicine__average_cost"),
+        models.Value(Decimal("0")), output_field=money,
+    )
+    qs = StockTransaction.objects.filter(transaction_type=StockTransaction.TYPE_OUT, performed_at__gte=start, performed_at__lt=end)
+    if medicine_ids is not None:
+        qs = qs.filter(medicine_id__in=list(medicine_ids))
+    group = ["period", "medicine_id"] if by_medicine else ["period"]
+    rows = (
+        qs.order_by().annotate(period=Trunc("performed_at", period))
+        .values(*group)
+        .annotate(
+            units=models.Sum("quantity"),
+            revenue=models.Sum(models.F("quantity") * sale_price, output_field=money),
+            cost=models.Sum(models.F("quantity") * unit_cost, output_field=money),
+        )
+        .order_by(*group)
+    )
+    report = []
+    for row in rows:
+        revenue = Decimal(row["revenue"] or 0).quantize(CENT)
+        cost = Decimal(row["cost"] or 0).quantize(CENT)
+        entry = {"period": row["period"].isoformat()}
+        if by_medicine:
+            entry["medicine"] = row["medicine_id"]
+        entry.update({
+            "units": row["units"],
+            "revenue": str(revenue),
+            "cost": str(cost),
+            "margin": str(revenue - cost),
+            "margin_pct": round(float((revenue - cost) / revenue * 100), 1) if revenue else None,
+        })
+        report.append(entry)
+    return report
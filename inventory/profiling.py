@@ -0,0 +1,156 @@
+"""
+Sampled cProfile capture per request.
+
+RequestProfilerMiddleware profiles a random SAMPLE_RATE of requests, plus any request carrying the
+HEADER from an authenticated admin, and dumps the stats to DIR/<url name>/<timestamp>-<pid>.prof.
+Each URL name keeps at most MAX_FILES_PER_URL captures (oldest removed first). One capture runs per process
+at a time: a request selected while another is being profiled runs unprofiled (Python 3.12+ allows one
+active profiler per interpreter, and a second enable() raises ValueError).
+
+`manage.py profile_report` merges captures into a top-function table and collapsed stacks
+(flamegraph.pl / speedscope input).
+"""
+import cProfile
+import os
+import random
+import re
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+DEFAULTS = {
+    "ENABLED": False,
+    "SAMPLE_RATE": 0.0,
+    "HEADER": "X-Profile",
+    "DIR": "profiles",
+    "MAX_FILES_PER_URL": 50,
+}
+
+def get_setting(name):
+    return getattr(settings, "INVENTORY_PROFILER", {}).get(name, DEFAULTS[name])
+
+
+def profile_dir():
+    path = Path(get_setting("DIR"))
+    if not path.is_absolute():
+        path = Path(settings.BASE_DIR) / path
+    return path
+
+
+_UNSAFE = re.compile(r"[^A-Za-z0-9_.-]+")
+
+def url_key(request):
+    match = getattr(request, "resolver_match", None)
+    name = (match.view_name if match else None) or "unresolved"
+    return _UNSAFE.sub("_", name)
+
+
+def captures(url_name=None):
+    """
+    Capture files, newest first, optionally for one URL name.
+    """
+    root = profile_dir()
+    if not root.exists():
+        return []
+    dirs = [root / url_name] if url_name else [d for d in root.iterdir() if d.is_dir()]
+    files = [f for d in dirs if d.exists() for f in d.glob("*.prof")]
+    return sorted(files, key=lambda f: f.stat().st_mtime, reverse=True)
+
+
+def store(profile, url_name):
+    directory = profile_dir() / url_name
+    directory.mkdir(parents=True, exist_ok=True)
+    profile.dump_stats(directory / f"{time.strftime('%Y%m%dT%H%M%S')}-{int(time.time() * 1000) % 1000:03d}-{os.getpid()}.prof")
+    keep = get_setting("MAX_FILES_PER_URL")
+    for old in sorted(directory.glob("*.prof"), key=lambda f: f.stat().st_mtime, reverse=True)[keep:]:
+        old.unlink(missing_ok=True)
+
+
+def _is_admin(request):
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        return user.role == "admin"
+    # API clients authenticate with JWT inside DRF, after middleware; resolve it here only for flagged requests
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    try:
+        result = JWTAuthentication().authenticate(request)
+    except Exception:
+        return False
+    return bool(result and result[0].role == "admin")
+
+
+_active = threading.Lock()
+
+
+class RequestProfilerMiddleware:
+    def __init__(self, get_response):
+        if not get_setting("ENABLED"):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.header = "HTTP_" + get_setting("HEADER").upper().replace("-", "_")
+
+    def should_profile(self, request):
+        if self.header in request.META and _is_admin(request):
+            return True
+        rate = get_setting("SAMPLE_RATE")
+        return rate > 0 and random.random() < rate
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+        if not _active.acquire(blocking=False):
+            return self.get_response(request)
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:  # a profiler outside this middleware (debugger, coverage) holds the slot
+            _active.release()
+            return self.get_response(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            profile.disable()
+            _active.release()
+        store(profile, url_key(request))
+        return response
+
+
+def collapsed_stacks(stats, max_depth=64, min_us=50):
+    """
+    Approximate collapsed stacks ("a;b;c <microseconds>") from pstats caller/callee edges.
+    cProfile keeps no full stacks, so a function's time is split across its callers in proportion
+    to each edge's cumulative time. Branches worth less than min_us are dropped, which also keeps
+    the walk from enumerating every path through a dense call graph.
+    """
+    callees = {}
+    for func, (_, _, _, _, callers) in stats.stats.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+    lines = {}
+
+    def label(func):
+        filename, line, name = func
+        return f"{name} ({os.path.basename(filename)}:{line})" if line else name
+
+    def walk(func, stack, scale):
+        _, _, tt, ct, _ = stats.stats[func]
+        path = stack + (label(func),)
+        own = int(tt * scale * 1000000)
+        if own:
+            key = ";".join(path)
+            lines[key] = lines.get(key, 0) + own
+        if len(path) >= max_depth:
+            return
+        for child, edge_ct in callees.get(func, ()):
+            child_ct = stats.stats[child][3]
+            if child_ct <= 0 or edge_ct * scale * 1000000 < min_us or label(child) in path:
+                continue
+            walk(child, path, scale * edge_ct / child_ct)
+
+    roots = [func for func, value in stats.stats.items() if not value[4]]
+    for root in roots:
+        walk(root, (), 1.0)
+    return [f"{stack} {value}" for stack, value in sorted(lines.items())]
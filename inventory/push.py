@@ -0,0 +1,207 @@
+"""
+Push channel for stock-level changes (Server-Sent Events over ASGI).
+
+Publishers (inventory.signals, after commit) call publish_stock_change() from any thread.
+The configured backend carries events to every process; the in-process hub coalesces bursts per
+medicine and fans each flush out to subscriber queues. An idle subscriber is one asyncio.Queue
+and one parked task, so thousands of open dashboards cost next to nothing.
+"""
+import asyncio
+import json
+import threading
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+DEFAULTS = {
+    "BACKEND": "inventory.push.InProcessBackend",
+    "COALESCE_SECONDS": 0.5,
+    "KEEPALIVE_SECONDS": 15.0,
+    "QUEUE_SIZE": 256,
+}
+
+def get_setting(name):
+    return getattr(settings, "INVENTORY_PUSH", {}).get(name, DEFAULTS[name])
+
+
+class Hub:
+    """
+    Per-process fan-out. Lives on the ASGI event loop; thread-safe entry point is deliver().
+    """
+    def __init__(self):
+        self.loop = None
+        self.subscribers = set()
+        self.pending = {}
+        self.flush_handle = None
+        self.sequence = 0
+
+    def bind(self, loop):
+        if self.loop is None or self.loop.is_closed():
+            self.loop = loop
+
+    def deliver(self, event):
+        # called from worker threads; nothing to do until someone is listening
+        loop = self.loop
+        if loop is None or loop.is_closed() or not self.subscribers:
+            return
+        loop.call_soon_threadsafe(self._coalesce, event)
+
+    def _coalesce(self, event):
+        key = event["medicine"]
+        previous = self.pending.get(key)
+        if previous is not None:
+            # keep the state from before the burst so a low-stock transition inside it isn't lost
+            event = dict(event, was_low=previous["was_low"])
+        self.pending[key] = event
+        if self.flush_handle is None:
+            self.flush_handle = self.loop.call_later(get_setting("COALESCE_SECONDS"), self._flush)
+
+    def _flush(self):
+        self.flush_handle = None
+        pending, self.pending = self.pending, {}
+        for event in pending.values():
+            self.sequence += 1
+            event["low_stock_transition"] = (
+                "entered" if event["low_stock"] and not event["was_low"]
+                else "left" if event["was_low"] and not event["low_stock"]
+                else None
+            )
+            for subscriber in list(self.subscribers):
+                subscriber.offer(self.sequence, event)
+
+
+class Subscriber:
+    def __init__(self, medicines=None, transitions_only=False):
+        self.queue = asyncio.Queue(maxsize=get_setting("QUEUE_SIZE"))
+        self.medicines = medicines
+        self.transitions_only = transitions_only
+
+    def offer(self, sequence, event):
+        if self.medicines is not None and event["medicine"] not in self.medicines:
+            return
+        if self.transitions_only and event["low_stock_transition"] is None:
+            return
+        if self.queue.full():
+            self.queue.get_nowait()  # slow consumer: drop the oldest, the newer event supersedes it
+        self.queue.put_nowait((sequence, event))
+
+
+hub = Hub()
+
+
+class InProcessBackend:
+    """
+    Single-process transport: hands events straight to this process's hub.
+    A multi-process deployment plugs in a backend with the same publish() that relays
+    through a shared bus (e.g. Redis pub/sub) and calls hub.deliver() on receipt in each process.
+    """
+    def publish(self, event):
+        hub.deliver(event)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = import_string(get_setting("BACKEND"))()
+    return _backend
+
+
+def publish_stock_change(medicine_id, total_stock, reorder_level, was_low):
+    get_backend().publish({
+        "medicine": medicine_id,
+        "total_stock": total_stock,
+        "reorder_level": reorder_level,
+        "low_stock": total_stock <= reorder_level,
+        "was_low": was_low,
+    })
+
+
+def _authenticate(scope, query):
+    """
+    True for a valid access token of an existing, active user (JWTAuthentication's checks). Queries the
+    database: call it through sync_to_async from the event loop.
+    """
+    from rest_framework.exceptions import AuthenticationFailed
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    from rest_framework_simplejwt.exceptions import TokenError
+
+    token = None
+    for name, value in scope.get("headers", []):
+        if name == b"authorization":
+            parts = value.decode("latin1").split()
+            if len(parts) == 2 and parts[0] in settings.SIMPLE_JWT.get("AUTH_HEADER_TYPES", ("Bearer",)):
+                token = parts[1]
+    if token is None:
+        # EventSource can't set headers, so browsers pass the access token in the query string
+        token = (query.get("token") or [None])[0]
+    if not token:
+        return False
+    auth = JWTAuthentication()
+    try:
+        auth.get_user(auth.get_validated_token(token))
+    except (AuthenticationFailed, TokenError):
+        return False
+    return True
+
+
+async def stock_event_stream(scope, receive, send):
+    """
+    ASGI endpoint: GET /events/stock/[?medicine=1,2][&transitions=1][&token=<access>]
+    """
+    query = parse_qs(scope.get("query_string", b"").decode())
+    if scope["method"] != "GET" or not await sync_to_async(_authenticate)(scope, query):
+        await send({"type": "http.response.start", "status": 401, "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": b'{"detail": "Authentication credentials were not provided or are invalid."}'})
+        return
+
+    medicines = None
+    if query.get("medicine"):
+        try:
+            medicines = {int(pk) for pk in query["medicine"][0].split(",") if pk}
+        except ValueError:
+            medicines = None
+    subscriber = Subscriber(medicines=medicines, transitions_only=query.get("transitions", ["0"])[0] == "1")
+
+    hub.bind(asyncio.get_running_loop())
+    hub.subscribers.add(subscriber)
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+    try:
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/event-stream"),
+                (b"cache-control", b"no-cache"),
+                (b"x-accel-buffering", b"no"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": b": connected\n\n", "more_body": True})
+        keepalive = get_setting("KEEPALIVE_SECONDS")
+        while not disconnected.done():
+            getter = asyncio.ensure_future(subscriber.queue.get())
+            done, _ = await asyncio.wait({getter, disconnected}, timeout=keepalive, return_when=asyncio.FIRST_COMPLETED)
+            if getter in done:
+                sequence, event = getter.result()
+                payload = f"id: {sequence}\nevent: stock\ndata: {json.dumps(event)}\n\n"
+                await send({"type": "http.response.body", "body": payload.encode(), "more_body": True})
+            else:
+                getter.cancel()
+                if not disconnected.done():
+                    await send({"type": "http.response.body", "body": b": keepalive\n\n", "more_body": True})
+    finally:
+        hub.subscribers.discard(subscriber)
+        disconnected.cancel()
+
+
+async def _wait_for_disconnect(receive):
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return
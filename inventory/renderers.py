@@ -0,0 +1,47 @@
+from django.conf import settings
+from rest_framework import parsers, renderers
+from rest_framework.exceptions import ParseError
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib-backed DRF classes are used instead
+    orjson = None
+
+_drf_encoder = encoders.JSONEncoder()
+
+
+def _default(obj):
+    # whatever orjson doesn't know natively (Decimal, lazy strings, QuerySets, ...) is encoded the DRF way
+    return _drf_encoder.default(obj)
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    """
+    JSONRenderer that encodes with orjson when it's installed.
+    Indented output (browsable API, ?indent) and a missing orjson fall back to the stock renderer.
+    """
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        renderer_context = renderer_context or {}
+        if orjson is None or self.get_indent(accepted_media_type or "", renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+        return orjson.dumps(data, default=_default, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONParser(parsers.JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        try:
+            raw = stream.read() if stream is not None else b""
+            if encoding.lower().replace("-", "") != "utf8":
+                raw = raw.decode(encoding).encode("utf-8")
+            return orjson.loads(raw)
+        except (ValueError, UnicodeError) as exc:
+            raise ParseError("JSON parse error - %s" % str(exc))
@@ -0,0 +1,230 @@
+"""
+Rebuild batch stock from the StockTransaction ledger.
+
+Each batch starts at its opening_quantity (stock it was created with outside the ledger; the received
+quantity for batches from before it was tracked) from its created_at, then the medicine's transactions are streamed in (performed_at, id) order with .iterator()
+and applied the way inventory.signals.handle_stock_transaction applies them:
+
+- IN / ADJUST with a batch:  +quantity on that batch (the synthetic "adjust-<tx id>" batch a batch-less
+                             ADJUST creates is floored at 0, as the handler does)
+- OUT with a batch:          -quantity on that batch
+- OUT without a batch:       FIFO over the medicine's batches that existed at the time, at the sale's
+                             location if it has one, unexpired on the sale date, by (expiry_date,
+                             received_date) with NULL expiries placed where this database sorts them.
+                             Historical reservations are unknown, so reserved units are not skipped.
+- IN / ADJUST without a batch (the batch was deleted, or a bulk repair entry) can't be placed and is counted.
+
+State is array-backed per partition (batch id -> slot, quantities in an array('q')), so a range of
+medicines replays without a model instance per batch. Ranges of medicine ids replay in parallel worker
+processes. apply() writes the rebuilt quantities back with chunked bulk_update(), then recomputes the
+medicine totals, batch summaries and location stock; the ledger itself is never modified.
+"""
+import os
+import re
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.db import connection, connections, models, transaction
+from django.utils import timezone
+
+from .audit import id_ranges, opening_quantity
+from .changes import record_changes
+from .models import Batch, Medicine, StockTransaction
+from .signals import bulk_stock_changes, recompute_total_stock_bulk
+
+CHUNK_SIZE = 1000
+ITERATOR_CHUNK_SIZE = 5000
+SYNTHETIC_ADJUST = re.compile(r"adjust-(\d+)$")
+
+TX_FIELDS = ("id", "medicine_id", "batch_id", "location_id", "transaction_type", "quantity", "performed_at")
+BATCH_FIELDS = (
+    "pk", "medicine_id", "location_id", "expiry_date", "received_date", "created_at",
+    "available_quantity", "batch_number",
+)
+
+
+class BatchState:
+    """
+    Replayed quantities of one partition's batches plus what FIFO allocation needs, in parallel arrays
+    indexed by slot.
+    """
+    def __init__(self, rows, nulls_last):
+        self.slot = {}
+        self.ids = array("q")
+        self.medicine = array("q")
+        self.location = array("q")  # 0 = no location
+        self.created_at = []
+        self.expiry = []
+        self.opening = array("q")
+        self.current = array("q")
+        self.available = array("q")
+        self.synthetic_adjust = {}  # slot -> id of the batch-less ADJUST that created it
+        self.fifo = {}  # medicine id -> slots in FIFO order
+        keys = {}
+        for pk, medicine_id, location_id, expiry, received, created_at, current, number, opening in rows:
+            slot = len(self.ids)
+            self.slot[pk] = slot
+            self.ids.append(pk)
+            self.medicine.append(medicine_id)
+            self.location.append(location_id or 0)
+            self.created_at.append(created_at)
+            self.expiry.append(expiry)
+            self.opening.append(opening)
+            self.current.append(current)
+            self.available.append(0)
+            match = SYNTHETIC_ADJUST.match(number or "")
+            if match:
+                self.synthetic_adjust[slot] = int(match.group(1))
+            self.fifo.setdefault(medicine_id, []).append(slot)
+            keys[slot] = ((expiry is None) == nulls_last, expiry or received, received, pk)
+        for slots in self.fifo.values():
+            slots.sort(key=keys.__getitem__)
+        # openings are applied when the replay clock passes each batch's creation
+        self.pending = sorted(range(len(self.ids)), key=lambda slot: self.created_at[slot], reverse=True)
+
+    def open(self, slot):
+        if self.created_at[slot] is not None:
+            self.available[slot] += self.opening[slot]
+            self.created_at[slot] = None  # marks the batch as existing
+
+    def open_until(self, moment):
+        pending = self.pending
+        while pending and (self.created_at[pending[-1]] is None or moment is None or self.created_at[pending[-1]] <= moment):
+            self.open(pending.pop())
+
+    def consume_fifo(self, medicine_id, location_id, quantity, sale_date):
+        remaining = quantity
+        for slot in self.fifo.get(medicine_id, ()):
+            if remaining <= 0:
+                break
+            if self.created_at[slot] is not None or self.available[slot] <= 0:
+                continue
+            if location_id and self.location[slot] != location_id:
+                continue
+            expiry = self.expiry[slot]
+            if expiry is not None and expiry < sale_date:
+                continue
+            take = min(self.available[slot], remaining)
+            self.available[slot] -= take
+            remaining -= take
+        return remaining
+
+
+def replay_range(lo, hi, until=None, up_to_id=None):
+    """
+    Replay medicines lo <= id < hi, optionally only transactions performed at or before `until` and with
+    id <= up_to_id. Returns (rows, stats): rows are (batch_id, medicine_id, current, replayed) for every
+    batch that existed at `until` (all batches when None).
+    """
+    in_range = {"medicine_id__gte": lo, "medicine_id__lt": hi}
+    batches = Batch.objects.filter(**in_range)
+    if until is not None:
+        batches = batches.filter(created_at__lte=until)
+    rows = batches.order_by().values_list(*BATCH_FIELDS, opening_quantity()).iterator(chunk_size=ITERATOR_CHUNK_SIZE)
+    state = BatchState(rows, nulls_last=connection.features.nulls_order_largest)
+    stats = {"transactions": 0, "fifo_short": 0, "unplaced": 0, "negative": 0}
+
+    txs = StockTransaction.objects.filter(**in_range)
+    if until is not None:
+        txs = txs.filter(performed_at__lte=until)
+    if up_to_id is not None:
+        txs = txs.filter(pk__lte=up_to_id)
+    for pk, medicine_id, batch_id, location_id, kind, quantity, performed_at in (
+        txs.order_by("performed_at", "id").values_list(*TX_FIELDS).iterator(chunk_size=ITERATOR_CHUNK_SIZE)
+    ):
+        stats["transactions"] += 1
+        state.open_until(performed_at)
+        slot = state.slot.get(batch_id) if batch_id is not None else None
+        if slot is not None:
+            # a batch exists once the ledger touches it (autogen batches are created just after their IN)
+            state.open(slot)
+        if kind == StockTransaction.TYPE_OUT:
+            if slot is not None:
+                state.available[slot] -= quantity
+            elif state.consume_fifo(medicine_id, location_id, quantity, timezone.localtime(performed_at).date()):
+                stats["fifo_short"] += 1
+        elif slot is None:
+            stats["unplaced"] += 1
+        elif state.synthetic_adjust.get(slot) == pk:
+            state.available[slot] = max(state.available[slot] + quantity, 0)
+        else:
+            state.available[slot] += quantity
+    state.open_until(until)
+
+    rows = []
+    for slot in range(len(state.ids)):
+        if state.available[slot] < 0:
+            stats["negative"] += 1
+        rows.append((state.ids[slot], state.medicine[slot], state.current[slot], state.available[slot]))
+    return rows, stats
+
+
+def _changed(lo, hi, until, up_to_id):
+    # worker entry point: only differences travel back to the parent
+    rows, stats = replay_range(lo, hi, until, up_to_id)
+    return [row for row in rows if row[2] != row[3]], stats
+
+
+def ledger_head():
+    return StockTransaction.objects.aggregate(top=models.Max("pk"))["top"] or 0
+
+
+def run_replay(up_to_id, range_size=5000, workers=None, until=None, changed_only=True):
+    """
+    Yields ((lo, hi), rows, stats) per medicine id range as workers finish; workers=1 runs in-process.
+    Only transactions with id <= up_to_id (ledger_head() when the replay started) are replayed.
+    """
+    job = _changed if changed_only else replay_range
+    ranges = id_ranges(range_size)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(ranges) == 1:
+        for lo, hi in ranges:
+            yield (lo, hi), *job(lo, hi, until, up_to_id)
+        return
+    # forked workers must open their own connections, not share the parent's sockets
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(job, lo, hi, until, up_to_id): (lo, hi) for lo, hi in ranges}
+        for future in as_completed(futures):
+            yield futures[future], *future.result()
+
+
+@transaction.atomic
+def apply(rows, up_to_id):
+    """
+    Write replayed quantities (rows from run_replay) back with chunked bulk_update. The medicines' batches
+    and the medicines are locked first (in the stock handlers' order) and stay locked until the write
+    commits; medicines with transactions newer than up_to_id are then skipped (the replay didn't see them).
+    Negative results are floored at 0 and reservations are cut back to what is available.
+    Returns (written, skipped medicine ids).
+    """
+    medicine_ids = {medicine_id for _, medicine_id, _, _ in rows}
+    moved = set()
+    ids = sorted(medicine_ids)
+    for i in range(0, len(ids), CHUNK_SIZE):
+        chunk = ids[i:i + CHUNK_SIZE]
+        list(Batch.objects.select_for_update().filter(medicine_id__in=chunk).order_by("pk").values_list("pk"))
+        list(Medicine.objects.select_for_update().filter(pk__in=chunk).order_by("pk").values_list("pk"))
+        moved.update(
+            StockTransaction.objects.filter(medicine_id__in=chunk, pk__gt=up_to_id)
+            .values_list("medicine_id", flat=True).distinct()
+        )
+    rows = [row for row in rows if row[1] not in moved]
+    now = timezone.now()
+    written = []
+    with bulk_stock_changes():
+        for i in range(0, len(rows), CHUNK_SIZE):
+            objs = []
+            for batch_id, _, _, replayed in rows[i:i + CHUNK_SIZE]:
+                obj = Batch(pk=batch_id, available_quantity=max(replayed, 0))
+                obj.version = models.F("version") + 1
+                obj.updated_at = now
+                objs.append(obj)
+            Batch.objects.bulk_update(objs, ["available_quantity", "version", "updated_at"])
+            written.extend(obj.pk for obj in objs)
+        Batch.objects.filter(pk__in=written, reserved_quantity__gt=models.F("available_quantity")).update(
+            reserved_quantity=models.F("available_quantity")
+        )
+    record_changes("batch", written)
+    recompute_total_stock_bulk(medicine_ids - moved)
+    return len(written), sorted(moved)
@@ -0,0 +1,122 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .models import Batch, Reservation, StockTransaction
+from .changes import record_change, record_changes
+from .concurrency import write_stamp
+
+
+def default_ttl():
+    return getattr(settings, "INVENTORY_RESERVATION_TTL", timedelta(minutes=30))
+
+
+def _shift_reserved(batch_id, delta):
+    Batch.objects.filter(pk=batch_id).update(
+        reserved_quantity=models.F("reserved_quantity") + delta,
+        **write_stamp(),
+    )
+    record_change("batch", batch_id)
+
+
+@transaction.atomic
+def reserve(batch, customer, quantity, ttl=None):
+    """
+    Hold `quantity` units of `batch`. The availability check is the WHERE clause of the
+    increment, so concurrent holds on the same batch can never oversubscribe it.
+    """
+    rows = Batch.objects.filter(
+        pk=batch.pk, available_quantity__gte=models.F("reserved_quantity") + quantity
+    ).update(
+        reserved_quantity=models.F("reserved_quantity") + quantity,
+        **write_stamp(),
+    )
+    if not rows:
+        raise ValidationError({"quantity": "Not enough unreserved stock in this batch."})
+    record_change("batch", batch.pk)
+    return Reservation.objects.create(
+        batch=batch,
+        medicine_id=batch.medicine_id,
+        customer=customer,
+        quantity=quantity,
+        expires_at=timezone.now() + (ttl or default_ttl()),
+    )
+
+
+@transaction.atomic
+def release(reservation, status=Reservation.STATUS_RELEASED):
+    """
+    Give the held units back. Returns False if the reservation was no longer active.
+    """
+    rows = Reservation.objects.filter(pk=reservation.pk, status=Reservation.STATUS_ACTIVE).update(status=status)
+    if not rows:
+        return False
+    _shift_reserved(reservation.batch_id, -reservation.quantity)
+    reservation.status = status
+    return True
+
+
+@transaction.atomic
+def fulfil(reservation, performed_by):
+    """
+    Convert an active hold into a TYPE_OUT StockTransaction against the held batch.
+    """
+    if reservation.expires_at <= timezone.now():
+        # left for the sweeper; releasing here would be rolled back with the error
+        raise ValidationError({"detail": "Reservation has expired."})
+    if not release(reservation, status=Reservation.STATUS_FULFILLED):
+        reservation.refresh_from_db(fields=["status"])
+        raise ValidationError({"detail": f"Reservation is {reservation.status}, not active."})
+    try:
+        tx = StockTransaction.objects.create(
+            medicine_id=reservation.medicine_id,
+            batch_id=reservation.batch_id,
+            transaction_type=StockTransaction.TYPE_OUT,
+            quantity=reservation.quantity,
+            performed_by=performed_by,
+            note=f"Fulfilled reservation #{reservation.pk}",
+        )
+    except ValueError as exc:
+        # the batch lost stock under the hold (write-off, correction); the release above rolls back with this
+        raise ValidationError({"quantity": str(exc)})
+    reservation.transaction = tx
+    reservation.save(update_fields=["transaction"])
+    return tx
+
+
+def expire_due(now=None, chunk_size=1000):
+    """
+    Sweep expired holds in chunks: one UPDATE flips a chunk to 'expired', one grouped query
+    sums the released units per batch and one CASE UPDATE gives them back. Returns holds expired.
+    """
+    now = now or timezone.now()
+    expired = 0
+    while True:
+        with transaction.atomic():
+            ids = list(
+                Reservation.objects.select_for_update(skip_locked=True)
+                .filter(status=Reservation.STATUS_ACTIVE, expires_at__lte=now)
+                .order_by("expires_at")
+                .values_list("pk", flat=True)[:chunk_size]
+            )
+            if not ids:
+                return expired
+            Reservation.objects.filter(pk__in=ids).update(status=Reservation.STATUS_EXPIRED)
+            per_batch = dict(
+                Reservation.objects.filter(pk__in=ids)
+                .values("batch")
+                .annotate(total=models.Sum("quantity"))
+                .values_list("batch", "total")
+            )
+            Batch.objects.filter(pk__in=per_batch).update(
+                reserved_quantity=models.F("reserved_quantity") - models.Case(
+                    *[models.When(pk=batch_id, then=models.Value(total)) for batch_id, total in per_batch.items()],
+                    default=models.Value(0),
+                ),
+                **write_stamp(),
+            )
+            record_changes("batch", per_batch)
+            expired += len(ids)
@@ -0,0 +1,211 @@
+"""
+Supplier scorecards from monthly rollups.
+
+SupplierMonthlyStats / SupplierMedicinePrice hold one row per (supplier, month[, medicine]) for the POs
+created in that month. A PO status change rebuilds only its own bucket (refresh_for_order, wired in
+inventory.signals); `manage.py rebuild_supplier_scorecards` rebuilds everything. The endpoints read the
+rollups only, a few hundred rows for a year of data, never the PO / item tables.
+"""
+import datetime
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.utils import timezone
+
+from .models import PurchaseItem, PurchaseOrder, Supplier, SupplierMedicinePrice, SupplierMonthlyStats
+
+CENT = Decimal("0.01")
+
+
+def month_start(value):
+    if isinstance(value, datetime.datetime):
+        value = timezone.localtime(value) if timezone.is_aware(value) else value
+        value = value.date()
+    return value.replace(day=1)
+
+
+def next_month(month):
+    return (month + datetime.timedelta(days=32)).replace(day=1)
+
+
+def window_start(months):
+    month = month_start(timezone.now())
+    for _ in range(months - 1):
+        month = (month - datetime.timedelta(days=1)).replace(day=1)
+    return month
+
+
+@transaction.atomic
+def refresh_bucket(supplier_id, month):
+    """
+    Rebuild the rollup rows of one supplier-month from the POs created in it.
+    """
+    start = timezone.make_aware(datetime.datetime.combine(month, datetime.time.min))
+    end = timezone.make_aware(datetime.datetime.combine(next_month(month), datetime.time.min))
+    orders = PurchaseOrder.objects.filter(supplier_id=supplier_id, created_at__gte=start, created_at__lt=end)
+    counts = orders.aggregate(
+        placed=models.Count("pk"),
+        received=models.Count("pk", filter=models.Q(status=PurchaseOrder.STATUS_RECEIVED)),
+        cancelled=models.Count("pk", filter=models.Q(status=PurchaseOrder.STATUS_CANCELLED)),
+    )
+    lead_days = sum(
+        (received_at - created_at).total_seconds() / 86400
+        for created_at, received_at in orders.filter(status=PurchaseOrder.STATUS_RECEIVED, received_at__isnull=False)
+        .values_list("created_at", "received_at")
+    )
+    prices = list(
+        PurchaseItem.objects.filter(purchase_order__in=orders.filter(status=PurchaseOrder.STATUS_RECEIVED))
+        .values("medicine_id")
+        .annotate(units=models.Sum("quantity"), spend=models.Sum(models.F("quantity") * models.F("purchase_price")))
+    )
+
+    SupplierMedicinePrice.objects.filter(supplier_id=supplier_id, month=month).delete()
+    if not counts["placed"]:
+        SupplierMonthlyStats.objects.filter(supplier_id=supplier_id, month=month).delete()
+        return
+    SupplierMonthlyStats.objects.update_or_create(
+        supplier_id=supplier_id, month=month,
+        defaults={
+            "orders_placed": counts["placed"],
+            "orders_received": counts["received"],
+            "orders_cancelled": counts["cancelled"],
+            "lead_time_days": lead_days,
+            "units_received": sum(p["units"] for p in prices),
+            "spend": sum((Decimal(p["spend"]) for p in prices), Decimal("0")).quantize(CENT),
+        },
+    )
+    SupplierMedicinePrice.objects.bulk_create([
+        SupplierMedicinePrice(
+            supplier_id=supplier_id, medicine_id=p["medicine_id"], month=month,
+            units=p["units"], spend=Decimal(p["spend"]).quantize(CENT),
+        )
+        for p in prices
+    ])
+
+
+def refresh_for_order(supplier_id, created_at):
+    if supplier_id is not None:
+        refresh_bucket(supplier_id, month_start(created_at))
+
+
+def rebuild_all():
+    buckets = set()
+    for supplier_id, created_at in PurchaseOrder.objects.filter(supplier__isnull=False).values_list("supplier_id", "created_at").iterator():
+        buckets.add((supplier_id, month_start(created_at)))
+    with transaction.atomic():
+        SupplierMonthlyStats.objects.all().delete()
+        SupplierMedicinePrice.objects.all().delete()
+        for supplier_id, month in buckets:
+            refresh_bucket(supplier_id, month)
+    return len(buckets)
+
+
+def _ratio(numerator, denominator, digits=3):
+    return round(numerator / denominator, digits) if denominator else None
+
+
+def _summary(row):
+    return {
+        "orders_placed": row["orders_placed"],
+        "orders_received": row["orders_received"],
+        "orders_cancelled": row["orders_cancelled"],
+        "cancellation_rate": _ratio(row["orders_cancelled"], row["orders_placed"]),
+        "avg_lead_time_days": _ratio(row["lead_time_days"], row["orders_received"], 2),
+        "units_received": row["units_received"],
+        "spend": str(Decimal(row["spend"] or 0).quantize(CENT)),
+    }
+
+
+def market_prices(since):
+    """
+    {medicine_id: all-supplier average unit price} over the window.
+    """
+    return {
+        row["medicine_id"]: Decimal(row["spend"]) / row["units"]
+        for row in SupplierMedicinePrice.objects.filter(month__gte=since).values("medicine_id")
+        .annotate(units=models.Sum("units"), spend=models.Sum("spend"))
+        if row["units"]
+    }
+
+
+def _price_index(rows, market):
+    # what the supplier was paid relative to what the same units cost at the market average (100 = par)
+    paid = sum((Decimal(r["spend"]) for r in rows), Decimal("0"))
+    at_market = sum((r["units"] * market[r["medicine_id"]] for r in rows if r["medicine_id"] in market), Decimal("0"))
+    return round(float(paid / at_market * 100), 1) if at_market else None
+
+
+STAT_SUMS = {
+    field: models.Sum(field)
+    for field in ("orders_placed", "orders_received", "orders_cancelled", "lead_time_days", "units_received", "spend")
+}
+
+
+def scorecard(supplier, months=12):
+    since = window_start(months)
+    stats = SupplierMonthlyStats.objects.filter(supplier=supplier, month__gte=since)
+    totals = stats.aggregate(**STAT_SUMS)
+    market = market_prices(since)
+    medicines = list(
+        SupplierMedicinePrice.objects.filter(supplier=supplier, month__gte=since)
+        .values("medicine_id", "medicine__sku", "medicine__name")
+        .annotate(units=models.Sum("units"), spend=models.Sum("spend"))
+        .order_by("-spend")
+    )
+    return {
+        "supplier": {"id": supplier.pk, "name": supplier.name},
+        "since": since.isoformat(),
+        **_summary({k: v or 0 for k, v in totals.items()}),
+        "price_index": _price_index(medicines, market),
+        "medicines": [
+            {
+                "medicine": m["medicine_id"],
+                "sku": m["medicine__sku"],
+                "name": m["medicine__name"],
+                "units": m["units"],
+                "avg_price": str((Decimal(m["spend"]) / m["units"]).quantize(CENT)),
+                "market_avg_price": str(market[m["medicine_id"]].quantize(CENT)),
+                "price_index": round(float(Decimal(m["spend"]) / m["units"] / market[m["medicine_id"]] * 100), 1),
+            }
+            for m in medicines if m["units"]
+        ],
+        "monthly": [
+            {"month": row["month"].isoformat(), **_summary(row)}
+            for row in stats.order_by("month").values("month", *STAT_SUMS)
+        ],
+    }
+
+
+RANKING_FIELDS = ("price_index", "avg_lead_time_days", "cancellation_rate", "spend", "orders_placed")
+
+
+def ranking(months=12, ordering="price_index"):
+    since = window_start(months)
+    market = market_prices(since)
+    per_supplier = {}
+    for row in (
+        SupplierMedicinePrice.objects.filter(month__gte=since).values("supplier_id", "medicine_id")
+        .annotate(units=models.Sum("units"), spend=models.Sum("spend"))
+    ):
+        per_supplier.setdefault(row["supplier_id"], []).append(row)
+    rows = list(SupplierMonthlyStats.objects.filter(month__gte=since).values("supplier_id").annotate(**STAT_SUMS))
+    names = dict(Supplier.objects.filter(pk__in=[row["supplier_id"] for row in rows]).values_list("pk", "name"))
+    result = [
+        {
+            "supplier": {"id": row["supplier_id"], "name": names.get(row["supplier_id"])},
+            **_summary(row),
+            "price_index": _price_index(per_supplier.get(row["supplier_id"], []), market),
+        }
+        for row in rows
+    ]
+    descending = ordering.startswith("-")
+    field = ordering.lstrip("-")
+
+    def key(item):
+        value = item[field]
+        if field == "spend":
+            value = Decimal(value)
+        # suppliers without data for the field always sort last
+        return (value is None, -value if descending and value is not None else value)
+
+    return sorted(result, key=key)
@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import Category, Supplier, Medicine, Batch, PurchaseOrder, PurchaseItem, StockTransaction
+from .models import Category, Supplier, Medicine, Batch, PurchaseOrder, PurchaseItem, StockTransaction, Reservation, Location, MedicineLocationStock, PriceHistory, MedicineForecast
+from .pricing import PERIODS
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -11,11 +12,16 @@ class SupplierSerializer(serializers.ModelSerializer):
         model = Supplier
         fields = ("id", "name", "contact_email", "phone", "address", "notes")
 
+class LocationSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Location
+        fields = ("id", "code", "name", "address", "is_active")
+
 class BatchSerializer(serializers.ModelSerializer):
     class Meta:
         model = Batch
-        fields = ("id", "batch_number", "quantity", "available_quantity", "purchase_price", "supplier", "received_date", "expiry_date", "created_at")
-        read_only_fields = ("created_at",)
+        fields = ("id", "batch_number", "quantity", "available_quantity", "reserved_quantity", "purchase_price", "supplier", "location", "received_date", "expiry_date", "created_at", "version")
+        read_only_fields = ("reserved_quantity", "created_at", "version")
 
 class MedicineSerializer(serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
@@ -24,8 +30,17 @@ class MedicineSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Medicine
-        fields = ("id", "sku", "name", "category", "category_id", "description", "unit_price", "total_stock", "reorder_level", "is_active", "batches", "created_at")
-        read_only_fields = ("total_stock", "created_at")
+        fields = (
+            "id", "sku", "name", "category", "category_id", "description", "unit_price", "total_stock", "reorder_level", "is_active",
+            "next_expiry", "live_batches", "oldest_received", "average_cost", "batches", "created_at", "version",
+        )
+        read_only_fields = ("total_stock", "next_expiry", "live_batches", "oldest_received", "average_cost", "created_at", "version")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # ?batches=0: the summary columns only, without reading the Batch table
+        if not self.context.get("include_batches", True):
+            self.fields.pop("batches")
 
 class PurchaseItemSerializer(serializers.ModelSerializer):
     medicine = serializers.PrimaryKeyRelatedField(queryset=Medicine.objects.all())
@@ -44,13 +59,13 @@ class PurchaseOrderSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = PurchaseOrder
-        fields = ("id", "supplier", "supplier_detail", "created_by", "created_at", "status", "note", "items", "total_cost")
-        read_only_fields = ("created_at", "created_by", "total_cost")
+        fields = ("id", "supplier", "supplier_detail", "created_by", "created_at", "status", "received_at", "note", "items", "total_cost")
+        read_only_fields = ("created_at", "created_by", "received_at", "total_cost")
 
     def create(self, validated_data):
         items_data = validated_data.pop("items", [])
-        user = self.context["request"].user
-        po = PurchaseOrder.objects.create(created_by=user, **validated_data)
+        validated_data.setdefault("created_by", self.context["request"].user)
+        po = PurchaseOrder.objects.create(**validated_data)
         for it in items_data:
             PurchaseItem.objects.create(purchase_order=po, **it)
         return po
@@ -59,6 +74,7 @@ class PurchaseOrderSerializer(serializers.ModelSerializer):
         # basic update that allows status changes to 'received' — on receiving, create Batches and StockTransactions
         items_data = validated_data.pop("items", None)
         status = validated_data.get("status", instance.status)
+        was_received = instance.status == PurchaseOrder.STATUS_RECEIVED
         for attr, val in validated_data.items():
             setattr(instance, attr, val)
         instance.save()
@@ -69,14 +85,15 @@ class PurchaseOrderSerializer(serializers.ModelSerializer):
             for it in items_data:
                 PurchaseItem.objects.create(purchase_order=instance, **it)
 
-        # if status changed to received, create batches and stock transactions
-        if instance.status == PurchaseOrder.STATUS_RECEIVED:
+        # if status changed to received, create batches and stock transactions (once: a re-PUT of a received PO must not restock)
+        if instance.status == PurchaseOrder.STATUS_RECEIVED and not was_received:
             for item in instance.items.all():
                 med = item.medicine
+                # created empty: the IN transaction below books the stock (it used to be counted twice)
                 batch = med.batches.create(
                     batch_number=item.batch_number or f"po-{instance.pk}-{item.pk}",
                     quantity=item.quantity,
-                    available_quantity=item.quantity,
+                    available_quantity=0,
                     purchase_price=item.purchase_price,
                     supplier=instance.supplier,
                     received_date=instance.created_at.date(),
@@ -98,5 +115,108 @@ class StockTransactionSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = StockTransaction
-        fields = ("id", "medicine", "medicine_detail", "batch", "transaction_type", "quantity", "note", "performed_by", "performed_at")
+        fields = ("id", "medicine", "medicine_detail", "batch", "location", "transaction_type", "quantity", "note", "performed_by", "performed_at")
         read_only_fields = ("performed_at", "performed_by")
+
+    def validate(self, attrs):
+        batch = attrs.get("batch")
+        if batch is not None:
+            # a batch lives in one place; default (and pin) the transaction to it
+            location = attrs.get("location")
+            if location is not None and batch.location_id != location.pk:
+                raise serializers.ValidationError({"location": "Batch belongs to a different location."})
+            attrs["location"] = batch.location
+        return attrs
+
+class MedicineLocationStockSerializer(serializers.ModelSerializer):
+    sku = serializers.ReadOnlyField(source="medicine.sku")
+    name = serializers.ReadOnlyField(source="medicine.name")
+
+    class Meta:
+        model = MedicineLocationStock
+        fields = ("id", "medicine", "sku", "name", "location", "total_stock", "reorder_level")
+        read_only_fields = ("medicine", "location", "total_stock")
+
+class TransferSerializer(serializers.Serializer):
+    medicine = serializers.PrimaryKeyRelatedField(queryset=Medicine.objects.all())
+    from_location = serializers.PrimaryKeyRelatedField(queryset=Location.objects.filter(is_active=True))
+    to_location = serializers.PrimaryKeyRelatedField(queryset=Location.objects.filter(is_active=True))
+    quantity = serializers.IntegerField(min_value=1)
+    batch = serializers.PrimaryKeyRelatedField(queryset=Batch.objects.all(), required=False, allow_null=True)
+
+class ReservationSerializer(serializers.ModelSerializer):
+    customer = serializers.ReadOnlyField(source="customer.email")
+    ttl_minutes = serializers.IntegerField(write_only=True, required=False, min_value=1, max_value=24 * 60)
+
+    class Meta:
+        model = Reservation
+        fields = ("id", "batch", "medicine", "customer", "quantity", "status", "expires_at", "created_at", "transaction", "ttl_minutes")
+        read_only_fields = ("medicine", "customer", "status", "expires_at", "created_at", "transaction")
+
+# Bulk operations (inventory.bulk)
+class MedicineBulkUpdateSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    unit_price = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=0, required=False)
+    reorder_level = serializers.IntegerField(min_value=0, required=False)
+    is_active = serializers.BooleanField(required=False)
+
+class BatchBulkUpdateSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    batch_number = serializers.CharField(max_length=128, allow_blank=True, required=False)
+    purchase_price = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=0, required=False)
+    expiry_date = serializers.DateField(allow_null=True, required=False)
+    available_quantity = serializers.IntegerField(min_value=0, required=False)
+
+class BatchBulkDeleteSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    expired_before = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        if not attrs.get("ids") and not attrs.get("expired_before"):
+            raise serializers.ValidationError("Provide ids or expired_before.")
+        return attrs
+
+# Price history and margin queries (inventory.pricing)
+class PricesAsOfSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), max_length=50000, required=False, allow_empty=False)
+    skus = serializers.ListField(child=serializers.CharField(max_length=64), max_length=50000, required=False, allow_empty=False)
+    as_of = serializers.DateTimeField(required=False)
+    kind = serializers.ChoiceField(choices=PriceHistory.KIND_CHOICES, default=PriceHistory.KIND_SALE)
+
+    def validate(self, attrs):
+        if not attrs.get("ids") and not attrs.get("skus"):
+            raise serializers.ValidationError("Provide ids or skus.")
+        return attrs
+
+class MarginReportQuerySerializer(serializers.Serializer):
+    start = serializers.DateField()
+    end = serializers.DateField()  # exclusive
+    period = serializers.ChoiceField(choices=PERIODS, default="month")
+    medicine = serializers.IntegerField(required=False)
+    by_medicine = serializers.BooleanField(default=False)
+
+    def validate(self, attrs):
+        if attrs["end"] <= attrs["start"]:
+            raise serializers.ValidationError({"end": "Must be after start."})
+        return attrs
+
+# Demand forecasts (inventory.forecasting)
+class MedicineForecastSerializer(serializers.ModelSerializer):
+    total_stock = serializers.IntegerField(source="medicine.total_stock", read_only=True)
+    days_of_cover = serializers.SerializerMethodField()
+
+    class Meta:
+        model = MedicineForecast
+        fields = (
+            "medicine", "method", "as_of", "history_days", "level", "weekday_factors", "daily", "horizon_total",
+            "total_stock", "days_of_cover", "computed_at",
+        )
+
+    def get_days_of_cover(self, obj):
+        # whole forecast days the current stock lasts; None when it outlasts the horizon
+        remaining = obj.medicine.total_stock
+        for day, units in enumerate(obj.daily):
+            remaining -= units
+            if remaining < 0:
+                return day
+        return None
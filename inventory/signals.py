@@ -1,23 +1,225 @@
 from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
-from .models import Batch, Medicine, StockTransaction
-from django.db import models
+from .models import Batch, Medicine, StockTransaction, MedicineLocationStock, Category, Supplier, PurchaseOrder, PurchaseItem, ChangeEvent, PriceHistory
+from .concurrency import VersionConflict, retry_on_conflict, versioned_update, write_stamp
+from .changes import record_change, record_changes
+from .push import publish_stock_change
+from .scorecards import refresh_for_order
+from .pricing import record_prices
+from .instrumentation import track_origin
+from django.db import models, transaction, IntegrityError
+from django.db.models.functions import Cast, Coalesce, NullIf
+from django.utils import timezone
+from contextlib import contextmanager
+import threading
 
+_state = threading.local()
+
+@contextmanager
+def bulk_stock_changes():
+    """
+    Silence the per-row Batch handlers (totals, location stock, change feed) for the duration;
+    the caller is responsible for recompute_total_stock_bulk() and record_changes() afterwards.
+    """
+    previous = getattr(_state, "bulk", False)
+    _state.bulk = True
+    try:
+        yield
+    finally:
+        _state.bulk = previous
+
+def in_bulk():
+    return getattr(_state, "bulk", False)
+
+def batch_summary_aggregates():
+    """
+    Aggregates over one medicine's batches for the denormalized Medicine columns: total_stock plus the
+    live-batch summary (next expiry, live count, oldest received date, unit-weighted average cost).
+    """
+    live = models.Q(available_quantity__gt=0)
+    return {
+        "total_stock": models.Sum("available_quantity"),
+        "next_expiry": models.Min("expiry_date", filter=live),
+        "live_batches": models.Count("pk", filter=live),
+        "oldest_received": models.Min("received_date", filter=live),
+        "average_cost": models.ExpressionWrapper(
+            # float denominator: SQLite stores whole-number decimals as integers and would divide as integers
+            models.Sum(models.F("available_quantity") * models.F("purchase_price"), filter=live)
+            / NullIf(Cast(models.Sum("available_quantity", filter=live), models.FloatField()), 0),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        ),
+    }
+
+@track_origin("recompute_total_stock")
 def recompute_total_stock(medicine):
-    total = medicine.batches.aggregate(total=models.Sum("available_quantity"))["total"] or 0
-    medicine.total_stock = int(total)
-    medicine.save(update_fields=["total_stock"])
+    # internal writer: conditional on the version we read, retried if a concurrent writer wins
+    def attempt():
+        row = Medicine.objects.filter(pk=medicine.pk).values_list("version", "total_stock", "reorder_level").first()
+        if row is None:
+            return None  # medicine deleted (cascade in progress)
+        version, old_total, reorder_level = row
+        summary = Batch.objects.filter(medicine_id=medicine.pk).aggregate(**batch_summary_aggregates())
+        total = int(summary.pop("total_stock") or 0)
+        summary["live_batches"] = summary["live_batches"] or 0
+        if not versioned_update(Medicine, medicine.pk, version, total_stock=total, **summary):
+            raise VersionConflict()
+        medicine.total_stock = total
+        for field, value in summary.items():
+            setattr(medicine, field, value)
+        medicine.version = version + 1
+        return old_total, total, reorder_level
+
+    result = retry_on_conflict(attempt)
+    if result is None:
+        return
+    record_change("medicine", medicine.pk)
+    old_total, new_total, reorder_level = result
+    if old_total != new_total:
+        # push to live dashboards only once the change is visible to everyone
+        transaction.on_commit(lambda: publish_stock_change(medicine.pk, new_total, reorder_level, old_total <= reorder_level))
+
+@track_origin("recompute_total_stock_bulk")
+def recompute_total_stock_bulk(medicine_ids):
+    """
+    Recompute total_stock and the batch summary (and per-location stock, creating missing rows) for many
+    medicines with one grouped UPDATE each, instead of one aggregate + write per medicine.
+    """
+    medicine_ids = list(set(medicine_ids))
+    if not medicine_ids:
+        return
+    before = dict((pk, (total, reorder)) for pk, total, reorder in
+                  Medicine.objects.filter(pk__in=medicine_ids).values_list("pk", "total_stock", "reorder_level"))
+    summary = {}
+    for field, aggregate in batch_summary_aggregates().items():
+        value = models.Subquery(
+            Batch.objects.filter(medicine_id=models.OuterRef("pk"))
+            .values("medicine_id").annotate(value=aggregate).values("value")
+        )
+        # medicines left without batches get 0 / NULL
+        summary[field] = Coalesce(value, 0) if field in ("total_stock", "live_batches") else value
+    Medicine.objects.filter(pk__in=medicine_ids).update(**summary, **write_stamp())
+    # (medicine, location) pairs that got their first stock through a bulk path have no row yet
+    present = set(MedicineLocationStock.objects.filter(medicine_id__in=medicine_ids).values_list("medicine_id", "location_id"))
+    missing = set(
+        Batch.objects.filter(medicine_id__in=medicine_ids, location__isnull=False)
+        .values_list("medicine_id", "location_id").distinct()
+    ) - present
+    if missing:
+        reorder_levels = {pk: reorder for pk, (_, reorder) in before.items()}
+        MedicineLocationStock.objects.bulk_create(
+            [MedicineLocationStock(medicine_id=m, location_id=loc, reorder_level=reorder_levels[m]) for m, loc in missing],
+            ignore_conflicts=True,
+        )
+    location_sum = (
+        Batch.objects.filter(medicine_id=models.OuterRef("medicine_id"), location_id=models.OuterRef("location_id"))
+        .values("medicine_id").annotate(total=models.Sum("available_quantity")).values("total")
+    )
+    MedicineLocationStock.objects.filter(medicine_id__in=medicine_ids).update(total_stock=Coalesce(models.Subquery(location_sum), 0))
+    record_changes("medicine", before)
+    after = Medicine.objects.filter(pk__in=medicine_ids).values_list("pk", "total_stock")
+    for pk, total in after:
+        old_total, reorder_level = before[pk]
+        if old_total != total:
+            transaction.on_commit(lambda pk=pk, total=total, old_total=old_total, reorder_level=reorder_level:
+                                  publish_stock_change(pk, total, reorder_level, old_total <= reorder_level))
+
+def apply_location_delta(medicine_id, location_id, delta):
+    # incremental maintenance of the per-(medicine, location) aggregate; creates the row on first stock
+    if location_id is None or not delta:
+        return
+    qs = MedicineLocationStock.objects.filter(medicine_id=medicine_id, location_id=location_id)
+    if qs.update(total_stock=models.F("total_stock") + delta):
+        return
+    reorder_level = Medicine.objects.filter(pk=medicine_id).values_list("reorder_level", flat=True).first()
+    try:
+        with transaction.atomic():
+            MedicineLocationStock.objects.create(
+                medicine_id=medicine_id, location_id=location_id, total_stock=delta,
+                reorder_level=reorder_level if reorder_level is not None else 10,
+            )
+    except IntegrityError:
+        qs.update(total_stock=models.F("total_stock") + delta)
+
+def adjust_batch_quantity(batch, delta):
+    # atomic F() increment; also bumps version so stale API writes of this batch get a 412
+    Batch.objects.filter(pk=batch.pk).update(
+        available_quantity=models.F("available_quantity") + delta,
+        **write_stamp(),
+    )
+    apply_location_delta(batch.medicine_id, batch.location_id, delta)
+    record_change("batch", batch.pk)
+
+@track_origin("consume_fifo")
+def consume_fifo(medicine, quantity, location_id=None):
+    """
+    Consume from earliest-expiring unexpired batches (of one location when given). Each decrement is conditional
+    on the batch version we read, so two concurrent sales can't both take the same units; on conflict
+    we re-read and retry.
+    """
+    # expired stock is never sold (expire_batches writes it off)
+    today = timezone.localdate()
+    batches = Batch.objects.filter(medicine_id=medicine.pk).filter(models.Q(expiry_date__isnull=True) | models.Q(expiry_date__gte=today))
+    if location_id is not None:
+        batches = batches.filter(location_id=location_id)
+    remaining = quantity
+    while remaining > 0:
+        def take_one():
+            # units held by active reservations are not for sale
+            b = (
+                batches.filter(available_quantity__gt=models.F("reserved_quantity"))
+                .order_by("expiry_date", "received_date")
+                .values("pk", "available_quantity", "reserved_quantity", "version", "location_id")
+                .first()
+            )
+            if b is None:
+                return 0, None, None
+            take = min(b["available_quantity"] - b["reserved_quantity"], remaining)
+            if not versioned_update(Batch, b["pk"], b["version"], available_quantity=models.F("available_quantity") - take):
+                raise VersionConflict()
+            return take, b["location_id"], b["pk"]
+
+        taken, taken_from, batch_id = retry_on_conflict(take_one, attempts=10)
+        if not taken:
+            raise ValueError("Not enough stock to consume requested quantity")
+        apply_location_delta(medicine.pk, taken_from, -taken)
+        record_change("batch", batch_id)
+        remaining -= taken
+
+@receiver(pre_save, sender=Batch)
+def batch_pre_save(sender, instance, **kwargs):
+    if instance._state.adding and instance.opening_quantity is None:
+        instance.opening_quantity = max(instance.available_quantity, 0)
+    # remember what this batch contributed before the save so location stock can be moved by the difference
+    instance._stock_before = None
+    if instance.pk and not in_bulk():
+        instance._stock_before = Batch.objects.filter(pk=instance.pk).values_list("available_quantity", "location_id").first()
 
 @receiver(post_save, sender=Batch)
+@track_origin("batch_saved")
 def batch_saved(sender, instance, created, **kwargs):
     # if batch created or available changed, recompute
+    if in_bulk():
+        return
+    before = getattr(instance, "_stock_before", None)
+    if before is None:
+        apply_location_delta(instance.medicine_id, instance.location_id, instance.available_quantity)
+    elif before[1] == instance.location_id:
+        apply_location_delta(instance.medicine_id, instance.location_id, instance.available_quantity - before[0])
+    else:
+        apply_location_delta(instance.medicine_id, before[1], -before[0])
+        apply_location_delta(instance.medicine_id, instance.location_id, instance.available_quantity)
     recompute_total_stock(instance.medicine)
 
 @receiver(post_delete, sender=Batch)
+@track_origin("batch_deleted")
 def batch_deleted(sender, instance, **kwargs):
+    if in_bulk():
+        return
+    apply_location_delta(instance.medicine_id, instance.location_id, -instance.available_quantity)
     recompute_total_stock(instance.medicine)
 
 @receiver(post_save, sender=StockTransaction)
+@track_origin("handle_stock_transaction")
 def handle_stock_transaction(sender, instance, created, **kwargs):
     if not created:
         return
@@ -25,53 +227,104 @@ def handle_stock_transaction(sender, instance, created, **kwargs):
     if instance.transaction_type == StockTransaction.TYPE_IN:
         # prefer to attach to existing batch if provided; otherwise create batch-less increase via a special batch
         if instance.batch:
-            instance.batch.available_quantity = models.F('available_quantity') + instance.quantity
-            instance.batch.save()
+            adjust_batch_quantity(instance.batch, instance.quantity)
         else:
             # create a generic batch for this stock in
             b = med.batches.create(
                 batch_number=f"autogen-{instance.pk}",
                 quantity=instance.quantity,
                 available_quantity=instance.quantity,
+                opening_quantity=0,  # booked by this transaction
                 purchase_price=0.00,
+                location_id=instance.location_id,
             )
             instance.batch = b
             instance.save(update_fields=["batch"])
     elif instance.transaction_type == StockTransaction.TYPE_OUT:
         if instance.batch:
-            # consume from provided batch
-            if instance.batch.available_quantity < instance.quantity:
-                # allow negative? better raise, but to avoid crash, set to 0 and consume rest from other batches
+            # consume from provided batch; the availability check is part of the UPDATE so it can't race
+            rows = Batch.objects.filter(
+                pk=instance.batch.pk, available_quantity__gte=models.F("reserved_quantity") + instance.quantity
+            ).update(
+                available_quantity=models.F("available_quantity") - instance.quantity,
+                **write_stamp(),
+            )
+            if not rows:
                 raise ValueError("Not enough quantity in selected batch")
-            instance.batch.available_quantity = models.F('available_quantity') - instance.quantity
-            instance.batch.save()
+            apply_location_delta(med.pk, instance.batch.location_id, -instance.quantity)
+            record_change("batch", instance.batch.pk)
         else:
             # consume from earliest-expiring batches by FIFO
-            remaining = instance.quantity
-            batches = med.batches.filter(available_quantity__gt=0).order_by("expiry_date", "received_date")
-            for b in batches:
-                if remaining <= 0:
-                    break
-                take = min(int(b.available_quantity), remaining)
-                b.available_quantity = models.F('available_quantity') - take
-                b.save()
-                remaining -= take
-            if remaining > 0:
-                raise ValueError("Not enough stock to consume requested quantity")
+            consume_fifo(med, instance.quantity, location_id=instance.location_id)
     elif instance.transaction_type == StockTransaction.TYPE_ADJUST:
         # adjustments should provide positive/negative quantity; apply to batch if present else adjust total via a synthetic batch
         if instance.batch:
-            instance.batch.available_quantity = models.F('available_quantity') + instance.quantity
-            instance.batch.save()
+            adjust_batch_quantity(instance.batch, instance.quantity)
         else:
             # create synthetic batch for adjustment
             b = med.batches.create(
                 batch_number=f"adjust-{instance.pk}",
                 quantity=max(0, instance.quantity),
                 available_quantity=max(0, instance.quantity),
+                opening_quantity=0,
                 purchase_price=0.00,
+                location_id=instance.location_id,
             )
             instance.batch = b
             instance.save(update_fields=["batch"])
     # finally recompute totals
     recompute_total_stock(med)
+
+@receiver(pre_save, sender=PurchaseOrder)
+def purchase_order_pre_save(sender, instance, **kwargs):
+    # previous bucket for the scorecard refresh; stamp the receipt time on the transition to received
+    instance._bucket_before = None
+    if instance.pk:
+        instance._bucket_before = PurchaseOrder.objects.filter(pk=instance.pk).values_list("status", "supplier_id", "created_at").first()
+    previous_status = instance._bucket_before[0] if instance._bucket_before else None
+    if instance.status == PurchaseOrder.STATUS_RECEIVED and previous_status != PurchaseOrder.STATUS_RECEIVED and instance.received_at is None:
+        instance.received_at = timezone.now()
+
+@receiver(post_save, sender=PurchaseOrder)
+@track_origin("purchase_order_saved")
+def purchase_order_saved(sender, instance, created, **kwargs):
+    before = getattr(instance, "_bucket_before", None)
+    if before is not None and before == (instance.status, instance.supplier_id, instance.created_at):
+        return
+    # after commit, so the receive path's items are in place
+    transaction.on_commit(lambda: refresh_for_order(instance.supplier_id, instance.created_at))
+    if before is not None and (before[1], before[2]) != (instance.supplier_id, instance.created_at):
+        transaction.on_commit(lambda: refresh_for_order(before[1], before[2]))
+
+@receiver(post_delete, sender=PurchaseOrder)
+def purchase_order_deleted(sender, instance, **kwargs):
+    transaction.on_commit(lambda: refresh_for_order(instance.supplier_id, instance.created_at))
+
+# price history: appended only when the price differs from the one in effect
+@receiver(post_save, sender=Medicine)
+@track_origin("medicine_price_saved")
+def medicine_price_saved(sender, instance, **kwargs):
+    record_prices(PriceHistory.KIND_SALE, {instance.pk: instance.unit_price}, "medicine")
+
+@receiver(post_save, sender=PurchaseItem)
+@track_origin("purchase_cost_saved")
+def purchase_cost_saved(sender, instance, **kwargs):
+    record_prices(PriceHistory.KIND_COST, {instance.medicine_id: instance.purchase_price}, "purchase")
+
+# change feed: every write to a synced model appends an event (stock paths above record their own,
+# since queryset updates bypass post_save)
+@track_origin("feed_saved")
+def feed_saved(sender, instance, **kwargs):
+    if in_bulk():
+        return
+    record_change(sender._meta.model_name, instance.pk)
+
+@track_origin("feed_deleted")
+def feed_deleted(sender, instance, **kwargs):
+    if in_bulk():
+        return
+    record_change(sender._meta.model_name, instance.pk, ChangeEvent.OP_DELETE)
+
+for _model in (Medicine, Batch, Category, Supplier, PurchaseOrder):
+    post_save.connect(feed_saved, sender=_model, dispatch_uid=f"change_feed_saved_{_model._meta.model_name}")
+    post_delete.connect(feed_deleted, sender=_model, dispatch_uid=f"change_feed_deleted_{_model._meta.model_name}")
@@ -1,3 +1,836 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.models import User
+
+from . import audit, changes, compression, forecasting, idempotency, pos, profiling, push, replay, reservations
+from .caching import table_stamp
+from .concurrency import VersionConflict, retry_on_conflict, versioned_update
+from .pricing import margin_report
+from .models import (
+    Batch, Category, ChangeEvent, IdempotencyKey, JobCheckpoint, Location, Medicine, MedicineForecast, MedicineLocationStock, PriceHistory,
+    Reservation, StockTransaction, Supplier,
+)
+from .views import StockTransactionListCreateView
+
+
+class InventoryTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user("admin@example.com", "pw", role=User.ROLE_ADMIN)
+        cls.pharmacist = User.objects.create_user("pharmacist@example.com", "pw", role=User.ROLE_PHARMACIST)
+        cls.customer = User.objects.create_user("customer@example.com", "pw", role=User.ROLE_CUSTOMER)
+
+    def setUp(self):
+        self.client = self.client_for(self.pharmacist)
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def medicine(self, sku="SKU-1", **fields):
+        return Medicine.objects.create(sku=sku, name=fields.pop("name", sku), unit_price=fields.pop("unit_price", Decimal("2.50")), **fields)
+
+    def batch(self, medicine, quantity, **fields):
+        return Batch.objects.create(
+            medicine=medicine, batch_number=fields.pop("batch_number", f"b-{Batch.objects.count() + 1}"),
+            quantity=quantity, available_quantity=fields.pop("available_quantity", quantity), **fields,
+        )
+
+    def refresh(self, obj):
+        obj.refresh_from_db()
+        return obj
+
+
+class ChangeFeedCursorTests(InventoryTestCase):
+    def event(self, pk, age, resource="category", object_id=1, op=ChangeEvent.OP_DELETE):
+        return ChangeEvent.objects.create(pk=pk, resource=resource, object_id=object_id, op=op, created_at=timezone.now() - age)
+
+    def test_cursor_stops_at_settled_mark(self):
+        ChangeEvent.objects.all().delete()
+        self.event(1000, timedelta(minutes=5))
+        self.event(1002, timedelta(seconds=1), object_id=2)
+        events, cursor, has_more = changes.read_changes(0, 100)
+        self.assertEqual([e["cursor"] for e in events], [1000, 1002])  # unsettled events are still delivered
+        self.assertEqual(cursor, 1000)
+        self.assertFalse(has_more)
+
+        # a transaction holding id 1001 commits after the poll: the next poll still sees it
+        self.event(1001, timedelta(seconds=2), object_id=3)
+        events, _, _ = changes.read_changes(cursor, 100)
+        self.assertEqual([e["cursor"] for e in events], [1001, 1002])
+
+    def test_table_stamp_changes_on_late_commit(self):
+        ChangeEvent.objects.all().delete()
+        self.event(1000, timedelta(minutes=5))
+        self.event(1002, timedelta(seconds=1))
+        before = table_stamp(["category"])
+        self.event(1001, timedelta(seconds=2), object_id=2)
+        self.assertNotEqual(table_stamp(["category"]), before)
+
+    def test_compaction_keeps_unsettled_events(self):
+        ChangeEvent.objects.all().delete()
+        self.event(1000, timedelta(minutes=5), object_id=1)
+        self.event(1001, timedelta(minutes=4), object_id=1)
+        self.event(1002, timedelta(seconds=1), object_id=2)
+        self.event(1003, timedelta(seconds=1), object_id=2)
+        changes.compact(timedelta(days=30))
+        # 1000 is settled and superseded; 1002 is superseded but still above the mark
+        self.assertEqual(list(ChangeEvent.objects.values_list("pk", flat=True)), [1001, 1002, 1003])
+
+    def test_pos_index_picks_up_late_commit(self):
+        first = self.medicine("POS-1")
+        late = self.medicine("POS-2", unit_price=Decimal("1.00"))
+        ChangeEvent.objects.update(created_at=timezone.now() - timedelta(minutes=5))
+        index = pos.SkuIndex()
+        index.reload()
+        # the price change of POS-2 commits under an id below an already visible POS-1 change
+        top = ChangeEvent.objects.order_by("-pk").first().pk
+        ChangeEvent.objects.create(pk=top + 2, resource="medicine", object_id=first.pk)
+        index.refresh()
+        Medicine.objects.filter(pk=late.pk).update(unit_price=Decimal("3.00"))
+        ChangeEvent.objects.create(pk=top + 1, resource="medicine", object_id=late.pk)
+        index.refresh()
+        self.assertEqual(index.get("POS-2").as_dict()["unit_price"], "3.00")
+
+    def test_pos_lookup_is_query_free_and_falls_back_when_stale(self):
+        med = self.medicine("POS-1", unit_price=Decimal("2.00"))
+        index = pos.SkuIndex()
+        index.reload()
+        with mock.patch.object(pos, "index", index):
+            with self.assertNumQueries(0):
+                self.assertEqual(index.get("POS-1").as_dict()["unit_price"], "2.00")
+            Medicine.objects.filter(pk=med.pk).update(unit_price=Decimal("5.00"))
+            with CaptureQueriesContext(connection) as ctx:
+                fresh = self.client.get("/pos/lookup/POS-1/")
+            self.assertEqual(fresh.data["unit_price"], "2.00")  # served from the index, not refreshed inline
+            self.assertFalse(any("inventory_medicine" in q["sql"] for q in ctx.captured_queries))
+            index.checked_at -= pos.get_setting("FALLBACK_AFTER") + 1
+            self.assertEqual(self.client.get("/pos/lookup/POS-1/").data["unit_price"], "5.00")
+
+    def test_pos_refresher_applies_changes(self):
+        med = self.medicine("POS-1", unit_price=Decimal("2.00"))
+        index = pos.SkuIndex()
+        stop = mock.Mock()
+        stop.is_set.side_effect = [False, True]
+        index.run_refresher(stop)
+        self.assertTrue(index.is_fresh())
+        med.unit_price = Decimal("4.00")
+        med.save()
+        stop.is_set.side_effect = [False, True]
+        index.run_refresher(stop)
+        self.assertEqual(index.get("POS-1").as_dict()["unit_price"], "4.00")
+
+
+@override_settings(INVENTORY_IDEMPOTENCY={"WAIT_TIMEOUT": 0.2, "PENDING_TIMEOUT": 60.0})
+class IdempotencyTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        idempotency._cache.clear()
+        self.med = self.medicine()
+
+    def post(self, key, quantity=5):
+        return self.client.post(
+            "/stock-transactions/", {"medicine": self.med.pk, "transaction_type": "in", "quantity": quantity},
+            format="json", HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def pending(self, key, age):
+        claimed = timezone.now() - age
+        return IdempotencyKey.objects.create(
+            user=self.pharmacist, endpoint="stock_transactions", key=key, request_hash="x",
+            created_at=claimed, claimed_at=claimed, expires_at=claimed + timedelta(hours=24),
+        )
+
+    def test_retry_replays_stored_response(self):
+        first = self.post("k1")
+        idempotency._cache.clear()  # as if the retry landed on another worker
+        second = self.post("k1")
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(StockTransaction.objects.count(), 1)
+        self.assertEqual(self.refresh(self.med).total_stock, 5)
+
+    def test_different_body_is_rejected(self):
+        self.post("k1")
+        self.assertEqual(self.post("k1", quantity=6).status_code, 422)
+        self.assertEqual(self.refresh(self.med).total_stock, 5)
+
+    def test_live_pending_claim_conflicts(self):
+        self.pending("k1", timedelta(seconds=1))
+        self.assertEqual(self.post("k1").status_code, 409)
+        self.assertEqual(StockTransaction.objects.count(), 0)
+
+    def test_abandoned_pending_claim_is_taken_over(self):
+        self.pending("k1", timedelta(hours=1))
+        response = self.post("k1")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(IdempotencyKey.objects.get(key="k1").state, IdempotencyKey.STATE_DONE)
+        self.assertEqual(self.refresh(self.med).total_stock, 5)
+
+    def test_lost_lease_rolls_back_stock(self):
+        original = StockTransactionListCreateView.perform_create
+
+        def slow_create(view, serializer):
+            original(view, serializer)
+            # meanwhile the lease ran out and a retry took the key over
+            IdempotencyKey.objects.filter(key="k1").update(claimed_at=timezone.now() + timedelta(seconds=1))
+
+        with mock.patch.object(StockTransactionListCreateView, "perform_create", slow_create):
+            self.assertEqual(self.post("k1").status_code, 409)
+        self.assertEqual(StockTransaction.objects.count(), 0)
+        self.assertEqual(self.refresh(self.med).total_stock, 0)
+        self.assertEqual(IdempotencyKey.objects.get(key="k1").state, IdempotencyKey.STATE_PENDING)
+
+
+class AuditTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.med = self.medicine()
+        self.lot = self.batch(self.med, 20)
+        self.client.post("/stock-transactions/", {"medicine": self.med.pk, "batch": self.lot.pk, "transaction_type": "out", "quantity": 3}, format="json")
+        self.client.post("/stock-transactions/", {"medicine": self.med.pk, "transaction_type": "in", "quantity": 4}, format="json")
+
+    def audit(self):
+        return audit.audit_range(self.med.pk, self.med.pk + 1)
+
+    def test_consistent_stock_has_no_discrepancies(self):
+        self.assertEqual(self.audit(), [])
+        self.assertEqual(self.refresh(self.med).total_stock, 21)
+
+    def test_failed_sale_leaves_no_ledger_row(self):
+        with self.assertRaises(ValueError):
+            self.client.post("/stock-transactions/", {"medicine": self.med.pk, "batch": self.lot.pk, "transaction_type": "out", "quantity": 500}, format="json")
+        self.assertEqual(StockTransaction.objects.filter(quantity=500).count(), 0)
+        self.assertEqual(self.audit(), [])
+
+    def test_repair_reconciles_real_drift(self):
+        Batch.objects.filter(pk=self.lot.pk).update(available_quantity=15)  # stock lost outside the ledger
+        found = self.audit()
+        self.assertEqual({d["check"] for d in found}, {"total_stock", "ledger", "batch_ledger"})
+        audit.repair(found, ledger=True)
+        self.assertEqual(self.audit(), [])
+        self.assertEqual(self.refresh(self.med).total_stock, 19)
+
+    def test_repair_skips_discrepancies_that_no_longer_hold(self):
+        # what a report computed mid-sale would say; by repair time the sale has fully committed
+        stale = [
+            {"check": "ledger", "medicine_id": self.med.pk, "expected": 21, "actual": 24},
+            {"check": "batch_ledger", "medicine_id": self.med.pk, "batch_id": self.lot.pk, "expected": 17, "actual": 20},
+        ]
+        before = StockTransaction.objects.count()
+        counts = audit.repair(stale, ledger=True)
+        self.assertEqual(counts["gone"], 2)
+        self.assertEqual(StockTransaction.objects.count(), before)
+        self.assertEqual(self.audit(), [])
+
+
+class ReplayTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.med = self.medicine()
+        self.lot = self.batch(self.med, 20)
+
+    def post(self, kind, quantity, batch=None):
+        data = {"medicine": self.med.pk, "transaction_type": kind, "quantity": quantity}
+        if batch:
+            data["batch"] = batch.pk
+        response = self.client.post("/stock-transactions/", data, format="json")
+        self.assertEqual(response.status_code, 201, response.data)
+
+    def replay(self):
+        rows = []
+        for _, changed, _ in replay.run_replay(replay.ledger_head(), workers=1):
+            rows.extend(changed)
+        return rows
+
+    def test_batchless_negative_adjust_agrees_with_audit(self):
+        self.post("adjust", -5)  # lands on a synthetic batch created at 0
+        self.assertEqual(self.refresh(self.med).total_stock, 20)
+        self.assertEqual(audit.audit_range(self.med.pk, self.med.pk + 1), [])
+        self.assertEqual(self.replay(), [])
+
+    def test_apply_restores_ledger_stock(self):
+        self.post("out", 3, batch=self.lot)
+        self.post("in", 4)
+        Batch.objects.filter(pk=self.lot.pk).update(available_quantity=2)
+        rows = self.replay()
+        self.assertEqual(rows, [(self.lot.pk, self.med.pk, 2, 17)])
+        self.assertEqual(replay.apply(rows, replay.ledger_head()), (1, []))
+        self.assertEqual(self.refresh(self.lot).available_quantity, 17)
+        self.assertEqual(self.refresh(self.med).total_stock, 21)
+        self.assertEqual(audit.audit_range(self.med.pk, self.med.pk + 1), [])
+
+    def test_apply_skips_medicines_that_moved_since_the_replay(self):
+        Batch.objects.filter(pk=self.lot.pk).update(available_quantity=2)
+        head = replay.ledger_head()
+        rows = self.replay()
+        self.post("out", 1, batch=self.lot)
+        self.assertEqual(replay.apply(rows, head), (0, [self.med.pk]))
+        self.assertEqual(self.refresh(self.lot).available_quantity, 1)
+
+
+class PurchaseOrderReceiveTests(InventoryTestCase):
+    def test_receiving_books_stock_once(self):
+        med = self.medicine()
+        supplier = Supplier.objects.create(name="Acme")
+        response = self.client.post("/purchase-orders/", {
+            "supplier": supplier.pk, "items": [{"medicine": med.pk, "quantity": 12, "purchase_price": "1.10"}],
+        }, format="json")
+        self.assertEqual(response.status_code, 201, response.data)
+        url = f"/purchase-orders/{response.data['id']}/"
+        for _ in range(2):  # a repeated receive must not restock
+            self.assertEqual(self.client.patch(url, {"status": "received"}, format="json").status_code, 200)
+        self.assertEqual(self.refresh(med).total_stock, 12)
+        self.assertEqual(med.batches.get().available_quantity, 12)
+        self.assertEqual(audit.audit_range(med.pk, med.pk + 1), [])
+
+
+class MarginReportTests(InventoryTestCase):
+    def test_zero_priced_batch_falls_back_to_cost_history(self):
+        med = self.medicine()
+        PriceHistory.objects.create(medicine=med, kind=PriceHistory.KIND_COST, price=Decimal("1.50"), effective_from=timezone.now() - timedelta(days=1))
+        self.client.post("/stock-transactions/", {"medicine": med.pk, "transaction_type": "in", "quantity": 10}, format="json")
+        autogen = med.batches.get()  # created at purchase_price 0
+        self.client.post("/stock-transactions/", {"medicine": med.pk, "batch": autogen.pk, "transaction_type": "out", "quantity": 4}, format="json")
+        now = timezone.now()
+        [row] = margin_report(now - timedelta(days=1), now + timedelta(days=1))
+        self.assertEqual((row["units"], row["revenue"], row["cost"], row["margin"]), (4, "10.00", "6.00", "4.00"))
+
+    def test_reports_are_limited_to_admins_and_pharmacists(self):
+        supplier = User.objects.create_user("supplier@example.com", "pw", role=User.ROLE_SUPPLIER)
+        acme = Supplier.objects.create(name="Acme")
+        for url in ("/reports/margin/?start=2026-01-01&end=2026-02-01", "/suppliers/scorecards/", f"/suppliers/{acme.pk}/scorecard/"):
+            self.assertEqual(self.client.get(url).status_code, 200, url)
+            self.assertEqual(self.client_for(self.admin).get(url).status_code, 200, url)
+            self.assertEqual(self.client_for(self.customer).get(url).status_code, 403, url)
+            self.assertEqual(self.client_for(supplier).get(url).status_code, 403, url)
+
+
+class RequestProfilerTests(TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        patcher = override_settings(INVENTORY_PROFILER={"ENABLED": True, "SAMPLE_RATE": 1.0, "DIR": self.dir.name})
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+
+    def test_overlapping_requests_run_unprofiled(self):
+        inner = profiling.RequestProfilerMiddleware(lambda request: HttpResponse("inner"))
+        # the outer capture is still running when the inner request comes in
+        outer = profiling.RequestProfilerMiddleware(lambda request: inner(request))
+        self.assertEqual(outer(RequestFactory().get("/")).content, b"inner")
+        self.assertEqual(len(profiling.captures()), 1)
+
+    def test_profiler_in_use_elsewhere_falls_back(self):
+        middleware = profiling.RequestProfilerMiddleware(lambda request: HttpResponse("ok"))
+        with mock.patch("cProfile.Profile.enable", side_effect=ValueError("Another profiling tool is already active")):
+            self.assertEqual(middleware(RequestFactory().get("/")).content, b"ok")
+        self.assertEqual(profiling.captures(), [])
+        middleware(RequestFactory().get("/"))  # the slot was released
+        self.assertEqual(len(profiling.captures()), 1)
+
+
+class DebugAccessTests(InventoryTestCase):
+    def jwt_client(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+        return client
+
+    def test_perf_view_needs_profiling_enabled_and_an_admin(self):
+        self.assertEqual(self.client_for(self.admin).get("/debug/perf/").status_code, 404)
+        with override_settings(INVENTORY_QUERY_PROFILING={"ENABLED": True}):
+            self.assertEqual(self.client_for(self.pharmacist).get("/debug/perf/").status_code, 403)
+            self.assertEqual(self.client_for(self.customer).get("/debug/perf/").status_code, 403)
+            self.assertEqual(APIClient().get("/debug/perf/").status_code, 401)
+            response = self.client_for(self.admin).get("/debug/perf/")
+            self.assertEqual(response.status_code, 200)
+            self.assertIn("top", response.data)
+
+    def test_profile_header_is_honoured_only_when_enabled_and_only_for_admins(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        enabled = {"ENABLED": True, "SAMPLE_RATE": 0.0, "DIR": directory.name}
+        with override_settings(INVENTORY_PROFILER={**enabled, "ENABLED": False}):
+            self.jwt_client(self.admin).get("/medicines/", HTTP_X_PROFILE="1")
+            self.assertEqual(profiling.captures(), [])
+        with override_settings(INVENTORY_PROFILER=enabled):
+            self.jwt_client(self.pharmacist).get("/medicines/", HTTP_X_PROFILE="1")
+            self.jwt_client(self.admin).get("/medicines/")
+            self.assertEqual(profiling.captures(), [])
+            self.jwt_client(self.admin).get("/medicines/", HTTP_X_PROFILE="1")
+            self.assertEqual(len(profiling.captures("medicine_list")), 1)
+
+
+class CompressionTests(TestCase):
+    body = b'{"name": "paracetamol 500mg", "stock": 1200}' * 100
+
+    def compress(self, response, path="/medicines/"):
+        request = RequestFactory().get(path, HTTP_ACCEPT_ENCODING="gzip")
+        request.resolver_match = resolve(path)
+        return compression.CompressionMiddleware(lambda request: response)(request)
+
+    def test_gzip_is_padded_to_a_random_length(self):
+        sizes = set()
+        for _ in range(10):
+            response = self.compress(HttpResponse(self.body, content_type="application/json"))
+            self.assertEqual(response["Content-Encoding"], "gzip")
+            self.assertEqual(gzip.decompress(response.content), self.body)
+            sizes.add(len(response.content))
+        self.assertGreater(len(sizes), 1)
+
+    def test_secret_bearing_responses_are_not_compressed(self):
+        html = self.compress(HttpResponse(self.body, content_type="text/html; charset=utf-8"))
+        self.assertFalse(html.has_header("Content-Encoding"))
+        tokens = self.compress(HttpResponse(self.body, content_type="application/json"), path="/login")
+        self.assertFalse(tokens.has_header("Content-Encoding"))
+
+
+class StockTransactionAdminTests(InventoryTestCase):
+    def test_changelist_filters_by_date_range_without_scanning_years(self):
+        staff = User.objects.create_superuser("staff@example.com", "pw")
+        self.client.force_login(staff)
+        med = self.medicine()
+        StockTransaction.objects.create(medicine=med, transaction_type=StockTransaction.TYPE_IN, quantity=3)
+        since = timezone.now() - timedelta(days=7)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/admin/inventory/stocktransaction/", {"performed_at__gte": since.isoformat(sep=" ")})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["cl"].result_list), 1)
+        self.assertFalse([q for q in queries if "DISTINCT" in q["sql"] and "inventory_stocktransaction" in q["sql"]])
+
+
+class ForecastTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.med = self.medicine()
+        self.as_of = timezone.localdate() - timedelta(days=1)
+        # two units every day of the last four weeks, six more on the as_of weekday
+        for back in range(28):
+            day = self.as_of - timedelta(days=back)
+            at = timezone.make_aware(datetime.combine(day, time(12)))
+            StockTransaction.objects.bulk_create([
+                StockTransaction(medicine=self.med, transaction_type=StockTransaction.TYPE_OUT, quantity=8 if back % 7 == 0 else 2, performed_at=at),
+            ])
+
+    def engines(self):
+        return ["python"] + (["numpy"] if forecasting.numpy is not None else [])
+
+    def test_weekly_pattern(self):
+        for engine in self.engines():
+            with override_settings(INVENTORY_FORECAST={"HISTORY_DAYS": 28, "HORIZON_DAYS": 7}):
+                self.assertEqual(forecasting.run_forecast(self.as_of, engine), 1)
+            forecast = MedicineForecast.objects.get(medicine=self.med)
+            self.assertEqual(forecast.method, MedicineForecast.METHOD_SES_WEEKLY)
+            # the busy weekday comes round again on the 7th day ahead
+            self.assertEqual(max(forecast.daily), forecast.daily[6], engine)
+            self.assertAlmostEqual(forecast.horizon_total, 20.0, delta=0.5, msg=engine)  # 6 x 2 + 8
+
+    def test_window_shorter_than_a_week(self):
+        for engine in self.engines():
+            with override_settings(INVENTORY_FORECAST={"HISTORY_DAYS": 3, "HORIZON_DAYS": 7}):
+                self.assertEqual(forecasting.run_forecast(self.as_of, engine), 1)
+            forecast = MedicineForecast.objects.get(medicine=self.med)
+            self.assertEqual(sorted(forecast.weekday_factors).count(1.0), 4, engine)  # the uncovered weekdays
+            self.assertTrue(all(math.isfinite(units) for units in forecast.daily), engine)
+
+    def test_medicines_without_sales_lose_their_forecast(self):
+        forecasting.run_forecast(self.as_of, "python")
+        StockTransaction.objects.all().delete()
+        self.assertEqual(forecasting.run_forecast(self.as_of, "python"), 0)
+        self.assertFalse(MedicineForecast.objects.exists())
+
+
+class OptimisticConcurrencyTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.med = self.medicine()
+        self.lot = self.batch(self.med, 20)
+
+    def test_matching_if_match_updates_and_returns_new_etag(self):
+        etag = self.client.get(f"/medicines/{self.med.pk}/")["ETag"]
+        response = self.client.patch(f"/medicines/{self.med.pk}/", {"reorder_level": 5}, format="json", HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(self.refresh(self.med).reorder_level, 5)
+
+    def test_stale_if_match_is_rejected(self):
+        etag = self.client.get(f"/medicines/{self.med.pk}/")["ETag"]
+        self.client.patch(f"/medicines/{self.med.pk}/", {"reorder_level": 5}, format="json", HTTP_IF_MATCH=etag)
+        response = self.client.patch(f"/medicines/{self.med.pk}/", {"reorder_level": 7}, format="json", HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(self.refresh(self.med).reorder_level, 5)
+
+    def test_edit_based_on_read_before_a_sale_does_not_overwrite_it(self):
+        etag = self.client.get(f"/batches/{self.lot.pk}/")["ETag"]
+        self.client.post("/stock-transactions/", {"medicine": self.med.pk, "batch": self.lot.pk, "transaction_type": "out", "quantity": 3}, format="json")
+        response = self.client.patch(f"/batches/{self.lot.pk}/", {"available_quantity": 20}, format="json", HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(self.refresh(self.lot).available_quantity, 17)
+
+    def test_versioned_update_and_retry(self):
+        version = self.refresh(self.lot).version
+        self.assertTrue(versioned_update(Batch, self.lot.pk, version, batch_number="renamed"))
+        self.assertFalse(versioned_update(Batch, self.lot.pk, version, batch_number="stale"))
+        attempts = []
+
+        def write():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise VersionConflict()
+            return "done"
+
+        self.assertEqual(retry_on_conflict(write), "done")
+        self.assertEqual(len(attempts), 3)
+
+
+class ReservationTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.med = self.medicine()
+        self.lot = self.batch(self.med, 10)
+        self.shopper = self.client_for(self.customer)
+
+    def reserve(self, quantity, **extra):
+        return self.shopper.post("/reservations/", {"batch": self.lot.pk, "quantity": quantity, **extra}, format="json")
+
+    def test_holds_cannot_oversubscribe_a_batch(self):
+        self.assertEqual(self.reserve(6).status_code, 201)
+        self.assertEqual(self.reserve(5).status_code, 400)
+        self.assertEqual(self.refresh(self.lot).reserved_quantity, 6)
+
+    def test_fulfil_turns_the_hold_into_a_sale(self):
+        pk = self.reserve(4).data["id"]
+        response = self.client.post(f"/reservations/{pk}/fulfil/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["status"], Reservation.STATUS_FULFILLED)
+        self.lot = self.refresh(self.lot)
+        self.assertEqual((self.lot.available_quantity, self.lot.reserved_quantity), (6, 0))
+        self.assertEqual(self.refresh(self.med).total_stock, 6)
+
+    def test_release_gives_units_back_once(self):
+        pk = self.reserve(4).data["id"]
+        self.assertEqual(self.shopper.post(f"/reservations/{pk}/release/").status_code, 200)
+        self.assertEqual(self.shopper.post(f"/reservations/{pk}/release/").status_code, 400)
+        self.assertEqual(self.refresh(self.lot).reserved_quantity, 0)
+
+    def test_expired_holds_are_swept_and_cannot_be_fulfilled(self):
+        pk = self.reserve(4, ttl_minutes=1).data["id"]
+        self.reserve(3)
+        self.assertEqual(reservations.expire_due(now=timezone.now() + timedelta(minutes=2)), 1)
+        self.assertEqual(Reservation.objects.get(pk=pk).status, Reservation.STATUS_EXPIRED)
+        self.assertEqual(self.refresh(self.lot).reserved_quantity, 3)
+        self.assertEqual(self.client.post(f"/reservations/{pk}/fulfil/").status_code, 400)
+        self.assertEqual(self.refresh(self.lot).available_quantity, 10)
+
+    def test_fulfil_after_stock_dropped_below_the_hold_is_rejected(self):
+        pk = self.reserve(4).data["id"]
+        Batch.objects.filter(pk=self.lot.pk).update(available_quantity=2)
+        response = self.client.post(f"/reservations/{pk}/fulfil/")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("quantity", response.data)
+        self.assertEqual(Reservation.objects.get(pk=pk).status, Reservation.STATUS_ACTIVE)
+        self.lot = self.refresh(self.lot)
+        self.assertEqual((self.lot.available_quantity, self.lot.reserved_quantity), (2, 4))
+        self.assertFalse(StockTransaction.objects.filter(batch=self.lot, transaction_type=StockTransaction.TYPE_OUT).exists())
+
+
+class ChangeFeedTests(InventoryTestCase):
+    def settle(self):
+        ChangeEvent.objects.update(created_at=timezone.now() - timedelta(days=40))
+
+    def test_feed_reports_changes_since_cursor(self):
+        med = self.medicine()
+        self.settle()
+        response = self.client.get("/changes/", {"since": 0})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(("medicine", med.pk), {(e["resource"], e["id"]) for e in response.data["events"]})
+        again = self.client.get("/changes/", {"since": response.data["next"]})
+        self.assertEqual(again.data["events"], [])
+
+    def test_cursor_behind_compacted_tombstones_gets_410(self):
+        med = self.medicine()
+        cursor = ChangeEvent.objects.order_by("-pk").first().pk
+        med.delete()
+        self.settle()
+        self.assertEqual(changes.compact(timedelta(days=30))[1], 1)
+        self.assertEqual(self.client.get("/changes/", {"since": cursor}).status_code, 410)
+        resync = self.client.get("/changes/", {"since": changes.horizon()})
+        self.assertEqual(resync.status_code, 200)
+
+    def test_bad_parameters(self):
+        self.assertEqual(self.client.get("/changes/", {"since": "x"}).status_code, 400)
+        self.assertEqual(self.client.get("/changes/", {"limit": 0}).status_code, 400)
+
+
+class BatchSummaryTests(InventoryTestCase):
+    def summary(self, med):
+        med = self.refresh(med)
+        return med.next_expiry, med.live_batches, med.average_cost
+
+    def test_summary_follows_batch_create_update_and_delete(self):
+        med = self.medicine()
+        self.assertEqual(self.summary(med), (None, 0, None))
+        early = self.batch(med, 10, purchase_price=Decimal("4.00"), expiry_date=date(2027, 1, 1))
+        late = self.batch(med, 30, purchase_price=Decimal("2.00"), expiry_date=date(2027, 6, 1))
+        self.assertEqual(self.summary(med), (date(2027, 1, 1), 2, Decimal("2.50")))
+        early.available_quantity = 0
+        early.save()
+        self.assertEqual(self.summary(med), (date(2027, 6, 1), 1, Decimal("2.00")))
+        late.purchase_price = Decimal("3.00")
+        late.expiry_date = date(2027, 3, 1)
+        late.save()
+        self.assertEqual(self.summary(med), (date(2027, 3, 1), 1, Decimal("3.00")))
+        late.delete()
+        self.assertEqual(self.summary(med), (None, 0, None))
+
+    def test_list_filters_and_orders_on_summary_columns(self):
+        soon, later, empty = self.medicine("SOON"), self.medicine("LATER"), self.medicine("EMPTY")
+        self.batch(soon, 5, purchase_price=Decimal("9.00"), expiry_date=date(2026, 11, 1))
+        self.batch(later, 5, purchase_price=Decimal("1.00"), expiry_date=date(2027, 5, 1))
+        self.batch(later, 5, purchase_price=Decimal("3.00"), expiry_date=date(2027, 8, 1))
+
+        def skus(**params):
+            response = self.client.get("/medicines/", {"batches": "0", **params})
+            self.assertEqual(response.status_code, 200)
+            return [row["sku"] for row in response.data["results"]]
+
+        self.assertEqual(skus(next_expiry__lte="2027-01-01"), ["SOON"])
+        self.assertEqual(skus(next_expiry__isnull="true"), ["EMPTY"])
+        self.assertEqual(skus(average_cost__lte="2.00"), ["LATER"])
+        self.assertEqual(skus(live_batches__gte="2"), ["LATER"])
+        self.assertEqual(skus(ordering="-average_cost", next_expiry__isnull="false"), ["SOON", "LATER"])
+        self.assertEqual(skus(ordering="next_expiry", next_expiry__isnull="false"), ["SOON", "LATER"])
+        self.assertEqual(skus(ordering="-live_batches")[0], "LATER")
+
+
+class ValuesModeTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        category = Category.objects.create(name="Analgesics", description="Pain relief")
+        supplier = Supplier.objects.create(name="Acme")
+        location = Location.objects.create(code="FRONT", name="Front counter")
+        med = self.medicine("SKU-1", category=category, unit_price=Decimal("12.30"))
+        self.batch(med, 10, purchase_price=Decimal("4.05"), supplier=supplier, location=location,
+                   received_date=date(2026, 1, 2), expiry_date=date(2027, 3, 4))
+        self.batch(med, 5, available_quantity=2, purchase_price=Decimal("5.10"), expiry_date=date(2026, 12, 1))
+        self.medicine("SKU-2")  # no category, no batches
+
+    def both(self, path, params=None):
+        with override_settings(INVENTORY_VALUES_MODE=True):
+            values = self.client.get(path, params)
+        with override_settings(INVENTORY_VALUES_MODE=False):
+            serialized = self.client.get(path, params)
+        self.assertEqual((values.status_code, serialized.status_code), (200, 200))
+        return json.loads(values.content), json.loads(serialized.content)
+
+    def test_medicine_list_matches_serializer(self):
+        for params in (None, {"batches": "0"}, {"ordering": "-next_expiry"}):
+            values, serialized = self.both("/medicines/", params)
+            self.assertEqual(values, serialized)
+        first = next(row for row in values["results"] if row["sku"] == "SKU-1")
+        self.assertEqual(first["category"], {"id": first["category"]["id"], "name": "Analgesics", "description": "Pain relief"})
+        self.assertEqual(first["unit_price"], "12.30")
+        self.assertEqual(first["next_expiry"], "2026-12-01")
+        self.assertIsInstance(first["created_at"], str)
+
+    def test_batch_list_matches_serializer(self):
+        values, serialized = self.both("/batches/")
+        self.assertEqual(values, serialized)
+        self.assertEqual({row["purchase_price"] for row in values["results"]}, {"4.05", "5.10"})
+
+
+class ConditionalGetTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.medicine("SKU-1")
+        self.medicine("SKU-2")
+
+    def test_list_etag_depends_on_query_and_media_type(self):
+        plain = self.client.get("/medicines/")["ETag"]
+        self.assertEqual(self.client.get("/medicines/")["ETag"], plain)
+        self.assertNotEqual(self.client.get("/medicines/", {"ordering": "-sku"})["ETag"], plain)
+        self.assertNotEqual(self.client.get("/medicines/", {"fields": "sku"})["ETag"], plain)
+        # "*" answers 304 with the validator, without rendering the browsable API
+        html = self.client.get("/medicines/", HTTP_ACCEPT="text/html", HTTP_IF_NONE_MATCH="*")
+        self.assertEqual(html.status_code, 304)
+        self.assertNotEqual(html["ETag"], plain)
+
+    def test_matching_if_none_match_returns_304_until_the_table_changes(self):
+        etag = self.client.get("/medicines/", {"ordering": "-sku"})["ETag"]
+        response = self.client.get("/medicines/", {"ordering": "-sku"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(self.client.get("/medicines/", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.medicine("SKU-3")
+        self.assertEqual(self.client.get("/medicines/", {"ordering": "-sku"}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class BulkTests(InventoryTestCase):
+    def test_bulk_price_update_bumps_versions_and_logs_changes(self):
+        meds = [self.medicine(f"BULK-{i}") for i in range(3)]
+        versions = {m.pk: m.version for m in meds}
+        response = self.client.patch("/medicines/bulk/", [{"id": m.pk, "unit_price": "4.00"} for m in meds], format="json")
+        self.assertEqual(response.data, {"updated": 3})
+        for med in meds:
+            med = self.refresh(med)
+            self.assertEqual(med.unit_price, Decimal("4.00"))
+            self.assertGreater(med.version, versions[med.pk])
+        self.assertEqual(PriceHistory.objects.filter(kind=PriceHistory.KIND_SALE, price=Decimal("4.00")).count(), 3)
+
+    def test_bulk_update_is_all_or_nothing(self):
+        med = self.medicine()
+        response = self.client.patch("/medicines/bulk/", [{"id": med.pk, "unit_price": "4.00"}, {"id": 999999, "unit_price": "1.00"}], format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.refresh(med).unit_price, Decimal("2.50"))
+
+    def test_bulk_delete_expired_batches_recomputes_totals(self):
+        med = self.medicine()
+        self.batch(med, 5, expiry_date=timezone.localdate() - timedelta(days=1))
+        self.batch(med, 7, expiry_date=timezone.localdate() + timedelta(days=90))
+        self.assertEqual(self.refresh(med).total_stock, 12)
+        response = self.client.delete("/batches/bulk/", {"expired_before": timezone.localdate().isoformat()}, format="json")
+        self.assertEqual(response.data, {"deleted": 1})
+        self.assertEqual(self.refresh(med).total_stock, 7)
+        self.assertEqual(audit.audit_range(med.pk, med.pk + 1), [])
+
+
+class ExpireBatchesTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.med = self.medicine()
+        self.lots = [self.batch(self.med, 5 + i, expiry_date=date(2026, 1, 1 + i)) for i in range(3)]
+        self.fresh = self.batch(self.med, 7, expiry_date=date(2027, 1, 1))
+
+    def expire(self, *args):
+        out = io.StringIO()
+        call_command("expire_batches", "--as-of", "2026-06-01", *args, stdout=out)
+        return out.getvalue()
+
+    def write_offs(self):
+        return list(StockTransaction.objects.filter(transaction_type=StockTransaction.TYPE_ADJUST).values_list("batch_id", flat=True))
+
+    def test_dry_run_writes_nothing(self):
+        self.assertIn("Would write off 3 expired batches (18 units)", self.expire("--dry-run", "--chunk-size", "2"))
+        self.assertEqual(self.write_offs(), [])
+        self.assertEqual([self.refresh(lot).available_quantity for lot in self.lots], [5, 6, 7])
+        self.assertEqual(self.refresh(self.med).total_stock, 25)
+        self.assertFalse(JobCheckpoint.objects.exists())
+
+    def test_interrupted_run_resumes_from_checkpoint(self):
+        # stop after the first one-batch chunk has committed
+        with mock.patch("inventory.expiry.time.sleep", side_effect=KeyboardInterrupt), self.assertRaises(KeyboardInterrupt):
+            self.expire("--chunk-size", "1", "--pause", "1")
+        self.assertEqual(self.write_offs(), [self.lots[0].pk])
+        self.assertEqual(JobCheckpoint.objects.get().value, {"expiry_date": "2026-01-01", "id": self.lots[0].pk})
+        # stock booked back onto the written-off batch after the fact stays: the rerun starts past it
+        Batch.objects.filter(pk=self.lots[0].pk).update(available_quantity=2)
+        self.assertIn("Wrote off 2 expired batches (13 units)", self.expire("--chunk-size", "1"))
+        self.assertEqual(sorted(self.write_offs()), sorted(lot.pk for lot in self.lots))
+        self.assertEqual(self.refresh(self.lots[0]).available_quantity, 2)
+        self.assertEqual(self.refresh(self.fresh).available_quantity, 7)
+        self.assertFalse(JobCheckpoint.objects.exists())
+
+
+class StockPushAuthTests(InventoryTestCase):
+    def scope(self, user):
+        token = str(AccessToken.for_user(user))
+        return {"type": "http", "method": "GET", "query_string": b"", "headers": [(b"authorization", f"Bearer {token}".encode())]}
+
+    async def status_for(self, scope):
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        async def receive():
+            return {"type": "http.disconnect"}
+
+        await push.stock_event_stream(scope, receive, send)
+        return sent[0]["status"]
+
+    def test_active_user_token_is_accepted(self):
+        self.assertTrue(push._authenticate(self.scope(self.pharmacist), {}))
+
+    async def test_deactivated_user_is_refused(self):
+        scope = await sync_to_async(self.scope)(self.pharmacist)
+        await User.objects.filter(pk=self.pharmacist.pk).aupdate(is_active=False)
+        self.assertEqual(await self.status_for(scope), 401)
+
+    def test_deleted_user_is_refused(self):
+        scope = self.scope(self.customer)
+        User.objects.filter(pk=self.customer.pk).delete()
+        self.assertFalse(push._authenticate(scope, {}))
+
+
+class LocationStockTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.med = self.medicine()
+        self.north = Location.objects.create(code="N", name="North")
+        self.south = Location.objects.create(code="S", name="South")
+
+    def location_stock(self):
+        return dict(MedicineLocationStock.objects.filter(medicine=self.med).values_list("location__code", "total_stock"))
+
+    def test_transfer_moves_location_stock(self):
+        self.batch(self.med, 10, location=self.north)
+        response = self.client.post("/transfers/", {
+            "medicine": self.med.pk, "from_location": self.north.pk, "to_location": self.south.pk, "quantity": 4,
+        }, format="json")
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(self.location_stock(), {"N": 6, "S": 4})
+        self.assertEqual(self.refresh(self.med).total_stock, 10)
+        self.assertEqual(audit.audit_range(self.med.pk, self.med.pk + 1), [])
+
+    def test_bulk_update_creates_row_for_fresh_location(self):
+        self.batch(self.med, 5, location=self.north)
+        empty = self.batch(self.med, 0, location=self.south)  # no stock yet, so no South row
+        self.assertEqual(self.location_stock(), {"N": 5})
+        response = self.client.patch("/batches/bulk/", [{"id": empty.pk, "available_quantity": 8}], format="json")
+        self.assertEqual(response.data, {"updated": 1})
+        self.assertEqual(self.location_stock(), {"N": 5, "S": 8})
+        self.assertEqual(MedicineLocationStock.objects.get(location=self.south).reorder_level, self.med.reorder_level)
+
+
+class ManageSettingsTests(SimpleTestCase):
+    def test_command_runs_under_slim_settings_without_the_request_stack(self):
+        # fresh interpreter: the point is what a cron process imports, which this test run already has loaded
+        code = (
+            "import sys, django; django.setup()\n"
+            "from django.core.management import call_command\n"
+            "from django.db import connection\n"
+            "connection.creation.create_test_db(verbosity=0)\n"
+            "call_command('purge_idempotency_keys')\n"
+            "heavy = ('rest_framework.response', 'rest_framework.views', 'rest_framework.generics', 'django_filters', "
+            "'inventory.views', 'accounts.views')\n"
+            "print(sorted(m for m in heavy if m in sys.modules))\n"
+        )
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": "pharmacy.settings_manage"}
+        proc = subprocess.run([sys.executable, "-c", code], cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+        self.assertEqual(proc.returncode, 0, proc.stderr)
+        self.assertEqual(proc.stdout.splitlines(), ["Deleted 0 expired idempotency keys", "[]"])
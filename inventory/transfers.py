@@ -0,0 +1,61 @@
+from django.db import models, transaction
+from rest_framework.exceptions import ValidationError
+
+from .models import Batch, StockTransaction
+
+
+@transaction.atomic
+def transfer(medicine, source, destination, quantity, performed_by, batch=None):
+    """
+    Move stock between branches as pairs of movements: a TYPE_OUT from each source batch and a
+    TYPE_IN into a matching batch at the destination (same batch number, expiry and cost), so
+    FIFO-by-expiry keeps working on the receiving side. Everything commits or nothing does.
+    Returns the created transactions.
+    """
+    if source.pk == destination.pk:
+        raise ValidationError({"to_location": "Source and destination must differ."})
+
+    if batch is not None:
+        if batch.medicine_id != medicine.pk or batch.location_id != source.pk:
+            raise ValidationError({"batch": "Batch does not hold this medicine at the source location."})
+        plan = [(batch, quantity)]
+    else:
+        plan = []
+        remaining = quantity
+        candidates = (
+            Batch.objects.filter(medicine=medicine, location=source, available_quantity__gt=models.F("reserved_quantity"))
+            .order_by("expiry_date", "received_date")
+        )
+        for b in candidates:
+            take = min(b.unreserved_quantity, remaining)
+            plan.append((b, take))
+            remaining -= take
+            if remaining <= 0:
+                break
+        if remaining > 0:
+            raise ValidationError({"quantity": "Not enough unreserved stock at the source location."})
+
+    note = f"Transfer {source.code} -> {destination.code}"
+    movements = []
+    for src_batch, qty in plan:
+        try:
+            out_tx = StockTransaction.objects.create(
+                medicine=medicine, batch=src_batch, location=source,
+                transaction_type=StockTransaction.TYPE_OUT, quantity=qty,
+                performed_by=performed_by, note=note,
+            )
+        except ValueError as exc:
+            raise ValidationError({"quantity": str(exc)})
+        dest_batch = Batch.objects.create(
+            medicine=medicine, location=destination,
+            batch_number=src_batch.batch_number, quantity=qty, available_quantity=0,
+            purchase_price=src_batch.purchase_price, supplier_id=src_batch.supplier_id,
+            received_date=src_batch.received_date, expiry_date=src_batch.expiry_date,
+        )
+        in_tx = StockTransaction.objects.create(
+            medicine=medicine, batch=dest_batch, location=destination,
+            transaction_type=StockTransaction.TYPE_IN, quantity=qty,
+            performed_by=performed_by, note=note,
+        )
+        movements.extend([out_tx, in_tx])
+    return movements
@@ -1,11 +1,16 @@
 from django.urls import path
 from .views import (
+    QueryProfileView, PosLookupView,
     CategoryListCreateView, CategoryDetailView,
-    SupplierListCreateView, SupplierDetailView,
-    MedicineListCreateView, MedicineDetailView,
-    BatchListCreateView, BatchDetailView,
+    SupplierListCreateView, SupplierDetailView, SupplierScorecardView, SupplierScorecardListView,
+    MedicineListCreateView, MedicineDetailView, MedicineBulkView, MedicinePricesView, MarginReportView, MedicineExportView,
+    MedicineForecastView,
+    BatchListCreateView, BatchDetailView, BatchBulkView,
     PurchaseOrderListCreateView, PurchaseOrderDetailView,
-    StockTransactionListCreateView, LowStockListView
+    StockTransactionListCreateView, StockTransactionExportView, LowStockListView,
+    ReservationListCreateView, ReservationDetailView, ReservationReleaseView, ReservationFulfilView,
+    LocationListCreateView, LocationDetailView, LocationStockListView, LocationStockDetailView, TransferView,
+    ChangeFeedView
 )
 
 urlpatterns = [
@@ -14,16 +19,42 @@ urlpatterns = [
 
     path("suppliers/", SupplierListCreateView.as_view(), name="supplier_list"),
     path("suppliers/<int:pk>/", SupplierDetailView.as_view(), name="supplier_detail"),
+    path("suppliers/<int:pk>/scorecard/", SupplierScorecardView.as_view(), name="supplier_scorecard"),
+    path("suppliers/scorecards/", SupplierScorecardListView.as_view(), name="supplier_scorecards"),
 
     path("medicines/", MedicineListCreateView.as_view(), name="medicine_list"),
     path("medicines/<int:pk>/", MedicineDetailView.as_view(), name="medicine_detail"),
+    path("medicines/bulk/", MedicineBulkView.as_view(), name="medicine_bulk"),
+    path("medicines/prices/", MedicinePricesView.as_view(), name="medicine_prices"),
+    path("medicines/export/", MedicineExportView.as_view(), name="medicine_export"),
+    path("medicines/<int:pk>/forecast/", MedicineForecastView.as_view(), name="medicine_forecast"),
 
     path("batches/", BatchListCreateView.as_view(), name="batch_list"),
     path("batches/<int:pk>/", BatchDetailView.as_view(), name="batch_detail"),
+    path("batches/bulk/", BatchBulkView.as_view(), name="batch_bulk"),
 
     path("purchase-orders/", PurchaseOrderListCreateView.as_view(), name="po_list"),
     path("purchase-orders/<int:pk>/", PurchaseOrderDetailView.as_view(), name="po_detail"),
 
     path("stock-transactions/", StockTransactionListCreateView.as_view(), name="stock_transactions"),
+    path("stock-transactions/export/", StockTransactionExportView.as_view(), name="stock_transaction_export"),
     path("low-stock/", LowStockListView.as_view(), name="low_stock"),
+    path("reports/margin/", MarginReportView.as_view(), name="margin_report"),
+
+    path("locations/", LocationListCreateView.as_view(), name="location_list"),
+    path("locations/<int:pk>/", LocationDetailView.as_view(), name="location_detail"),
+    path("locations/<int:pk>/stock/", LocationStockListView.as_view(), name="location_stock"),
+    path("locations/<int:pk>/stock/<int:medicine_pk>/", LocationStockDetailView.as_view(), name="location_stock_detail"),
+    path("transfers/", TransferView.as_view(), name="transfer"),
+
+    path("changes/", ChangeFeedView.as_view(), name="change_feed"),
+
+    path("reservations/", ReservationListCreateView.as_view(), name="reservation_list"),
+    path("reservations/<int:pk>/", ReservationDetailView.as_view(), name="reservation_detail"),
+    path("reservations/<int:pk>/release/", ReservationReleaseView.as_view(), name="reservation_release"),
+    path("reservations/<int:pk>/fulfil/", ReservationFulfilView.as_view(), name="reservation_fulfil"),
+
+    path("pos/lookup/<str:sku>/", PosLookupView.as_view(), name="pos_lookup"),
+
+    path("debug/perf/", QueryProfileView.as_view(), name="query_profile"),
 ]
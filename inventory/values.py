@@ -0,0 +1,107 @@
+"""
+values() serialization mode for read-only list endpoints.
+
+List GETs build their response dicts straight from queryset.values(...) rows instead of instantiating
+models and running ModelSerializer field machinery. The output has the same shape and wire format
+as the view's serializer (see bench_serialization for the numbers).
+"""
+import datetime
+from decimal import Decimal
+
+from django.conf import settings
+from rest_framework import serializers
+from rest_framework.response import Response
+
+_datetime_field = serializers.DateTimeField()
+
+
+def to_wire(value):
+    # same representation the DRF serializer fields produce
+    if isinstance(value, datetime.datetime):
+        return _datetime_field.to_representation(value)
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def values_mode_enabled():
+    return getattr(settings, "INVENTORY_VALUES_MODE", True)
+
+
+class ValuesListMixin:
+    """
+    For ListAPIView subclasses. Set `values_fields` (columns to select) and override
+    `build_rows(rows)` to reshape / attach nested data; filtering and pagination still apply.
+    """
+    values_fields = ()
+
+    def build_rows(self, rows):
+        return [{key: to_wire(value) for key, value in row.items()} for row in rows]
+
+    def list(self, request, *args, **kwargs):
+        if not values_mode_enabled():
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None)
+        rows = queryset.values(*self.values_fields)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(self.build_rows(page))
+        return Response(self.build_rows(list(rows)))
+
+
+BATCH_VALUES_FIELDS = (
+    "id", "batch_number", "quantity", "available_quantity", "reserved_quantity", "purchase_price",
+    "supplier", "location", "received_date", "expiry_date", "created_at", "version",
+)
+
+MEDICINE_VALUES_FIELDS = (
+    "id", "sku", "name", "category", "category__name", "category__description", "description",
+    "unit_price", "total_stock", "reorder_level", "is_active",
+    "next_expiry", "live_batches", "oldest_received", "average_cost", "created_at", "version",
+)
+
+
+def batch_row(row):
+    return {field: to_wire(row[field]) for field in BATCH_VALUES_FIELDS}
+
+
+def medicine_rows(rows, include_batches=True):
+    """
+    Shape plain medicine values() rows like MedicineSerializer output (nested category and batches),
+    fetching the batches of the whole page with one query.
+    """
+    from .models import Batch
+
+    rows = list(rows)
+    batches = {}
+    if include_batches:
+        for b in Batch.objects.filter(medicine_id__in=[r["id"] for r in rows]).values("medicine_id", *BATCH_VALUES_FIELDS):
+            batches.setdefault(b["medicine_id"], []).append(batch_row(b))
+    out = []
+    for r in rows:
+        category = None
+        if r["category"] is not None:
+            category = {"id": r["category"], "name": r["category__name"], "description": r["category__description"]}
+        out.append({
+            "id": r["id"],
+            "sku": r["sku"],
+            "name": r["name"],
+            "category": category,
+            "description": r["description"],
+            "unit_price": to_wire(r["unit_price"]),
+            "total_stock": r["total_stock"],
+            "reorder_level": r["reorder_level"],
+            "is_active": r["is_active"],
+            "next_expiry": to_wire(r["next_expiry"]),
+            "live_batches": r["live_batches"],
+            "oldest_received": to_wire(r["oldest_received"]),
+            "average_cost": to_wire(r["average_cost"]),
+            "batches": batches.get(r["id"], []),
+            "created_at": to_wire(r["created_at"]),
+            "version": r["version"],
+        })
+        if not include_batches:
+            del out[-1]["batches"]
+    return out
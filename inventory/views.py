@@ -3,72 +3,237 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.decorators import action
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Category, Supplier, Medicine, Batch, PurchaseOrder, StockTransaction
+from .models import Category, Supplier, Medicine, Batch, PurchaseOrder, StockTransaction, Reservation, Location, MedicineLocationStock, MedicineForecast
 from .serializers import (
     CategorySerializer, SupplierSerializer, MedicineSerializer, BatchSerializer,
-    PurchaseOrderSerializer, StockTransactionSerializer
+    PurchaseOrderSerializer, StockTransactionSerializer, ReservationSerializer,
+    LocationSerializer, MedicineLocationStockSerializer, TransferSerializer,
+    MedicineBulkUpdateSerializer, BatchBulkUpdateSerializer, BatchBulkDeleteSerializer,
+    PricesAsOfSerializer, MarginReportQuerySerializer, MedicineForecastSerializer
 )
 from django.db import models
-from .permissions import IsPharmacistOrAdmin
+from .permissions import IsPharmacistOrAdmin, IsPharmacistOrAdminOnly, CanReserveStock
+from . import reservations
+from .transfers import transfer
+from . import changes
+from . import bulk
+from .caching import ConditionalGetMixin, MedicineValidatorsMixin, RowValidatorsMixin
+from .values import ValuesListMixin, MEDICINE_VALUES_FIELDS, BATCH_VALUES_FIELDS, medicine_rows
+from datetime import datetime, time, timedelta
+from django.utils import timezone
+from .concurrency import VersionedUpdateMixin
+from .idempotency import IdempotentCreateMixin
 from rest_framework.permissions import IsAuthenticated
 from django.db import transaction
+from rest_framework.exceptions import NotFound, ValidationError
+from accounts.permissions import IsAdmin
+from . import instrumentation
+from . import pos
+from . import scorecards
+from . import pricing
+from . import exports
 
 
-class CategoryListCreateView(generics.ListCreateAPIView):
+class CategoryListCreateView(ConditionalGetMixin, generics.ListCreateAPIView):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticated, IsPharmacistOrAdmin]
     filter_backends = [filters.SearchFilter]
     search_fields = ["name"]
+    stamp_resources = ("category",)
+    cache_control = {"private": True, "max_age": 60}
 
-class CategoryDetailView(generics.RetrieveUpdateDestroyAPIView):
+class CategoryDetailView(RowValidatorsMixin, ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticated, IsPharmacistOrAdmin]
 
 # Suppliers
-class SupplierListCreateView(generics.ListCreateAPIView):
+class SupplierListCreateView(ConditionalGetMixin, generics.ListCreateAPIView):
     queryset = Supplier.objects.all()
     serializer_class = SupplierSerializer
     permission_classes = [IsAuthenticated, IsPharmacistOrAdmin]
     filter_backends = [filters.SearchFilter]
     search_fields = ["name", "contact_email", "phone"]
+    stamp_resources = ("supplier",)
+    cache_control = {"private": True, "max_age": 60}
 
-class SupplierDetailView(generics.RetrieveUpdateDestroyAPIView):
+class SupplierDetailView(RowValidatorsMixin, ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Supplier.objects.all()
     serializer_class = SupplierSerializer
     permission_classes = [IsAuthenticated, IsPharmacistOrAdmin]
 
 # Medicines
-class MedicineListCreateView(generics.ListCreateAPIView):
-    queryset = Medicine.objects.prefetch_related("batches").all()
+# sort / filter on the denormalized batch summary (Medicine columns, no Batch join)
+MEDICINE_SUMMARY_FILTERS = {
+    "next_expiry": ["exact", "lte", "gte", "isnull"],
+    "average_cost": ["lte", "gte"],
+    "live_batches": ["lte", "gte"],
+}
+MEDICINE_ORDERING_FIELDS = ["name", "total_stock", "next_expiry", "average_cost", "live_batches", "oldest_received"]
+
+
+class MedicineBatchesMixin:
+    """
+    Nested batches are included unless the client passes ?batches=0, in which case the Batch table is
+    not read at all and the summary columns stand in for it.
+    """
+    def include_batches(self):
+        return self.request.query_params.get("batches") not in ("0", "false")
+
+    def get_queryset(self):
+        queryset = Medicine.objects.all()
+        return queryset.prefetch_related("batches") if self.include_batches() else queryset
+
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), "include_batches": self.include_batches()}
+
+class MedicineListCreateView(ConditionalGetMixin, MedicineBatchesMixin, ValuesListMixin, generics.ListCreateAPIView):
+    queryset = Medicine.objects.all()
     serializer_class = MedicineSerializer
     permission_classes = [IsAuthenticated, IsPharmacistOrAdmin]
-    filter_backends = [filters.SearchFilter, DjangoFilterBackend]
+    filter_backends = [filters.SearchFilter, DjangoFilterBackend, filters.OrderingFilter]
     search_fields = ["name", "sku", "description"]
-    filterset_fields = ["category", "is_active"]
+    filterset_fields = {"category": ["exact"], "is_active": ["exact"], **MEDICINE_SUMMARY_FILTERS}
+    ordering_fields = MEDICINE_ORDERING_FIELDS
+    values_fields = MEDICINE_VALUES_FIELDS
+    stamp_resources = ("medicine", "batch", "category")
 
-class MedicineDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Medicine.objects.prefetch_related("batches").all()
+    def build_rows(self, rows):
+        return medicine_rows(rows, include_batches=self.include_batches())
+
+class MedicineDetailView(MedicineValidatorsMixin, ConditionalGetMixin, MedicineBatchesMixin, VersionedUpdateMixin, generics.RetrieveUpdateDestroyAPIView):
+    queryset = Medicine.objects.all()
     serializer_class = MedicineSerializer
     permission_classes = [IsAuthenticated, IsPharmacistOrAdmin]
 
+class MedicineBulkView(APIView):
+    """
+    PATCH /medicines/bulk/ — [{"id": 1, "unit_price": "9.99", "reorder_level": 20}, ...]
+    Validated as a list, written with bulk_update; all or nothing.
+    """
+    permission_classes = [IsAuthenticated, IsPharmacistOrAdmin]
+    throttle_scope = "bulk"
+
+    def patch(self, request):
+        serializer = MedicineBulkUpdateSerializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        updated = bulk.bulk_update_medicines(serializer.validated_data)
+        return Response({"updated": updated})
+
+class MedicineForecastView(generics.RetrieveAPIView):
+    """
+    GET /medicines/<pk>/forecast/ — the nightly demand forecast (inventory.forecasting) with the current
+    stock and how many forecast days it covers.
+    """
+    queryset = MedicineForecast.objects.select_related("medicine")
+    serializer_class = MedicineForecastSerializer
+    permission_classes = [IsAuthenticated, IsPharmacistOrAdmin]
+
+    def get_object(self):
+        forecast = self.get_queryset().filter(medicine_id=self.kwargs["pk"]).first()
+        if forecast is None:
+            if not Medicine.objects.filter(pk=self.kwargs["pk"]).exists():
+                raise NotFound()
+            raise NotFound("No forecast for this medicine yet (no sales in the history window, or the nightly run hasn't covered it).")
+        return forecast
+
+class CSVExportView(generics.GenericAPIView):
+    """
+    Streams the filtered queryset as a CSV attachment (inventory.exports) instead of a paginated,
+    fully rendered JSON body.
+    """
+    permission_classes = [IsAuthenticated, IsPharmacistOrAdmin]
+    throttle_scope = "bulk"
+    export_fields = ()
+    export_filename = "export.csv"
+
+    def perform_content_negotiation(self, request, force=False):
+        # the body is CSV whatever the renderers say; errors still render as JSON
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request):
+        return exports.stream_csv(self.filter_queryset(self.get_queryset()), self.export_fields, self.export_filename)
+
+class MedicineExportView(CSVExportView):
+    """
+    GET /medicines/export/ — same search / filters as the medicine list.
+    """
+    queryset = Medicine.objects.order_by("pk")
+    filter_backends = [filters.SearchFilter, DjangoFilterBackend]
+    search_fields = ["name", "sku", "description"]
+    filterset_fields = {"category": ["exact"], "is_active": ["exact"], **MEDICINE_SUMMARY_FILTERS}
+    export_fields = exports.MEDICINE_EXPORT_FIELDS
+    export_filename = "medicines.csv"
+
+class MedicinePricesView(APIView):
+    """
+    POST /medicines/prices/ — {"skus": [...]} or {"ids": [...]}, optional "as_of" and "kind" (sale|cost):
+    the price in effect at as_of (default now) for every listed medicine, from the price history.
+    """
+    permission_classes = [IsAuthenticated, IsPharmacistOrAdmin]
+    throttle_scope = "bulk"
+
+    def post(self, request):
+        serializer = PricesAsOfSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        as_of = data.get("as_of") or timezone.now()
+        skus = {}
+        for field, values in (("pk__in", data.get("ids")), ("sku__in", data.get("skus"))):
+            for chunk in bulk._chunks(values or []):
+                skus.update(Medicine.objects.filter(**{field: chunk}).values_list("pk", "sku"))
+        prices = pricing.prices_as_of(skus, as_of, data["kind"])
+        return Response({
+            "as_of": as_of,
+            "kind": data["kind"],
+            "prices": [{"medicine": pk, "sku": sku, "price": prices.get(pk)} for pk, sku in skus.items()],
+        })
+
 # Batches
-class BatchListCreateView(generics.ListCreateAPIView):
+class BatchListCreateView(ConditionalGetMixin, ValuesListMixin, generics.ListCreateAPIView):
     queryset = Batch.objects.select_related("medicine", "supplier").all()
     serializer_class = BatchSerializer
     permission_classes = [IsAuthenticated, IsPharmacistOrAdmin]
     filter_backends = [filters.SearchFilter, DjangoFilterBackend]
     search_fields = ["batch_number"]
-    filterset_fields = ["medicine", "supplier"]
+    filterset_fields = ["medicine", "supplier", "location"]
+    values_fields = BATCH_VALUES_FIELDS
+    stamp_resources = ("batch",)
 
-class BatchDetailView(generics.RetrieveUpdateDestroyAPIView):
+class BatchDetailView(RowValidatorsMixin, ConditionalGetMixin, VersionedUpdateMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Batch.objects.select_related("medicine", "supplier").all()
     serializer_class = BatchSerializer
     permission_classes = [IsAuthenticated, IsPharmacistOrAdmin]
 
+class BatchBulkView(APIView):
+    """
+    PATCH /batches/bulk/ — [{"id": 1, "expiry_date": "2026-01-31"}, ...]
+    DELETE /batches/bulk/ — {"ids": [...]} and/or {"expired_before": "2026-01-01"}
+    Stock totals of affected medicines are recomputed once, in one grouped statement.
+    """
+    permission_classes = [IsAuthenticated, IsPharmacistOrAdmin]
+    throttle_scope = "bulk"
+
+    def patch(self, request):
+        serializer = BatchBulkUpdateSerializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        updated = bulk.bulk_update_batches(serializer.validated_data)
+        return Response({"updated": updated})
+
+    def delete(self, request):
+        serializer = BatchBulkDeleteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        queryset = Batch.objects.all()
+        if serializer.validated_data.get("ids"):
+            queryset = queryset.filter(pk__in=serializer.validated_data["ids"])
+        if serializer.validated_data.get("expired_before"):
+            queryset = queryset.filter(expiry_date__lt=serializer.validated_data["expired_before"])
+        deleted = bulk.bulk_delete_batches(queryset)
+        return Response({"deleted": deleted})
+
 # Purchase Orders — create, update, receive
-class PurchaseOrderListCreateView(generics.ListCreateAPIView):
+class PurchaseOrderListCreateView(IdempotentCreateMixin, generics.ListCreateAPIView):
     queryset = PurchaseOrder.objects.prefetch_related("items__medicine").all()
     serializer_class = PurchaseOrderSerializer
     permission_classes = [IsAuthenticated, IsPharmacistOrAdmin]
@@ -89,23 +254,287 @@ class PurchaseOrderDetailView(generics.RetrieveUpdateAPIView):
         # allow update — serializer handles status==received actions
         return super().put(request, *args, **kwargs)
 
+    @transaction.atomic
+    def patch(self, request, *args, **kwargs):
+        return super().patch(request, *args, **kwargs)
+
+class SupplierScorecardView(APIView):
+    """
+    GET /suppliers/<pk>/scorecard/?months=12 — lead time, cancellation rate, spend and price index
+    (100 = the all-supplier average for the same medicines) from the monthly rollups.
+    """
+    permission_classes = [IsAuthenticated, IsPharmacistOrAdminOnly]
+
+    def get(self, request, pk):
+        months = scorecard_months(request)
+        supplier = generics.get_object_or_404(Supplier.objects.all(), pk=pk)
+        return Response(scorecards.scorecard(supplier, months))
+
+
+class SupplierScorecardListView(APIView):
+    """
+    GET /suppliers/scorecards/?months=12&ordering=price_index — every supplier with orders in the window,
+    ranked by one of scorecards.RANKING_FIELDS ("-" for descending).
+    """
+    permission_classes = [IsAuthenticated, IsPharmacistOrAdminOnly]
+
+    def get(self, request):
+        months = scorecard_months(request)
+        ordering = request.query_params.get("ordering", "price_index")
+        if ordering.lstrip("-") not in scorecards.RANKING_FIELDS:
+            raise ValidationError({"ordering": f"Must be one of {', '.join(scorecards.RANKING_FIELDS)}, optionally prefixed with '-'."})
+        return Response({"months": months, "results": scorecards.ranking(months, ordering)})
+
+
+def scorecard_months(request):
+    try:
+        months = int(request.query_params.get("months", 12))
+    except ValueError:
+        months = 0
+    if not 1 <= months <= 120:
+        raise ValidationError({"months": "Must be an integer between 1 and 120."})
+    return months
+
+class MarginReportView(APIView):
+    """
+    GET /reports/margin/?start=2026-01-01&end=2026-07-01&period=month[&medicine=<pk>][&by_medicine=1]
+    Revenue, cost and margin of OUT transactions per period, priced as of each sale (inventory.pricing).
+    """
+    permission_classes = [IsAuthenticated, IsPharmacistOrAdminOnly]
+
+    def get(self, request):
+        serializer = MarginReportQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        start, end = (timezone.make_aware(datetime.combine(data[k], time.min)) for k in ("start", "end"))
+        medicine_ids = [data["medicine"]] if "medicine" in data else None
+        return Response({
+            "start": data["start"], "end": data["end"], "period": data["period"],
+            "results": pricing.margin_report(start, end, data["period"], medicine_ids, data["by_medicine"]),
+        })
+
 # Stock transactions - manual adjustments or consumption
-class StockTransactionListCreateView(generics.ListCreateAPIView):
+class StockTransactionListCreateView(IdempotentCreateMixin, generics.ListCreateAPIView):
     queryset = StockTransaction.objects.select_related("medicine", "batch", "performed_by").all()
     serializer_class = StockTransactionSerializer
     permission_classes = [IsAuthenticated, IsPharmacistOrAdmin]
+    throttle_scope = "stock"
     filter_backends = [filters.SearchFilter, DjangoFilterBackend]
     search_fields = ["medicine__name", "note"]
-    filterset_fields = ["transaction_type", "medicine"]
+    filterset_fields = ["transaction_type", "medicine", "location"]
 
     def perform_create(self, serializer):
-        serializer.save(performed_by=self.request.user)
+        # the ledger row and the stock change it triggers commit together (or not at all)
+        with transaction.atomic():
+            serializer.save(performed_by=self.request.user)
+
+class StockTransactionExportView(CSVExportView):
+    """
+    GET /stock-transactions/export/?performed_at__gte=...&performed_at__lt=... — oldest first.
+    """
+    queryset = StockTransaction.objects.order_by("performed_at", "pk")
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = {
+        "transaction_type": ["exact"], "medicine": ["exact"], "location": ["exact"],
+        "performed_at": ["gte", "lt"],
+    }
+    export_fields = exports.TRANSACTION_EXPORT_FIELDS
+    export_filename = "stock-transactions.csv"
 
 # Low stock / reorder alerts
-class LowStockListView(APIView):
+class LowStockListView(MedicineBatchesMixin, APIView):
     permission_classes = [IsAuthenticated, IsPharmacistOrAdmin]
+    # ?next_expiry__lte=, ?average_cost__gte=, ?ordering=next_expiry ... (medicine-wide list only)
+    filterset_fields = MEDICINE_SUMMARY_FILTERS
+    ordering_fields = MEDICINE_ORDERING_FIELDS
+
+    def get_serializer_context(self):
+        return {"request": self.request, "view": self, "include_batches": self.include_batches()}
 
     def get(self, request):
-        meds = Medicine.objects.filter(total_stock__lte=models.F("reorder_level"), is_active=True)
-        data = MedicineSerializer(meds, many=True).data
+        location = request.query_params.get("location")
+        if location:
+            # branch view: only this location's aggregate rows, via the (location, total_stock) index
+            rows = MedicineLocationStock.objects.select_related("medicine").filter(
+                location_id=location, total_stock__lte=models.F("reorder_level"), medicine__is_active=True
+            )
+            return Response(MedicineLocationStockSerializer(rows, many=True).data)
+        meds = self.get_queryset().filter(total_stock__lte=models.F("reorder_level"), is_active=True)
+        for backend in (DjangoFilterBackend, filters.OrderingFilter):
+            meds = backend().filter_queryset(request, meds, self)
+        data = MedicineSerializer(meds, many=True, context=self.get_serializer_context()).data
         return Response(data)
+
+# Locations (branches) and per-location stock
+class LocationListCreateView(generics.ListCreateAPIView):
+    queryset = Location.objects.all()
+    serializer_class = LocationSerializer
+    permission_classes = [IsAuthenticated, IsPharmacistOrAdmin]
+    filter_backends = [filters.SearchFilter, DjangoFilterBackend]
+    search_fields = ["code", "name"]
+    filterset_fields = ["is_active"]
+
+class LocationDetailView(generics.RetrieveUpdateAPIView):
+    queryset = Location.objects.all()
+    serializer_class = LocationSerializer
+    permission_classes = [IsAuthenticated, IsPharmacistOrAdmin]
+
+class LocationStockListView(generics.ListAPIView):
+    serializer_class = MedicineLocationStockSerializer
+    permission_classes = [IsAuthenticated, IsPharmacistOrAdmin]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ["medicine"]
+
+    def get_queryset(self):
+        return MedicineLocationStock.objects.select_related("medicine").filter(location_id=self.kwargs["pk"])
+
+class LocationStockDetailView(generics.RetrieveUpdateAPIView):
+    # lets a branch tune its own reorder_level
+    serializer_class = MedicineLocationStockSerializer
+    permission_classes = [IsAuthenticated, IsPharmacistOrAdmin]
+    lookup_field = "medicine_id"
+    lookup_url_kwarg = "medicine_pk"
+
+    def get_queryset(self):
+        return MedicineLocationStock.objects.select_related("medicine").filter(location_id=self.kwargs["pk"])
+
+class TransferView(APIView):
+    permission_classes = [IsAuthenticated, IsPharmacistOrAdmin]
+    throttle_scope = "stock"
+
+    def post(self, request):
+        serializer = TransferSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        movements = transfer(
+            data["medicine"], data["from_location"], data["to_location"], data["quantity"],
+            request.user, batch=data.get("batch"),
+        )
+        return Response(StockTransactionSerializer(movements, many=True).data, status=status.HTTP_201_CREATED)
+
+# Reservations — TTL holds on batch stock for pending orders
+def visible_reservations(user):
+    qs = Reservation.objects.select_related("customer").all()
+    if user.role not in ("admin", "pharmacist"):
+        qs = qs.filter(customer=user)
+    return qs
+
+class ReservationListCreateView(generics.ListCreateAPIView):
+    serializer_class = ReservationSerializer
+    permission_classes = [IsAuthenticated, CanReserveStock]
+    throttle_scope = "stock"
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ["status", "medicine", "batch"]
+
+    def get_queryset(self):
+        return visible_reservations(self.request.user)
+
+    def perform_create(self, serializer):
+        data = serializer.validated_data
+        ttl = timedelta(minutes=data["ttl_minutes"]) if data.get("ttl_minutes") else None
+        serializer.instance = reservations.reserve(data["batch"], self.request.user, data["quantity"], ttl=ttl)
+
+class ReservationDetailView(generics.RetrieveAPIView):
+    serializer_class = ReservationSerializer
+    permission_classes = [IsAuthenticated, CanReserveStock]
+
+    def get_queryset(self):
+        return visible_reservations(self.request.user)
+
+class ReservationReleaseView(APIView):
+    permission_classes = [IsAuthenticated, CanReserveStock]
+
+    def post(self, request, pk):
+        reservation = generics.get_object_or_404(visible_reservations(request.user), pk=pk)
+        self.check_object_permissions(request, reservation)
+        if not reservations.release(reservation):
+            reservation.refresh_from_db(fields=["status"])
+            return Response({"detail": f"Reservation is {reservation.status}, not active."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(ReservationSerializer(reservation).data)
+
+class ReservationFulfilView(APIView):
+    permission_classes = [IsAuthenticated, IsPharmacistOrAdmin]
+
+    def post(self, request, pk):
+        reservation = generics.get_object_or_404(Reservation.objects.all(), pk=pk)
+        reservations.fulfil(reservation, request.user)
+        return Response(ReservationSerializer(reservation).data)
+
+# Change feed — incremental sync for POS terminals / mobile clients
+class ChangeFeedView(APIView):
+    """
+    GET /changes/?since=<cursor>&limit=<n>
+    Returns upsert/delete events after the cursor (latest per object, upserts carry the current flat row).
+    Clients store `next` and poll with it; 410 means the cursor is older than compaction allows — resync.
+    `next` never passes events that may still be committing (changes.safe_cursor), so the newest events
+    can be delivered again on the next poll; apply them idempotently.
+    """
+    permission_classes = [IsAuthenticated, IsPharmacistOrAdmin]
+    default_limit = 500
+    max_limit = 5000
+
+    def get(self, request):
+        try:
+            since = int(request.query_params.get("since", 0))
+            limit = min(int(request.query_params.get("limit", self.default_limit)), self.max_limit)
+        except ValueError:
+            return Response({"detail": "since and limit must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+        if limit < 1:
+            return Response({"detail": "limit must be positive."}, status=status.HTTP_400_BAD_REQUEST)
+        if since and since < changes.horizon():
+            return Response(
+                {"detail": "Cursor is older than the retained change history; do a full resync.", "reset": True},
+                status=status.HTTP_410_GONE,
+            )
+        events, next_cursor, has_more = changes.read_changes(since, limit)
+        return Response({"events": events, "next": next_cursor, "has_more": has_more})
+
+
+class QueryProfileView(APIView):
+    """
+    GET /debug/perf/?n=<top>&recent=<n> — query shapes ranked by total time (admin only).
+    DELETE clears the collected stats. 404 unless INVENTORY_QUERY_PROFILING is enabled.
+    """
+    permission_classes = [IsAuthenticated, IsAdmin]
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if not instrumentation.enabled():
+            raise NotFound("Query profiling is disabled.")
+
+    def get(self, request):
+        try:
+            n = int(request.query_params.get("n", instrumentation.get_setting("TOP_N")))
+            recent = int(request.query_params.get("recent", 0))
+        except ValueError:
+            return Response({"detail": "n and recent must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+        shapes, recorded = instrumentation.stats.top(max(n, 1))
+        return Response({
+            "recorded": recorded,
+            "slow_query_ms": instrumentation.get_setting("SLOW_QUERY_MS"),
+            "top": shapes,
+            "recent": instrumentation.stats.latest(max(recent, 0)),
+        })
+
+    def delete(self, request):
+        instrumentation.stats.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class PosLookupView(APIView):
+    """
+    GET /pos/lookup/<sku>/ — price and availability for a scanned SKU from the in-process index
+    (inventory.pos); falls back to a single indexed query when the index is disabled, not loaded yet or stale.
+    """
+    permission_classes = [IsAuthenticated, IsPharmacistOrAdmin]
+    throttle_scope = "pos"
+
+    def get(self, request, sku):
+        if pos.get_setting("ENABLED") and pos.index.is_fresh():
+            record = pos.index.get(sku)
+        else:
+            row = Medicine.objects.filter(sku=sku).values_list(*pos.ROW_FIELDS).first()
+            record = pos.to_record(row) if row else None
+        if record is None:
+            return Response({"detail": "Unknown SKU."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(record.as_dict())
@@ -13,4 +13,21 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pharmacy.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# imported after Django is set up
+from inventory.push import stock_event_stream  # noqa: E402
+from inventory.pos import start_refresher  # noqa: E402
+
+start_refresher()
+
+PUSH_ROUTES = {
+    "/events/stock/": stock_event_stream,
+}
+
+
+async def application(scope, receive, send):
+    # long-lived push streams are served straight from the event loop instead of tying up a sync worker
+    if scope["type"] == "http" and scope["path"] in PUSH_ROUTES:
+        return await PUSH_ROUTES[scope["path"]](scope, receive, send)
+    return await django_application(scope, receive, send)
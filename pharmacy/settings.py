@@ -1,4 +1,5 @@
 
+from importlib.util import find_spec
 from pathlib import Path
 from datetime import timedelta
 
@@ -47,12 +48,15 @@ INSTALLED_APPS = DJANGO_APPS + PROJECT_APPS
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'inventory.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'inventory.profiling.RequestProfilerMiddleware',
+    'inventory.instrumentation.QueryProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'pharmacy.urls'
@@ -89,6 +93,21 @@ DATABASES = {
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
+# Preferred hasher first; older hashes are upgraded on the next successful login (accounts.hashers).
+PASSWORD_HASHERS = [
+    'accounts.hashers.PooledScryptPasswordHasher',
+    'accounts.hashers.PooledPBKDF2PasswordHasher',
+]
+if find_spec('argon2') is not None:
+    PASSWORD_HASHERS.insert(0, 'accounts.hashers.PooledArgon2PasswordHasher')
+
+INVENTORY_PASSWORD_HASHING = {
+    'SCRYPT_WORK_FACTOR': 2 ** 14,  # N; Django's defaults. Changing any of these rehashes on next login.
+    'SCRYPT_BLOCK_SIZE': 8,         # r
+    'SCRYPT_PARALLELISM': 5,        # p
+    'WORKERS': None,  # concurrent hash computations; None = CPU count
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -116,6 +135,19 @@ REST_FRAMEWORK = {
     ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
+    # orjson-backed when installed, stock DRF JSON otherwise
+    'DEFAULT_RENDERER_CLASSES': (
+        'inventory.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'inventory.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+    'DEFAULT_THROTTLE_CLASSES': (
+        'accounts.throttling.RoleRateThrottle',
+    ),
 }
 
 
@@ -133,6 +165,122 @@ SIMPLE_JWT = {
 }
 
 
+# Idempotency-Key handling for stock-mutating POSTs (inventory.idempotency)
+INVENTORY_IDEMPOTENCY = {
+    'TTL': timedelta(hours=24),
+    'CACHE_SIZE': 10000,
+    'WAIT_TIMEOUT': 10.0,
+    'PENDING_TIMEOUT': 60.0,  # must exceed the slowest stock POST; a pending key older than this is taken over
+}
+
+# Default hold time for stock reservations (inventory.reservations)
+INVENTORY_RESERVATION_TTL = timedelta(minutes=30)
+
+# Change-feed cursors and list ETags stop at events older than this (inventory.changes.safe_cursor): ids are
+# assigned at INSERT, so it must exceed the longest a transaction stays open after recording a change.
+INVENTORY_CHANGE_SETTLE = timedelta(seconds=60)
+
+# Stock-level push channel served by pharmacy.asgi (inventory.push)
+INVENTORY_PUSH = {
+    'BACKEND': 'inventory.push.InProcessBackend',
+    'COALESCE_SECONDS': 0.5,
+    'KEEPALIVE_SECONDS': 15.0,
+}
+
+# Read-only list views build responses from queryset.values() instead of ModelSerializers (inventory.values)
+INVENTORY_VALUES_MODE = True
+
+# Per-view Cache-Control overrides for conditional-GET views (inventory.caching), keyed by view class name
+INVENTORY_CACHE_CONTROL = {
+    # 'CategoryListCreateView': {'private': True, 'max_age': 300},
+}
+
+# Per-query profiling (fingerprint, duration, originating view / signal handler) and slow-query log.
+# Off by default; when off the middleware drops out at startup. Stats: GET /debug/perf/ (admin).
+INVENTORY_QUERY_PROFILING = {
+    'ENABLED': False,
+    'SLOW_QUERY_MS': 200,
+    'RING_SIZE': 10000,
+    'TOP_N': 20,
+}
+
+# Sampled cProfile captures, stored per URL name under DIR; aggregate with `manage.py profile_report`.
+# Admins can force a capture by sending the HEADER on a request.
+INVENTORY_PROFILER = {
+    'ENABLED': False,
+    'SAMPLE_RATE': 0.0,
+    'HEADER': 'X-Profile',
+    'DIR': BASE_DIR / 'profiles',
+    'MAX_FILES_PER_URL': 50,
+}
+
+
+# Token-bucket throttling (accounts.throttling). RATES[scope][role]; views pick a scope with
+# `throttle_scope`, roles missing from a scope fall back to "default". None = unlimited.
+INVENTORY_THROTTLE = {
+    'ENABLED': True,
+    'RATES': {
+        'default': {'admin': None, 'pharmacist': '600/min', 'supplier': '120/min', 'customer': '60/min', 'anon': '30/min'},
+        'stock': {'pharmacist': '300/min', 'supplier': '30/min', 'customer': '30/min'},
+        'bulk': {'admin': '30/min', 'pharmacist': '10/min'},
+        'pos': {'pharmacist': '3000/min'},
+    },
+    # register / login / refresh, per client IP
+    'LOGIN_RATE': '10/min',
+}
+
+# Per-process SKU index behind /pos/lookup/<sku>/ (inventory.pos)
+INVENTORY_POS_INDEX = {
+    'ENABLED': True,
+    'MAX_STALENESS': 0.5,   # seconds between change-feed checks (background refresher)
+    'FALLBACK_AFTER': 5.0,  # no successful refresh for this long: lookups use the database
+    'FULL_RELOAD': 300,     # seconds between full rebuilds
+}
+
+# Accept-Encoding negotiated compression (inventory.compression): zstd / br when their libraries are
+# installed, gzip always. Smaller bodies skip it; streamed exports are sync-flushed every FLUSH_BYTES.
+# BREACH: HTML and the EXCLUDE_URL_NAMES views (tokens) are never compressed; gzip gets random-length padding.
+INVENTORY_COMPRESSION = {
+    'ENABLED': True,
+    'ENCODINGS': ['zstd', 'br', 'gzip'],
+    'MIN_SIZE': 1024,
+    'FLUSH_BYTES': 64 * 1024,
+    'GZIP_LEVEL': 6,
+    'BROTLI_QUALITY': 4,
+    'ZSTD_LEVEL': 3,
+    'MAX_RANDOM_BYTES': 100,
+    'EXCLUDE_URL_NAMES': ['login', 'refresh', 'register'],
+}
+
+# Nightly demand forecasts (inventory.forecasting, `manage.py forecast_demand`): exponential smoothing with
+# weekday factors over HISTORY_DAYS of daily sales (at least two weeks), forecast HORIZON_DAYS ahead.
+INVENTORY_FORECAST = {
+    'HISTORY_DAYS': 182,
+    'HORIZON_DAYS': 28,
+    'ALPHA': 0.2,
+    'CHUNK_SIZE': 5000,   # medicines per matrix
+}
+
+# Cold-start budgets checked by `manage.py bench_startup` (median wall time of a fresh interpreter, ms).
+# manage / manage_slim: django.setup() under pharmacy.settings / pharmacy.settings_manage;
+# worker: WSGI application plus the full URLconf, i.e. ready to serve its first request.
+INVENTORY_STARTUP_BUDGET_MS = {
+    'manage': 700,
+    'manage_slim': 550,
+    'worker': 850,
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'throttle': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'throttle',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
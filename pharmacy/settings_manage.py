@@ -0,0 +1,27 @@
+"""
+Settings for management-only processes (cron-driven maintenance commands, one-off jobs) that never serve
+HTTP. Same database, caches and INVENTORY_* configuration as pharmacy.settings, without the request-side
+stack: no admin, no simplejwt app, no middleware and an empty URLconf, so neither app loading nor the
+system checks import the API views, DRF generics, django-filter or the admin.
+
+    DJANGO_SETTINGS_MODULE=pharmacy.settings_manage python manage.py compact_changes
+
+Not for migrate, createsuperuser or runserver: the admin tables and URLs belong to apps left out here.
+`manage.py bench_startup` compares boot time under both profiles.
+"""
+from .settings import *  # noqa: F401,F403
+
+REQUEST_ONLY_APPS = [
+    'django.contrib.admin',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    'rest_framework_simplejwt',
+]
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in REQUEST_ONLY_APPS]  # noqa: F405
+
+MIDDLEWARE = []
+
+# this module doubles as the (empty) URLconf
+ROOT_URLCONF = 'pharmacy.settings_manage'
+urlpatterns = []
@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pharmacy.settings')
 
 application = get_wsgi_application()
+
+from inventory.pos import start_refresher  # noqa: E402
+
+start_refresher()